@@ -0,0 +1,81 @@
+"""
+Non-blocking JSON-lines logging for the `api.access` logger.
+
+`AccessLogHandler` puts records on a bounded in-memory queue and returns; a
+`QueueListener` thread in each process formats them and writes them to
+stdout. When the queue is full, records are dropped and counted instead of
+making the request wait, and the next line written reports how many were lost.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        line = {'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds')}
+        line.update(getattr(record, 'access', None) or {'message': record.getMessage()})
+        if getattr(record, 'dropped', 0):
+            line['dropped'] = record.dropped
+        return json.dumps(line, default=str, separators=(',', ':'))
+
+
+class AccessLogHandler(QueueHandler):
+    """
+    Queue at most `maxsize` records for a background writer to `stream`
+    (stdout by default). Formatting happens on the writer thread.
+    """
+
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.target.setFormatter(JsonLinesFormatter())
+        self.listener = None
+        self.pid = None
+        self.dropped = 0
+        self.start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def start(self):
+        with self.start_lock:
+            if self.pid != os.getpid():
+                # First record in this process (or in a forked worker, whose
+                # copy of the parent's queue and thread must not be used).
+                self.queue = queue.Queue(self.maxsize)
+                self.listener = QueueListener(self.queue, self.target)
+                self.listener.start()
+                self.pid = os.getpid()
+
+    def prepare(self, record):
+        # Records are self-contained (see api.middleware.AccessLogMiddleware),
+        # so formatting can wait for the listener thread.
+        return record
+
+    def enqueue(self, record):
+        if self.pid != os.getpid():
+            self.start()
+        if self.dropped:
+            record.dropped, self.dropped = self.dropped, 0
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1 + getattr(record, 'dropped', 0)
+
+    def stop(self):
+        """
+        Write what is still queued at process exit.
+        """
+        if self.pid != os.getpid() or self.listener is None:
+            return
+        try:
+            self.listener.stop()
+        except queue.Full:
+            pass
+        self.listener = None
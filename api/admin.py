@@ -1,3 +1,27 @@
 from django.contrib import admin
+from .models import AuditEvent, OutboundEmail
 
-# Register your models here.
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status']
+    readonly_fields = ['created_at', 'sent_at']
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    list_display = ['occurred_at', 'actor_name', 'action', 'model', 'object_id']
+    list_filter = ['action', 'model']
+    search_fields = ['^actor_name']
+    date_hierarchy = 'occurred_at'
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,242 @@
+"""
+Write-behind audit trail.
+
+`record()` queues an AuditEvent once the surrounding transaction commits, and
+drops it if the transaction rolls back, so requests never wait on an audit
+insert. A background thread in each process writes the queue with one
+`bulk_create` when AUDIT_BUFFER_SIZE events are waiting, and otherwise every
+AUDIT_FLUSH_SECONDS. Events that cannot be written, and anything still queued
+when the process exits, are appended to AUDIT_FALLBACK_PATH as JSON lines;
+`manage.py replay_audit_fallback` loads them into the table. At most
+AUDIT_MAX_QUEUED events wait in memory; beyond that new events are dropped
+and counted in the log, rather than growing the queue while writes fail.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+EXCLUDED_FIELDS = {'password'}
+EVENT_FIELDS = ('occurred_at', 'actor_id', 'actor_name', 'action', 'model', 'object_id', 'changes', 'ip_address')
+
+
+def values(instance):
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname not in EXCLUDED_FIELDS
+    }
+
+
+def diff(before, after):
+    """
+    `{field: [old, new]}` for the fields whose value differs.
+    """
+    return {
+        name: [before.get(name), after.get(name)]
+        for name in {**before, **after}
+        if before.get(name) != after.get(name)
+    }
+
+
+def save(events):
+    """
+    Write `events` to the audit table in one transaction, so a failure leaves
+    none of them behind to be duplicated when the fallback file is replayed.
+    Appends them to the fallback file instead when the database refuses them.
+    """
+    try:
+        with transaction.atomic():
+            AuditEvent.objects.bulk_create(events, batch_size=500)
+    except Exception:
+        logger.exception("Could not write %d audit events; appending them to %s.",
+                         len(events), settings.AUDIT_FALLBACK_PATH)
+        try:
+            write_fallback(events)
+        except OSError:
+            logger.critical("Could not write %d audit events to %s; they are lost.",
+                            len(events), settings.AUDIT_FALLBACK_PATH, exc_info=True)
+
+
+def write_fallback(events):
+    """
+    Append `events` to the fallback file and fsync it.
+    """
+    data = ''.join(
+        json.dumps({name: getattr(event, name) for name in EVENT_FIELDS}, cls=DjangoJSONEncoder) + '\n'
+        for event in events
+    ).encode()
+    fd = os.open(settings.AUDIT_FALLBACK_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, data)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class AuditBuffer:
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopping = False
+        self.thread = None
+        self.pid = None
+        self.dropped = 0
+
+    def add(self, event):
+        with self.lock:
+            if self.pid != os.getpid():
+                # First event in this process (or in a forked worker, whose
+                # copy of the parent's queue is the parent's to write).
+                self.pid = os.getpid()
+                self.events = []
+                self.thread = None
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='audit-flusher', daemon=True)
+                self.thread.start()
+            if len(self.events) >= settings.AUDIT_MAX_QUEUED:
+                self.dropped += 1
+                return
+            self.events.append(event)
+            if len(self.events) >= settings.AUDIT_BUFFER_SIZE:
+                self.wake.set()
+
+    def run(self):
+        while not self.stopping:
+            self.wake.wait(settings.AUDIT_FLUSH_SECONDS)
+            self.wake.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                # Keep the thread alive; the next round retries with new events.
+                logger.exception("Audit flush failed.")
+
+    def flush(self):
+        """
+        Write every queued event; on failure, append them to the fallback file.
+        Returns the number of events taken off the queue.
+        """
+        with self.lock:
+            events, self.events = self.events, []
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.error("Dropped %d audit events: more than AUDIT_MAX_QUEUED were waiting.", dropped)
+        if not events:
+            return 0
+        save(events)
+        return len(events)
+
+    def stop(self):
+        """
+        Flush what is left at process exit. The fallback file is used when
+        the database is unavailable.
+        """
+        if self.pid != os.getpid():
+            return
+        self.stopping = True
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+        with self.lock:
+            events, self.events = self.events, []
+        if events:
+            save(events)
+
+
+buffer = AuditBuffer()
+atexit.register(buffer.stop)
+
+
+def record(action, model, object_id, changes=None, request=None, actor=None):
+    """
+    Audit `action` on the row `object_id` of `model` (a model class or
+    instance) by `actor`, or by the user of `request`. Queued when the current
+    transaction commits.
+    """
+    if not settings.AUDIT_ENABLED:
+        return
+    ip_address = None
+    if request is not None:
+        actor = request.user
+        ip_address = request.META.get('REMOTE_ADDR') or None
+    if actor is not None and not actor.is_authenticated:
+        actor = None
+    event = AuditEvent(
+        occurred_at=timezone.now(),
+        actor_id=actor.pk if actor else None,
+        actor_name=actor.get_username() if actor else '',
+        action=action,
+        model=model._meta.model_name,
+        object_id=object_id,
+        changes=changes or {},
+        ip_address=ip_address,
+    )
+    transaction.on_commit(lambda: buffer.add(event))
+
+
+class AuditedMixin:
+    """
+    ViewSet mixin recording creates, updates and deletes in the audit trail,
+    with the changed fields. Place it before mixins that override the
+    `perform_*` hooks so their writes are included.
+    """
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        instance = serializer.instance
+        record(AuditEvent.CREATE, instance, instance.pk, diff({}, values(instance)), request=self.request)
+
+    def perform_update(self, serializer):
+        before = values(serializer.instance)
+        super().perform_update(serializer)
+        changes = diff(before, values(serializer.instance))
+        if changes:
+            record(AuditEvent.UPDATE, serializer.instance, serializer.instance.pk, changes, request=self.request)
+
+    def perform_destroy(self, instance):
+        before = values(instance)
+        object_id = instance.pk
+        super().perform_destroy(instance)
+        record(AuditEvent.DELETE, instance, object_id, diff(before, {}), request=self.request)
+
+
+class AuditedAdminMixin:
+    """
+    ModelAdmin mixin recording saves and deletes made through the admin,
+    bulk "delete selected" included, in the audit trail.
+    """
+
+    def save_model(self, request, obj, form, change):
+        before = {}
+        if change:
+            original = type(obj)._base_manager.filter(pk=obj.pk).first()
+            before = values(original) if original is not None else {}
+        super().save_model(request, obj, form, change)
+        changes = diff(before, values(obj))
+        if changes or not change:
+            action = AuditEvent.UPDATE if change else AuditEvent.CREATE
+            record(action, obj, obj.pk, changes, request=request)
+
+    def delete_model(self, request, obj):
+        before = values(obj)
+        object_id = obj.pk
+        super().delete_model(request, obj)
+        record(AuditEvent.DELETE, obj, object_id, diff(before, {}), request=request)
+
+    def delete_queryset(self, request, queryset):
+        deleted = [(obj.pk, values(obj)) for obj in queryset]
+        super().delete_queryset(request, queryset)
+        for object_id, before in deleted:
+            record(AuditEvent.DELETE, queryset.model, object_id, diff(before, {}), request=request)
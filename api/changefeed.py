@@ -0,0 +1,121 @@
+"""
+Change feed receivers.
+
+Every create, update and delete of a Book, Author or BorrowRecord appends a
+ChangeEvent. Receivers run inside the writing transaction (the tracked models
+use AtomicSaveMixin, and deletes are always atomic), so an event exists if and
+only if its change was committed. Book saves that flip `availability` are
+recorded with the `availability` action, and borrow records moved out by
+`archive_borrow_records` with the `archive` action.
+
+Sequence numbers are taken when an event is written but become visible when
+its transaction commits, so a reader can see seq 12 before seq 11. Cursors
+therefore only advance through unbroken runs of seqs (see `settled_seq`).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from books.models import Author, Book
+from members.models import BorrowRecord
+from .models import ChangeEvent
+
+TRACKED_MODELS = {
+    Book: 'book',
+    Author: 'author',
+    BorrowRecord: 'borrowrecord',
+}
+
+
+def snapshot(instance):
+    return {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def remember_availability(sender, instance, **kwargs):
+    instance._saved_availability = instance.availability
+
+
+def record_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    action = ChangeEvent.CREATE if created else ChangeEvent.UPDATE
+    if sender is Book and not created and instance.availability != instance._saved_availability:
+        action = ChangeEvent.AVAILABILITY
+    if sender is Book:
+        instance._saved_availability = instance.availability
+    ChangeEvent.objects.create(
+        model=TRACKED_MODELS[sender],
+        object_id=instance.pk,
+        action=action,
+        data=snapshot(instance),
+    )
+
+
+def record_delete(sender, instance, **kwargs):
+    ChangeEvent.objects.create(
+        model=TRACKED_MODELS[sender],
+        object_id=instance.pk,
+        action=ChangeEvent.DELETE,
+        data=None,
+    )
+
+
+def record_bulk(model, rows, action):
+    """
+    Append events for rows changed with `QuerySet.update()`, which sends no
+    signals. `rows` are `.values()` dicts read after the update, inside the
+    same transaction.
+    """
+    ChangeEvent.objects.bulk_create(
+        [
+            ChangeEvent(model=TRACKED_MODELS[model], object_id=row['id'], action=action, data=row)
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+def settled_seq(since, scan=None):
+    """
+    How far past `since` a cursor can safely advance: the last seq before the
+    first missing one, scanning at most `scan` events. Returns `(seq, waiting)`,
+    where `waiting` is whether the scan stopped at a missing seq.
+
+    A missing seq belongs to a transaction that has not committed yet, or to
+    one that rolled back. Once the event after it is older than
+    CHANGE_FEED_GAP_TIMEOUT_SECONDS the seq is taken to be rolled back and
+    skipped, so transactions writing tracked rows must commit within that time.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_GAP_TIMEOUT_SECONDS)
+    events = ChangeEvent.objects.filter(seq__gt=since).order_by('seq').values_list('seq', 'created_at')
+    if scan is not None:
+        events = events[:scan]
+    settled = since
+    for seq, created_at in events.iterator(chunk_size=5000):
+        if seq != settled + 1 and created_at > cutoff:
+            return settled, True
+        settled = seq
+    return settled, False
+
+
+def current_seq():
+    """
+    A cursor for a reader that has just loaded the current rows: every event
+    after it is visible now or belongs to a transaction still in progress.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_GAP_TIMEOUT_SECONDS)
+    # Older events are settled by definition; only the recent tail can have gaps.
+    start = (
+        ChangeEvent.objects.filter(created_at__lte=cutoff)
+        .order_by('-seq').values_list('seq', flat=True).first()
+    ) or 0
+    return settled_seq(start)[0]
+
+
+def connect():
+    post_init.connect(remember_availability, sender=Book, dispatch_uid='changefeed_book_init')
+    for model in TRACKED_MODELS:
+        post_save.connect(record_save, sender=model, dispatch_uid=f'changefeed_save_{model.__name__}')
+        post_delete.connect(record_delete, sender=model, dispatch_uid=f'changefeed_delete_{model.__name__}')
@@ -0,0 +1,69 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The resource was modified by someone else. Fetch it again and retry."
+    default_code = 'precondition_failed'
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+def parse_if_match(value):
+    """
+    The version named by an If-Match header, or None for `*`. Unknown tags
+    match nothing. Weak tags (`W/"3"`, as sent on compressed responses) are
+    accepted: the tag names the row version, not the response bytes.
+    """
+    value = value.strip()
+    if value == '*':
+        return None
+    tag = value.removeprefix('W/').strip('"')
+    return int(tag) if tag.isdigit() else -1
+
+
+class OptimisticConcurrencyMixin:
+    """
+    ViewSet mixin for models using `api.db.VersionedMixin`.
+
+    `retrieve`, `update` and `partial_update` responses carry an `ETag` with
+    the row's version. Updates write only the fields that actually change,
+    with `UPDATE ... WHERE version = n`: n is the version given in `If-Match`
+    or, without the header, the version this request read. If another write
+    got there first the response is 412 and nothing is written.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag(response.data['version'])
+        return response
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag(response.data['version'])
+        return response
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        expected = instance.version
+        if_match = self.request.headers.get('If-Match')
+        if if_match is not None:
+            wanted = parse_if_match(if_match)
+            if wanted is not None and wanted != expected:
+                raise PreconditionFailed()
+
+        changed = [
+            name for name, value in serializer.validated_data.items()
+            if getattr(instance, name) != value
+        ]
+        if not changed:
+            return
+        for name in changed:
+            setattr(instance, name, serializer.validated_data[name])
+        if not instance.save_if_version(expected, changed):
+            raise PreconditionFailed()
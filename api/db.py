@@ -0,0 +1,81 @@
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+
+
+def delete_rows(model, ids):
+    """
+    Delete the rows of `model` whose primary key is in `ids` with a single
+    `DELETE` statement, and return how many went. Unlike `QuerySet.delete()`
+    nothing is collected: no `post_delete` receivers run and no cascades are
+    followed, so the caller deletes dependent rows first and does whatever
+    bookkeeping the receivers would have done.
+    """
+    if not ids:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} IN ({placeholders})",
+            list(ids),
+        )
+        return cursor.rowcount
+
+
+class AtomicSaveMixin:
+    """
+    Model mixin that runs `save()` inside a transaction, so rows written by
+    post_save receivers (such as the change feed) commit or roll back together
+    with the saved row even when the caller did not open a transaction.
+    """
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class VersionedMixin:
+    """
+    Model mixin for rows carrying a `version` counter that every write bumps,
+    so clients can detect concurrent changes (see `api.concurrency`).
+    """
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+
+    def save_if_version(self, expected_version, update_fields):
+        """
+        Write only `update_fields`, and only if the row is still at
+        `expected_version`, in a single conditional UPDATE. Sends the usual
+        save signals on success. Returns False, writing nothing, if another
+        write got there first.
+        """
+        model = type(self)
+        using = router.db_for_write(model, instance=self)
+        values = {
+            self._meta.get_field(name).attname: getattr(self, self._meta.get_field(name).attname)
+            for name in update_fields
+        }
+        with transaction.atomic(using=using, savepoint=False):
+            updated = model._base_manager.using(using).filter(pk=self.pk, version=expected_version).update(
+                version=F('version') + 1, **values
+            )
+            if not updated:
+                return False
+            self.version = expected_version + 1
+            post_save.send(
+                sender=model,
+                instance=self,
+                created=False,
+                update_fields=frozenset(update_fields) | {'version'},
+                raw=False,
+                using=using,
+            )
+        return True
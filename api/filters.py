@@ -0,0 +1,22 @@
+import django_filters
+
+from .models import AuditEvent
+
+
+class AuditEventFilter(django_filters.FilterSet):
+    """
+    Filters for the audit trail.
+
+    - model: `book`, `author`, `member` or `borrowrecord`.
+    - object_id: Primary key of the audited row.
+    - action: `create`, `update`, `delete`, `borrow` or `return`.
+    - actor: User ID.
+    - actor_name: Username, exact.
+    - occurred_after / occurred_before: ISO 8601 timestamps, inclusive.
+    """
+    occurred_after = django_filters.IsoDateTimeFilter(field_name='occurred_at', lookup_expr='gte')
+    occurred_before = django_filters.IsoDateTimeFilter(field_name='occurred_at', lookup_expr='lte')
+
+    class Meta:
+        model = AuditEvent
+        fields = ['model', 'object_id', 'action', 'actor', 'actor_name']
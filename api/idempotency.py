@@ -0,0 +1,124 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http.request import RawPostDataException
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+# Response headers kept with a stored response and sent again on replay.
+STORED_HEADERS = ('Location', 'ETag', 'Content-Location')
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still being processed."
+    default_code = 'idempotency_key_in_use'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used with a different request body."
+    default_code = 'idempotency_key_reused'
+
+
+class IdempotentReplay(Exception):
+    """
+    Raised from `initial()` to short-circuit the handler with a stored response.
+    """
+
+    def __init__(self, entry):
+        self.entry = entry
+
+
+class IdempotentMixin:
+    """
+    ViewSet mixin that honours an `Idempotency-Key` header on `idempotent_actions`.
+
+    The first request with a key claims it, runs normally, and its response
+    (status, body and STORED_HEADERS) is kept in the `idempotency` cache for
+    IDEMPOTENCY_TTL_SECONDS. Retries with the same key, user, method and path
+    get that response back, marked with an `Idempotent-Replayed: true` header,
+    without running the action again. Keys are per user. A retry that arrives
+    while the first request is still running gets 409; reusing a key with a
+    different body gets 422. Server errors are not stored, so the client may
+    retry them with the same key.
+    """
+    idempotent_actions = ('create', 'update', 'partial_update', 'destroy')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.idempotency_key = None
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or self.action not in self.idempotent_actions:
+            return
+
+        store = caches[settings.IDEMPOTENCY_CACHE]
+        cache_key = hashlib.sha256(
+            f"{request.user.pk}:{request.method}:{request.path}:{key}".encode()
+        ).hexdigest()
+        try:
+            body = request.body
+        except RawPostDataException:
+            # Something already parsed the stream; fingerprint the parsed data instead.
+            body = json.dumps(request.data, sort_keys=True, default=str).encode()
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        claim = {'fingerprint': fingerprint, 'status': None}
+        if not store.add(cache_key, claim, settings.IDEMPOTENCY_LOCK_SECONDS):
+            entry = store.get(cache_key)
+            if entry is None:
+                # Expired between the two calls; treat as a fresh claim.
+                store.add(cache_key, claim, settings.IDEMPOTENCY_LOCK_SECONDS)
+            elif entry['fingerprint'] != fingerprint:
+                raise IdempotencyKeyReused()
+            elif entry['status'] is None:
+                raise IdempotencyKeyInUse()
+            else:
+                raise IdempotentReplay(entry)
+        self.idempotency_key = (cache_key, fingerprint)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # An unhandled exception becomes a 500 without passing through
+            # finalize_response(); free the key so the client can retry.
+            idempotency_key = getattr(self, 'idempotency_key', None)
+            if idempotency_key is not None:
+                self.idempotency_key = None
+                caches[settings.IDEMPOTENCY_CACHE].delete(idempotency_key[0])
+
+    def handle_exception(self, exc):
+        if isinstance(exc, IdempotentReplay):
+            response = Response(exc.entry['data'], status=exc.entry['status'], headers=exc.entry.get('headers'))
+            response[REPLAYED_HEADER] = 'true'
+            return response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        idempotency_key = getattr(self, 'idempotency_key', None)
+        if idempotency_key is not None:
+            self.idempotency_key = None
+            cache_key, fingerprint = idempotency_key
+            store = caches[settings.IDEMPOTENCY_CACHE]
+            if response.status_code >= 500:
+                store.delete(cache_key)
+            else:
+                store.set(
+                    cache_key,
+                    {
+                        'fingerprint': fingerprint,
+                        'status': response.status_code,
+                        'data': response.data,
+                        'headers': {name: response[name] for name in STORED_HEADERS if response.has_header(name)},
+                    },
+                    settings.IDEMPOTENCY_TTL_SECONDS,
+                )
+        return response
@@ -0,0 +1,153 @@
+import base64
+import random
+from datetime import timedelta
+from email.mime.base import MIMEBase
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """
+    Email backend that stores messages in the OutboundEmail queue instead of
+    sending them, so callers such as djoser's activation and password reset
+    flows never wait on the mail server. Attachments given as (filename,
+    content, mimetype) are stored with the message; MIME part attachments
+    are rejected with ValueError.
+    """
+
+    def send_messages(self, email_messages):
+        queued = [to_queued(message) for message in email_messages if message.recipients()]
+        OutboundEmail.objects.bulk_create(queued)
+        return len(queued)
+
+
+def to_queued(message):
+    html_body = ''
+    for content, mimetype in getattr(message, 'alternatives', []):
+        if mimetype == 'text/html':
+            html_body = content
+    return OutboundEmail(
+        subject=message.subject,
+        body=message.body,
+        html_body=html_body,
+        from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(message.to),
+        cc=list(message.cc),
+        bcc=list(message.bcc),
+        reply_to=list(message.reply_to),
+        headers=dict(message.extra_headers),
+        attachments=[to_stored_attachment(attachment) for attachment in message.attachments],
+    )
+
+
+def to_stored_attachment(attachment):
+    if isinstance(attachment, MIMEBase):
+        raise ValueError("Queued email cannot store MIME part attachments; attach (filename, content, mimetype).")
+    filename, content, mimetype = attachment
+    if isinstance(content, str):
+        content = content.encode()
+    return {'filename': filename, 'content': base64.b64encode(content).decode('ascii'), 'mimetype': mimetype}
+
+
+def to_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        cc=email.cc,
+        bcc=email.bcc,
+        reply_to=email.reply_to,
+        headers=email.headers,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    for attachment in email.attachments:
+        message.attach(attachment['filename'], base64.b64decode(attachment['content']), attachment['mimetype'])
+    return message
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff with jitter: base, 2 x base, 4 x base, ... capped at one day.
+    """
+    delay = min(settings.EMAIL_QUEUE_RETRY_BASE_SECONDS * 2 ** (attempts - 1), 86400)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_batch(batch_size):
+    """
+    Lease up to `batch_size` due messages to the calling worker.
+
+    Claimed rows are pushed out by EMAIL_QUEUE_LEASE_SECONDS so other workers
+    skip them; if this worker dies the lease simply expires and the messages
+    are picked up again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        lease_until = now + timedelta(seconds=settings.EMAIL_QUEUE_LEASE_SECONDS)
+        for email in emails:
+            email.attempts += 1
+            email.next_attempt_at = lease_until
+        OutboundEmail.objects.bulk_update(emails, ['attempts', 'next_attempt_at'])
+    return emails
+
+
+def deliver(emails, connection):
+    """
+    Send `emails` over the already open `connection`, recording the outcome of each.
+    Returns the number sent.
+
+    If something unexpected cuts the batch short, the messages not yet tried
+    are released at once rather than left leased for EMAIL_QUEUE_LEASE_SECONDS,
+    and the error is re-raised.
+    """
+    sent = done = 0
+    try:
+        for email in emails:
+            try:
+                if connection.send_messages([to_message(email, connection)]) != 1:
+                    raise RuntimeError("Mail backend did not accept the message.")
+            except Exception as exc:
+                email.last_error = f"{type(exc).__name__}: {exc}"
+                if email.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+                    email.status = OutboundEmail.FAILED
+                else:
+                    email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                done += 1
+                # The server may have dropped us; reconnect for the rest of the batch.
+                # If that fails too, the next send raises and is recorded the same way.
+                connection.close()
+                try:
+                    connection.open()
+                except Exception:
+                    pass
+            else:
+                email.status = OutboundEmail.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                sent += 1
+                done += 1
+    finally:
+        for email in emails[done:]:
+            email.attempts -= 1
+            email.next_attempt_at = timezone.now()
+        OutboundEmail.objects.bulk_update(emails, ['status', 'sent_at', 'next_attempt_at', 'last_error', 'attempts'])
+    return sent
+
+
+def delivery_connection():
+    return get_connection(settings.EMAIL_QUEUE_DELIVERY_BACKEND, fail_silently=False)
@@ -0,0 +1,162 @@
+import random
+import threading
+import time
+from statistics import quantiles
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection
+
+from books.models import Author, Book
+from members.circulation import CirculationError, borrow_book, bulk_return, return_book
+from members.models import BorrowRecord, CategoryDailyLoanStats, Member
+from members.views import borrow_history
+
+CATEGORY = 'Benchmark'
+DEFAULT_MIX = 'catalog=60,retrieve=20,borrow=8,return=8,history=4'
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in Worker.operations or not weight.isdigit():
+            raise CommandError(f"Bad --mix entry {part!r}; use e.g. {DEFAULT_MIX}.")
+        mix[name] = int(weight)
+    return mix
+
+
+class Worker(threading.Thread):
+    operations = ('catalog', 'retrieve', 'borrow', 'return', 'history')
+
+    def __init__(self, member, book_ids, mix, deadline, seed):
+        super().__init__()
+        self.member = member
+        self.book_ids = book_ids
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.loans = []
+        self.timings = {name: [] for name in self.operations}
+        self.conflicts = 0
+        self.errors = 0
+
+    def run(self):
+        try:
+            while time.perf_counter() < self.deadline:
+                name = self.random.choices(self.names, self.weights)[0]
+                if name == 'return' and not self.loans:
+                    name = 'borrow'
+                started = time.perf_counter()
+                try:
+                    getattr(self, f'run_{name}')()
+                except CirculationError:
+                    self.conflicts += 1
+                except DatabaseError:
+                    # e.g. "database is locked" once busy_timeout runs out.
+                    self.errors += 1
+                    continue
+                self.timings[name].append(time.perf_counter() - started)
+        finally:
+            connection.close()
+
+    def run_catalog(self):
+        list(Book.objects.filter(category=CATEGORY, availability=True).select_related('author')[:20])
+
+    def run_retrieve(self):
+        Book.objects.select_related('author').get(pk=self.random.choice(self.book_ids))
+
+    def run_borrow(self):
+        book = Book(pk=self.random.choice(self.book_ids))
+        borrow_book(self.member, book)
+        self.loans.append(book)
+
+    def run_return(self):
+        return_book(self.member, self.loans.pop())
+
+    def run_history(self):
+        list(borrow_history(member=self.member)[:20])
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a mixed catalog and circulation workload against the configured "
+        "database and report throughput and latency per operation. Run it once "
+        "per database (e.g. DB_ENGINE=sqlite and DB_ENGINE=postgresql) to compare "
+        "them. Creates its own books, in the 'Benchmark' category, and members, "
+        "and removes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent clients.")
+        parser.add_argument('--seconds', type=float, default=20.0, help="How long to run.")
+        parser.add_argument('--books', type=int, default=2000)
+        parser.add_argument('--mix', default=DEFAULT_MIX, help="Relative weight of each operation.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        self.describe_database()
+
+        author = Author.objects.create(name="Benchmark author")
+        Book.objects.bulk_create([
+            Book(title=f"Benchmark book {i}", author=author, ISBN=f"B{i:012d}", category=CATEGORY)
+            for i in range(options['books'])
+        ], batch_size=500)
+        book_ids = list(Book.objects.filter(author=author).values_list('id', flat=True))
+        members = Member.objects.bulk_create([
+            Member(username=f"bench-{i}", email=f"bench-{i}@example.invalid", is_active=False)
+            for i in range(options['threads'])
+        ])
+        members = list(Member.objects.filter(username__in=[m.username for m in members]))
+
+        try:
+            deadline = time.perf_counter() + options['seconds']
+            workers = [
+                Worker(member, book_ids, mix, deadline, options['seed'] + i)
+                for i, member in enumerate(members)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            close_old_connections()
+            self.report(workers, options['seconds'])
+        finally:
+            bulk_return(BorrowRecord.objects.filter(member__in=members, returned_at__isnull=True))
+            Member.objects.filter(pk__in=[m.pk for m in members]).delete()
+            Book.all_objects.filter(author=author).delete()
+            author.delete()
+            CategoryDailyLoanStats.objects.filter(category=CATEGORY).delete()
+
+    def describe_database(self):
+        line = f"Database: {connection.vendor}"
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                pragmas = []
+                for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size'):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    pragmas.append(f"{pragma}={cursor.fetchone()[0]}")
+            mode = connection.settings_dict['OPTIONS'].get('transaction_mode') or 'DEFERRED'
+            line += f" ({', '.join(pragmas)}, BEGIN {mode})"
+        self.stdout.write(line)
+
+    def report(self, workers, seconds):
+        total = 0
+        self.stdout.write(f"{'operation':<10} {'count':>8} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name in Worker.operations:
+            timings = sorted(t for worker in workers for t in worker.timings[name])
+            if not timings:
+                continue
+            total += len(timings)
+            cuts = quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+            self.stdout.write(
+                f"{name:<10} {len(timings):>8} {len(timings) / seconds:>9.1f} "
+                f"{cuts[49] * 1000:>8.2f} {cuts[94] * 1000:>8.2f} {cuts[98] * 1000:>8.2f}"
+            )
+        conflicts = sum(worker.conflicts for worker in workers)
+        errors = sum(worker.errors for worker in workers)
+        self.stdout.write(
+            f"Total: {total / seconds:.1f} ops/s with {len(workers)} threads; "
+            f"{conflicts} borrow conflicts, {errors} database errors"
+        )
@@ -0,0 +1,98 @@
+import gzip
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.middleware import brotli
+from api.renderers import ColumnarJSONRenderer, MessagePackRenderer, msgpack
+from books.models import Author, Book
+from books.serializers import BookSerializer
+from members.models import BorrowRecord, Member
+from members.serializers import BorrowRecordSerializer
+
+CATEGORIES = ['Fiction', 'Science', 'History', 'Poetry', 'Biography', 'Children', 'Travel', 'Philosophy']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare payload size and encode time of the JSON, columnar JSON and "
+        "MessagePack renderers, raw and compressed, on synthetic `/books/` and "
+        "`/records/` lists. Nothing is written to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5, help="Encodes per format; the fastest is reported.")
+
+    def handle(self, *args, **options):
+        count = options['rows']
+        authors = [
+            Author(id=i, name=f"Author {i}", biography=f"Biography of author {i}.", version=1)
+            for i in range(1, count // 10 + 2)
+        ]
+        books = [
+            Book(
+                id=i, title=f"Book title {i}", author=authors[i % len(authors)], ISBN=f"978{i:010d}",
+                category=CATEGORIES[i % len(CATEGORIES)], availability=i % 3 != 0, version=1,
+            )
+            for i in range(1, count + 1)
+        ]
+        now = timezone.now()
+        members = [Member(id=i, username=f"member{i}") for i in range(1, count // 20 + 2)]
+        records = [
+            BorrowRecord(
+                id=i, member=members[i % len(members)], book=books[i - 1],
+                borrowed_at=now - timedelta(days=i % 30), due_date=now + timedelta(days=14 - i % 30),
+                returned_at=now if i % 2 else None, overdue_days=max(0, i % 30 - 14), fine=Decimal('0.00'),
+            )
+            for i in range(1, count + 1)
+        ]
+
+        renderers = [('json', JSONRenderer()), ('columnar', ColumnarJSONRenderer())]
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+        else:
+            self.stdout.write("msgpack is not installed; skipping MessagePack.")
+        if brotli is None:
+            self.stdout.write("brotli is not installed; skipping brotli.")
+
+        for name, serializer_class, objects in (
+            ('books', BookSerializer, books),
+            ('records', BorrowRecordSerializer, records),
+        ):
+            started = time.perf_counter()
+            data = serializer_class(objects, many=True).data
+            serialize_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(f"\n/{name}/: {count} rows, serialized in {serialize_ms:.0f} ms")
+            for format_name, renderer in renderers:
+                self.report(format_name, renderer, data, options['repeat'])
+
+    def timed(self, function, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best * 1000
+
+    def report(self, name, renderer, data, repeat):
+        content, encode_ms = self.timed(lambda: renderer.render(data), repeat)
+        gzipped, gzip_ms = self.timed(
+            lambda: gzip.compress(content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0), repeat
+        )
+        line = (
+            f"  {name:<9} {len(content) / 1024:9.1f} KiB  encode {encode_ms:7.1f} ms"
+            f" | gzip {len(gzipped) / 1024:8.1f} KiB  +{gzip_ms:6.1f} ms"
+        )
+        if brotli is not None:
+            compressed, brotli_ms = self.timed(
+                lambda: brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY), repeat
+            )
+            line += f" | br {len(compressed) / 1024:8.1f} KiB  +{brotli_ms:6.1f} ms"
+        self.stdout.write(line)
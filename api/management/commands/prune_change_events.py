@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import ChangeEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete change feed events older than --days. Clients whose cursor "
+        "predates the retained history get 410 and must resync in full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Keep events from the last this many days.")
+        parser.add_argument('--batch-size', type=int, default=10000, help="Events deleted per statement.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted = 0
+        while True:
+            seqs = list(
+                ChangeEvent.objects.filter(created_at__lt=cutoff)
+                .order_by('seq').values_list('seq', flat=True)[:options['batch_size']]
+            )
+            if not seqs:
+                break
+            deleted += ChangeEvent.objects.filter(seq__in=seqs).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} change events."))
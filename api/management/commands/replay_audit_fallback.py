@@ -0,0 +1,44 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from api.models import AuditEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Load audit events that could not be written to the database from the "
+        "fallback file (AUDIT_FALLBACK_PATH) into the audit table. The file is "
+        "moved aside first, so processes can keep appending to a new one, and "
+        "removed once its events are committed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = settings.AUDIT_FALLBACK_PATH
+        replaying = f"{path}.replaying"
+        # A leftover file from an interrupted run is replayed before a new one is taken.
+        if not os.path.exists(replaying):
+            if not os.path.exists(path):
+                self.stdout.write("No audit events to replay.")
+                return
+            os.replace(path, replaying)
+
+        events = []
+        with open(replaying, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                row['occurred_at'] = parse_datetime(row['occurred_at'])
+                events.append(AuditEvent(**row))
+        with transaction.atomic():
+            AuditEvent.objects.bulk_create(events, batch_size=options['batch_size'])
+        os.remove(replaying)
+        self.stdout.write(self.style.SUCCESS(f"Replayed {len(events)} audit events."))
@@ -0,0 +1,85 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection as db_connection
+
+from api.mail import claim_batch, deliver, delivery_connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued outbound email. Each worker thread keeps one mail "
+        "server connection open and sends claimed messages in batches; failed "
+        "messages are retried with exponential backoff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Number of delivery threads.")
+        parser.add_argument('--batch-size', type=int, default=50, help="Messages claimed per batch.")
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling for new messages instead of exiting once the queue is drained.",
+        )
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds between polls of an empty queue.")
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.sent = self.claimed = 0
+        started = time.perf_counter()
+
+        workers = [
+            threading.Thread(target=self.work, args=(options,), name=f"email-worker-{i}")
+            for i in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for worker in workers:
+                worker.join()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {self.sent} of {self.claimed} claimed messages in {elapsed:.2f}s."
+        ))
+
+    def work(self, options):
+        mail = delivery_connection()
+        try:
+            try:
+                mail.open()
+            except Exception as exc:
+                # Keep going: each message records the failure and is retried later.
+                self.stderr.write(f"Could not connect to the mail server: {exc}")
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    emails = claim_batch(options['batch_size'])
+                except DatabaseError as exc:
+                    self.stderr.write(f"Could not claim messages: {exc}")
+                    self.stop.wait(options['interval'])
+                    continue
+                if emails:
+                    try:
+                        sent = deliver(emails, mail)
+                    except Exception as exc:
+                        # deliver() has released the unsent messages; keep this worker alive.
+                        self.stderr.write(f"Delivery failed: {exc}")
+                        self.stop.wait(options['interval'])
+                        continue
+                    with self.lock:
+                        self.claimed += len(emails)
+                        self.sent += sent
+                elif options['loop']:
+                    self.stop.wait(options['interval'])
+                else:
+                    break
+        finally:
+            mail.close()
+            db_connection.close()
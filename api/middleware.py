@@ -0,0 +1,225 @@
+"""
+Request-level middleware: access logging, compression and rate limit headers.
+"""
+import gzip
+import logging
+import random
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Optional; responses are gzipped without it.
+    brotli = None
+
+access_logger = logging.getLogger('api.access')
+
+
+class QueryCounter:
+    """
+    `connection.execute_wrapper` counting the queries it sees.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class ResponseMiddleware:
+    """
+    Base for middleware that works on the response. Runs natively under WSGI
+    and ASGI, so async views are not pushed onto a thread for its sake.
+    Subclasses implement `process(request, response)`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.process(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process(request, await self.get_response(request))
+
+    def process(self, request, response):
+        return response
+
+
+def add_execute_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def remove_execute_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+class AccessLogMiddleware(ResponseMiddleware):
+    """
+    Log one line per request to the `api.access` logger with the route (URL
+    name), user id, status, latency, database query count and response size
+    (None when streamed). The logger's handler (api.access_log) writes them
+    as JSON lines from a background thread.
+
+    Successful responses faster than ACCESS_LOG_SLOW_MS are sampled at
+    ACCESS_LOG_SAMPLE_RATES[route], else ACCESS_LOG_SAMPLE_RATE; errors and
+    slow requests are always logged. Each line carries its `sample_rate`, so
+    counts can be scaled back up.
+    """
+
+    def __init__(self, get_response):
+        if not settings.ACCESS_LOG_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        return self.log(request, response, started, queries)
+
+    async def __acall__(self, request):
+        queries = QueryCounter()
+        started = time.perf_counter()
+        # Under ASGI a request's sync code, ORM queries included, runs on a
+        # thread of its own; count on that thread's connection.
+        await sync_to_async(add_execute_wrapper)(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(remove_execute_wrapper)(queries)
+        return self.log(request, response, started, queries)
+
+    def log(self, request, response, started, queries):
+        milliseconds = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        route = (match.url_name or match.route) if match else None
+        sample_rate = 1.0
+        if 200 <= response.status_code < 300 and milliseconds < settings.ACCESS_LOG_SLOW_MS:
+            sample_rate = settings.ACCESS_LOG_SAMPLE_RATES.get(route, settings.ACCESS_LOG_SAMPLE_RATE)
+            if random.random() >= sample_rate:
+                return response
+
+        user = getattr(request, 'user', None)
+        access_logger.info('%s %s', request.method, request.path, extra={'access': {
+            'method': request.method,
+            'path': request.path,
+            'route': route,
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'status': response.status_code,
+            'duration_ms': round(milliseconds, 2),
+            # Batched GETs run on pool threads with their own connections (see api.batch).
+            'queries': queries.count + getattr(request, 'batch_pool_queries', 0),
+            'bytes': None if response.streaming else len(response.content),
+            'sample_rate': sample_rate,
+        }})
+        return response
+
+
+ACCEPT_ENCODING = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?')
+
+
+def accepted_encodings(header):
+    """
+    Content codings in an `Accept-Encoding` header with a non-zero q-value.
+    """
+    accepted = set()
+    for part in header.split(','):
+        match = ACCEPT_ENCODING.match(part)
+        if not match:
+            continue
+        try:
+            quality = float(match[2]) if match[2] else 1.0
+        except ValueError:
+            continue
+        if quality > 0:
+            accepted.add(match[1].lower())
+    return accepted
+
+
+class CompressionMiddleware(ResponseMiddleware):
+    """
+    Compress responses of at least COMPRESSION_MIN_BYTES with brotli when the
+    client accepts it and the `brotli` package is installed, else gzip.
+    Streamed responses (server-sent events, files) and responses that already
+    have a `Content-Encoding` are passed through unchanged, as are those that
+    would not get smaller.
+
+    A strong ETag names one exact byte sequence (RFC 9110 8.8.1), so, as
+    Django's GZipMiddleware does, a compressed response's ETag is made weak.
+    It still names the object version: `If-Match` (see api.concurrency)
+    accepts the weak form too.
+
+    Only API responses (paths under COMPRESSION_PATH_PREFIX) in one of
+    COMPRESSION_CONTENT_TYPES are compressed. The admin and the browsable
+    API render HTML with a CSRF token next to reflected input, which
+    compression would expose to BREACH-style length guessing.
+    """
+
+    def process(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not request.path.startswith(settings.COMPRESSION_PATH_PREFIX):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in settings.COMPRESSION_CONTENT_TYPES:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESSION_MIN_BYTES:
+            return response
+
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+            content = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        elif 'gzip' in accepted or '*' in accepted:
+            encoding = 'gzip'
+            content = gzip.compress(response.content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class RateLimitHeadersMiddleware(ResponseMiddleware):
+    """
+    Add `X-RateLimit-Limit`, `X-RateLimit-Remaining` and `X-RateLimit-Reset`
+    (seconds) for the tightest budget the request's throttles checked (see
+    `api.throttling`). Throttled responses also carry DRF's `Retry-After`.
+    """
+
+    def process(self, request, response):
+        states = getattr(request, 'throttle_states', None)
+        if states:
+            limit, remaining, reset = min(states, key=lambda state: state[1] / state[0])
+            response['X-RateLimit-Limit'] = str(limit)
+            response['X-RateLimit-Remaining'] = str(remaining)
+            response['X-RateLimit-Reset'] = str(reset)
+        return response
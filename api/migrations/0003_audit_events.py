@@ -0,0 +1,74 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:12
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_changeevent"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditEvent",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("occurred_at", models.DateTimeField()),
+                ("actor_name", models.CharField(blank=True, max_length=150)),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("create", "Create"),
+                            ("update", "Update"),
+                            ("delete", "Delete"),
+                            ("borrow", "Borrow"),
+                            ("return", "Return"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("model", models.CharField(max_length=30)),
+                ("object_id", models.BigIntegerField(null=True)),
+                (
+                    "changes",
+                    models.JSONField(
+                        default=dict,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                    ),
+                ),
+                ("ip_address", models.GenericIPAddressField(blank=True, null=True)),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["-occurred_at"], name="auditevent_recent_idx"),
+                    models.Index(
+                        fields=["model", "object_id", "-occurred_at"],
+                        name="auditevent_object_idx",
+                    ),
+                    models.Index(
+                        fields=["actor", "-occurred_at"], name="auditevent_actor_idx"
+                    ),
+                    models.Index(
+                        fields=["action", "-occurred_at"], name="auditevent_action_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
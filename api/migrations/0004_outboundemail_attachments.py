@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_audit_events"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outboundemail",
+            name="attachments",
+            field=models.JSONField(default=list),
+        ),
+    ]
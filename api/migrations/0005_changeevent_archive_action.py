@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_outboundemail_attachments"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="changeevent",
+            name="action",
+            field=models.CharField(
+                choices=[
+                    ("create", "Create"),
+                    ("update", "Update"),
+                    ("delete", "Delete"),
+                    ("availability", "Availability change"),
+                    ("archive", "Moved to the archive"),
+                ],
+                max_length=15,
+            ),
+        ),
+    ]
@@ -1,3 +1,128 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class OutboundEmail(models.Model):
+    """
+    Durable outbound email queue.
+
+    Messages are written here by `api.mail.QueuedEmailBackend` and delivered
+    by `manage.py send_queued_email`.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    subject = models.TextField()
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list)
+    bcc = models.JSONField(default=list)
+    reply_to = models.JSONField(default=list)
+    headers = models.JSONField(default=dict)
+    # {filename, content (base64), mimetype} per attachment.
+    attachments = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'],
+                condition=models.Q(status='pending'),
+                name='outboundemail_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+class ChangeEvent(models.Model):
+    """
+    Append-only change feed for catalog and circulation rows.
+
+    Written by `api.changefeed` in the same transaction as the change itself,
+    so `seq` gives clients a cursor for fetching only what changed.
+    """
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    AVAILABILITY = 'availability'
+    ARCHIVE = 'archive'
+    ACTION_CHOICES = [
+        (CREATE, 'Create'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+        (AVAILABILITY, 'Availability change'),
+        (ARCHIVE, 'Moved to the archive'),
+    ]
+
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=15, choices=ACTION_CHOICES)
+    data = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.model} {self.object_id}"
+
+
+class AuditEvent(models.Model):
+    """
+    Audit trail of catalog and circulation mutations.
+
+    Written in batches by `api.audit`, after the change has committed.
+    `actor_name` is kept alongside `actor` so entries outlive the user.
+    """
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    BORROW = 'borrow'
+    RETURN = 'return'
+    ACTION_CHOICES = [
+        (CREATE, 'Create'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+        (BORROW, 'Borrow'),
+        (RETURN, 'Return'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    occurred_at = models.DateTimeField()
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True,
+        on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+    )
+    actor_name = models.CharField(max_length=150, blank=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    model = models.CharField(max_length=30)
+    object_id = models.BigIntegerField(null=True)
+    # `{field: [old, new]}`; old is null for creates and new is null for deletes.
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-occurred_at'], name='auditevent_recent_idx'),
+            models.Index(fields=['model', 'object_id', '-occurred_at'], name='auditevent_object_idx'),
+            models.Index(fields=['actor', '-occurred_at'], name='auditevent_actor_idx'),
+            models.Index(fields=['action', '-occurred_at'], name='auditevent_action_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.occurred_at:%Y-%m-%d %H:%M:%S} {self.actor_name or '-'} {self.action} {self.model} {self.object_id}"
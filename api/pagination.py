@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids `COUNT(*)` on large unfiltered tables.
+
+    On PostgreSQL an unfiltered queryset is counted from the planner's row
+    estimate (`pg_class.reltuples`) once that estimate exceeds
+    ADMIN_ESTIMATED_COUNT_THRESHOLD. The default manager's own filter, such
+    as `ActiveManager` hiding rows queued for deletion, counts as unfiltered;
+    the few hidden rows are within the estimate's error. Filtered querysets,
+    small tables and other databases get an exact count.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and self.unfiltered(queryset):
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                        [queryset.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                    return row[0]
+        return super().count
+
+    @staticmethod
+    def unfiltered(queryset):
+        return queryset.query.where == queryset.model._default_manager.all().query.where
+
+
+class AuditPagination(CursorPagination):
+    """
+    Newest-first cursor pagination for the audit trail; pages stay stable
+    while new events are written and never need a count.
+    """
+    ordering = '-occurred_at'
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 500
@@ -0,0 +1,105 @@
+"""
+Publish/subscribe for live availability events.
+
+`get_broker()` returns the broker named by LIVE_EVENTS_BROKER. The default
+InProcessBroker fans events out to subscribers in the same process, indexed by
+book id and category so a publish only touches interested subscribers. A
+broker backed by a shared system (e.g. Redis pub/sub) only needs the same
+`subscribe`/`unsubscribe`/`publish` interface.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """
+    One subscriber's bounded event queue, bound to the event loop that reads it.
+
+    Publishers may run in any thread; events are handed to the loop with
+    `call_soon_threadsafe`. When a slow client lets the queue fill up, the
+    oldest event is dropped.
+    """
+
+    def __init__(self, book_ids, categories, loop, maxsize):
+        self.book_ids = frozenset(book_ids)
+        self.categories = frozenset(categories)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The subscriber's loop has closed; it is about to unsubscribe.
+            pass
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InProcessBroker:
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._by_book = defaultdict(set)
+        self._by_category = defaultdict(set)
+        self._everything = set()
+
+    def subscribe(self, book_ids=(), categories=()):
+        subscription = Subscription(book_ids, categories, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if not subscription.book_ids and not subscription.categories:
+                self._everything.add(subscription)
+            for book_id in subscription.book_ids:
+                self._by_book[book_id].add(subscription)
+            for category in subscription.categories:
+                self._by_category[category].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._everything.discard(subscription)
+            for index, keys in ((self._by_book, subscription.book_ids), (self._by_category, subscription.categories)):
+                for key in keys:
+                    index[key].discard(subscription)
+                    if not index[key]:
+                        del index[key]
+
+    def publish(self, event):
+        with self._lock:
+            targets = set(self._everything)
+            targets.update(self._by_book.get(event['book_id'], ()))
+            targets.update(self._by_category.get(event['category'], ()))
+        for subscription in targets:
+            subscription.deliver(event)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.LIVE_EVENTS_BROKER)()
+    return _broker
+
+
+def publish_availability(book):
+    get_broker().publish({
+        'book_id': book.pk,
+        'title': book.title,
+        'category': book.category,
+        'availability': book.availability,
+    })
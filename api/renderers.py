@@ -0,0 +1,76 @@
+"""
+Compact response formats, chosen with the `Accept` header (or `?format=`).
+
+- `application/vnd.library.columnar+json` (`?format=columnar`): lists become
+  one array per field, `{"count": n, "columns": {"id": [...], ...}}`, so keys
+  are written once instead of once per row. Nested objects are flattened to
+  dotted columns (`author.name`).
+- `application/msgpack` (`?format=msgpack`): MessagePack, when the optional
+  `msgpack` package is installed.
+
+Anything other than a list of objects (details, errors) is rendered as usual.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import msgpack
+except ImportError:  # Optional; MessagePackRenderer is only enabled when installed.
+    msgpack = None
+
+
+def flatten(row, prefix=''):
+    for key, value in row.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f'{prefix}{key}.')
+        else:
+            yield f'{prefix}{key}', value
+
+
+def columnar(rows):
+    """
+    `rows` (a list of dicts) as `{column: [values]}`. A column missing from a
+    row (e.g. a null nested object) holds None there.
+    """
+    columns = {}
+    for index, row in enumerate(rows):
+        for key, value in flatten(row):
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * index
+            column.append(value)
+        for column in columns.values():
+            if len(column) <= index:
+                column.append(None)
+    return columns
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = 'application/vnd.library.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = {**data, 'results': self.to_columns(data['results'])}
+        elif isinstance(data, list):
+            data = self.to_columns(data)
+        return super().render(data, accepted_media_type, renderer_context)
+
+    def to_columns(self, rows):
+        if not all(isinstance(row, dict) for row in rows):
+            return rows
+        return {'count': len(rows), 'columns': columnar(rows)}
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Dates, decimals, UUIDs and lazy strings as the JSON renderer writes them.
+        return msgpack.packb(data, default=encoders.JSONEncoder().default, use_bin_type=True)
+
@@ -1,3 +1,284 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import caches
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from books.models import Author
+from books.views import AuthorViewSet
+from members.models import Member
+from .changefeed import settled_seq
+from .mail import QueuedEmailBackend, claim_batch, deliver
+from .models import ChangeEvent, OutboundEmail
+from .throttling import CostWeightedThrottle, request_cost
+
+
+class FlakyBackend(LocmemBackend):
+    """
+    Locmem backend whose first `failures` sends raise, like an SMTP server
+    that is briefly unreachable.
+    """
+    failures = 0
+
+    def send_messages(self, messages):
+        if FlakyBackend.failures:
+            FlakyBackend.failures -= 1
+            raise ConnectionRefusedError("Connection refused")
+        return super().send_messages(messages)
+
+
+class BrokenCloseBackend(FlakyBackend):
+    def close(self):
+        raise RuntimeError("close failed")
+
+
+@override_settings(
+    EMAIL_QUEUE_DELIVERY_BACKEND='api.tests.FlakyBackend',
+    EMAIL_QUEUE_RETRY_BASE_SECONDS=60,
+    EMAIL_QUEUE_MAX_ATTEMPTS=3,
+)
+class SendQueuedEmailTests(TransactionTestCase):
+    def setUp(self):
+        mail.outbox = []
+        FlakyBackend.failures = 0
+
+    def queue(self, count=1, **kwargs):
+        messages = [
+            EmailMessage(f"Subject {i}", "Body", 'library@example.com', [f'member{i}@example.com'], **kwargs)
+            for i in range(count)
+        ]
+        return QueuedEmailBackend().send_messages(messages)
+
+    def send(self):
+        call_command('send_queued_email', workers=1, stdout=StringIO(), stderr=StringIO())
+
+    def test_queued_messages_are_delivered(self):
+        self.queue(3)
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.send()
+
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            'member0@example.com', 'member1@example.com', 'member2@example.com',
+        ])
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.SENT).exists())
+
+    def test_failed_send_is_retried_with_backoff(self):
+        self.queue()
+        FlakyBackend.failures = 1
+
+        before = timezone.now()
+        self.send()
+
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.PENDING, 1))
+        self.assertIn('ConnectionRefusedError', email.last_error)
+        # First retry after the base delay, within the ±20% jitter.
+        self.assertGreaterEqual(email.next_attempt_at, before + timedelta(seconds=48))
+        self.assertLessEqual(email.next_attempt_at, timezone.now() + timedelta(seconds=72))
+        self.assertEqual(len(mail.outbox), 0)
+
+        # Not due yet: a second run leaves it alone.
+        self.send()
+        self.assertEqual(OutboundEmail.objects.get().attempts, 1)
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.send()
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), (OutboundEmail.SENT, 2, ''))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_backoff_doubles_and_gives_up_after_max_attempts(self):
+        self.queue()
+        FlakyBackend.failures = 3
+        delays = []
+        for _ in range(3):
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            started = timezone.now()
+            self.send()
+            delays.append((OutboundEmail.objects.get().next_attempt_at - started).total_seconds())
+
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.FAILED, 3))
+        self.assertTrue(48 <= delays[0] <= 72 and 96 <= delays[1] <= 144, delays)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_attachments_are_kept(self):
+        self.queue(attachments=[('loans.csv', 'id,title\n1,Dune\n', 'text/csv'), ('card.png', b'\x89PNG', 'image/png')])
+
+        self.send()
+
+        [message] = mail.outbox
+        self.assertEqual(message.attachments[0][:2], ('loans.csv', 'id,title\n1,Dune\n'))
+        self.assertEqual(message.attachments[1], ('card.png', b'\x89PNG', 'image/png'))
+
+    def test_mime_part_attachments_are_rejected(self):
+        message = EmailMessage("Subject", "Body", 'library@example.com', ['member@example.com'])
+        message.attach(EmailMessage("Inner", "Body").message())
+        with self.assertRaises(ValueError):
+            QueuedEmailBackend().send_messages([message])
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_unexpected_error_releases_the_rest_of_the_batch(self):
+        self.queue(3)
+        FlakyBackend.failures = 1
+        emails = claim_batch(10)
+
+        with self.assertRaises(RuntimeError):
+            deliver(emails, BrokenCloseBackend())
+
+        rows = list(OutboundEmail.objects.order_by('id'))
+        # The failed message was recorded; the two never tried are due again now.
+        self.assertEqual(rows[0].attempts, 1)
+        self.assertIn('ConnectionRefusedError', rows[0].last_error)
+        self.assertEqual([row.attempts for row in rows[1:]], [0, 0])
+        self.assertTrue(all(row.next_attempt_at <= timezone.now() for row in rows[1:]))
+
+
+@override_settings(CHANGE_FEED_GAP_TIMEOUT_SECONDS=60)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(Member.objects.create_superuser('librarian', 'librarian@example.com', 'pw'))
+
+    def events(self, *seqs):
+        for seq in seqs:
+            ChangeEvent.objects.create(seq=seq, model='book', object_id=seq, action=ChangeEvent.UPDATE, data={})
+
+    def age(self, seq, seconds):
+        ChangeEvent.objects.filter(seq=seq).update(created_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_cursor_stops_before_a_recent_gap(self):
+        # Seq 3 belongs to a transaction that has not committed yet.
+        self.events(1, 2, 4)
+
+        self.assertEqual(settled_seq(0), (2, True))
+        response = self.client.get('/api/v1/changes/?since=0')
+        self.assertEqual([event['seq'] for event in response.data['results']], [1, 2])
+        self.assertEqual(response.data['next'], 2)
+        self.assertFalse(response.data['has_more'])
+
+    def test_gap_older_than_the_timeout_is_skipped(self):
+        self.events(1, 2, 4)
+        self.age(4, 120)
+
+        self.assertEqual(settled_seq(0), (4, False))
+        self.assertEqual(self.client.get('/api/v1/changes/?since=2').data['next'], 4)
+
+    def test_scan_limit_bounds_how_far_the_cursor_moves(self):
+        self.events(1, 2, 3)
+
+        self.assertEqual(settled_seq(0, scan=2), (2, False))
+
+    def test_cursor_older_than_the_retained_history_is_gone(self):
+        self.events(10, 11, 12)
+
+        response = self.client.get('/api/v1/changes/?since=5')
+
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.data['next'], 12)
+        # The event right after the cursor is still there.
+        self.assertEqual(self.client.get('/api/v1/changes/?since=9').status_code, 200)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        caches[settings.IDEMPOTENCY_CACHE].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(Member.objects.create_superuser('librarian', 'librarian@example.com', 'pw'))
+
+    def create(self, key, name="Octavia E. Butler"):
+        return self.client.post('/api/v1/authors/', {'name': name}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.create('key-1')
+        retry = self.create('key-1')
+
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Author.objects.count(), 1)
+
+    def test_replay_keeps_response_headers(self):
+        author = Author.objects.create(name="Octavia E. Butler")
+        url = f'/api/v1/authors/{author.pk}/?mode=async'
+
+        first = self.client.delete(url, HTTP_IDEMPOTENCY_KEY='key-1')
+        retry = self.client.delete(url, HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(retry['Location'], first['Location'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        self.create('key-1')
+
+        self.assertEqual(self.create('key-1', name="N. K. Jemisin").status_code, 422)
+
+    def test_failed_request_releases_its_claim(self):
+        with mock.patch.object(AuthorViewSet, 'perform_create', side_effect=RuntimeError("database went away")):
+            with self.assertRaises(RuntimeError):
+                self.create('key-1')
+
+        retry = self.create('key-1')
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertFalse(retry.has_header('Idempotent-Replayed'))
+        self.assertEqual(Author.objects.count(), 1)
+
+
+class RequestCostTests(TestCase):
+    def cost(self, method='GET', **view):
+        return request_cost(SimpleNamespace(method=method), SimpleNamespace(**view))
+
+    def test_view_costs_come_first(self):
+        self.assertEqual(self.cost(action='borrow', throttle_costs={'borrow': 5}), 5)
+        self.assertEqual(self.cost(throttle_costs={'get': 5}), 5)
+
+    def test_lists_cost_less_when_paginated(self):
+        self.assertEqual(self.cost(action='list', paginator=None), settings.THROTTLE_COSTS['list'])
+        self.assertEqual(self.cost(action='list', paginator=object()), settings.THROTTLE_COSTS['paginated_list'])
+
+    def test_anything_else_costs_one(self):
+        self.assertEqual(self.cost(action='retrieve'), 1)
+
+
+@mock.patch.object(CostWeightedThrottle, 'THROTTLE_RATES', {'user': '100/min', 'route': '12/min'})
+@mock.patch('api.throttling.time.time', return_value=6000.0)
+class CostWeightedThrottleTests(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        self.member = Member.objects.create_user('reader', 'reader@example.com', 'pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+
+    def spent(self, scope):
+        return caches[settings.THROTTLE_CACHE].get(f'throttle:{scope}:user:{self.member.pk}:100', 0)
+
+    def test_requests_spend_their_cost(self, _):
+        # The change feed costs 5 units.
+        response = self.client.get('/api/v1/changes/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.spent('user'), self.spent('route:changes')), (5, 5))
+        self.assertEqual(response['X-RateLimit-Remaining'], '7')
+
+    def test_request_rejected_by_one_budget_is_refunded_by_the_others(self, _):
+        self.client.get('/api/v1/changes/')
+        self.client.get('/api/v1/changes/')
+
+        response = self.client.get('/api/v1/changes/')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual((self.spent('user'), self.spent('route:changes')), (10, 10))
@@ -0,0 +1,160 @@
+"""
+Cost-weighted, sliding-window throttles.
+
+Every request spends `request_cost()` units from each applicable budget
+instead of one: an unpaginated list costs more than a single lookup. Budgets
+are the `DEFAULT_THROTTLE_RATES` in REST_FRAMEWORK, read as units per period:
+
+- `user`: per authenticated user.
+- `anon`: per client IP, for anonymous requests.
+- `route`: per user (or IP) per URL name; a rate keyed by the URL name itself,
+  e.g. `books-borrow`, overrides it for that route.
+
+Windows slide: the count is this fixed window's units plus the previous
+window's, weighted by how much of it still overlaps. A request one budget
+rejects spends nothing from the others: later throttles skip it, and earlier
+ones are refunded. Counters live in the
+THROTTLE_CACHE alias: process-local memory by default, or a shared cache
+(e.g. Redis) so that limits hold across workers and nodes.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+def request_cost(request, view):
+    """
+    Units a request spends: the view's `throttle_costs` entry for its action
+    (or lower-cased method for plain API views), else THROTTLE_COSTS, else 1.
+    Lists cost THROTTLE_COSTS['list'] unless paginated.
+    """
+    action = getattr(view, 'action', None) or request.method.lower()
+    costs = getattr(view, 'throttle_costs', {})
+    if action in costs:
+        return costs[action]
+    if action == 'list' and getattr(view, 'paginator', None) is not None:
+        return settings.THROTTLE_COSTS.get('paginated_list', 1)
+    return settings.THROTTLE_COSTS.get(action, 1)
+
+
+class CostWeightedThrottle(SimpleRateThrottle):
+    def __init__(self):
+        # The rate depends on the request (see `get_scope`), so it is resolved in allow_request.
+        self.wait_seconds = None
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE]
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_rate_for(self, scope):
+        return self.THROTTLE_RATES.get(scope)
+
+    def spend(self, key, cost, timeout):
+        try:
+            return self.cache.incr(key, cost)
+        except ValueError:
+            if self.cache.add(key, cost, timeout):
+                return cost
+            return self.cache.incr(key, cost)
+
+    def allow_request(self, request, view):
+        if getattr(request._request, 'throttle_denied', False):
+            # Another budget already rejected the request; spend nothing here.
+            return True
+        scope = self.get_scope(request, view)
+        rate = self.get_rate_for(scope)
+        key = self.get_cache_key(request, view)
+        if rate is None or key is None:
+            return True
+        limit, window = self.parse_rate(rate)
+        cost = min(request_cost(request, view), limit)
+
+        now = time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+        base = f'throttle:{scope}:{key}'
+        current = self.spend(f'{base}:{index}', cost, window * 2)
+        previous = self.cache.get(f'{base}:{index - 1}', 0)
+        overlap = 1 - elapsed / window
+        used = previous * overlap + current
+
+        allowed = used <= limit
+        if allowed:
+            if not hasattr(request._request, 'throttle_spent'):
+                request._request.throttle_spent = []
+            request._request.throttle_spent.append((f'{base}:{index}', cost))
+        else:
+            current -= cost
+            self.wait_seconds = self.time_until_room(limit, window, elapsed, previous, current, cost)
+            request._request.throttle_denied = True
+            self.refund([(f'{base}:{index}', cost), *getattr(request._request, 'throttle_spent', [])])
+        remaining = max(0, int(limit - (used if allowed else used - cost)))
+        # Read by api.middleware.RateLimitHeadersMiddleware.
+        if not hasattr(request._request, 'throttle_states'):
+            request._request.throttle_states = []
+        request._request.throttle_states.append((limit, remaining, int(window - elapsed) + 1))
+        return allowed
+
+    def refund(self, spent):
+        for key, cost in spent:
+            try:
+                self.cache.decr(key, cost)
+            except ValueError:  # Expired meanwhile.
+                pass
+
+    def time_until_room(self, limit, window, elapsed, previous, current, cost):
+        """
+        Seconds until `cost` more units fit, assuming no other traffic.
+        """
+        # Within this window, the previous window's share decays linearly.
+        if previous:
+            needed = window * (previous + current + cost - limit) / previous - elapsed
+            if needed <= window - elapsed:
+                return max(needed, 0)
+        # Otherwise wait for the next window, where this one's units decay instead.
+        later = window * (1 - (limit - cost) / current) if current > limit - cost else 0
+        return (window - elapsed) + max(later, 0)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserCostThrottle(CostWeightedThrottle):
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return None
+
+
+class AnonCostThrottle(CostWeightedThrottle):
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f'ip:{self.get_ident(request)}'
+
+
+class RouteCostThrottle(CostWeightedThrottle):
+    scope = 'route'
+
+    def get_scope(self, request, view):
+        match = request.resolver_match
+        return f'route:{match.url_name}' if match and match.url_name else None
+
+    def get_rate_for(self, scope):
+        if scope is None:
+            return None
+        return self.THROTTLE_RATES.get(scope.removeprefix('route:')) or self.THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
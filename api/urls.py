@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework_nested.routers import DefaultRouter, NestedDefaultRouter
-from books.views import BookViewSet, AuthorViewSet
-from members.views import MemberViewSet, BorrowRecordViewSet
+from books.views import BookViewSet, AuthorViewSet, BranchViewSet, DeletionJobViewSet, availability_stream
+from api.views import AuditEventViewSet, BatchView, ChangeFeedView
+from members.views import MemberViewSet, BorrowRecordViewSet, CirculationAnalyticsViewSet
 
 # Main routers
 router = DefaultRouter()
@@ -9,6 +10,10 @@ router.register(r'authors', AuthorViewSet, basename='authors')
 router.register(r'members', MemberViewSet, basename='members')
 router.register(r'records', BorrowRecordViewSet, basename='borrowrecords')
 router.register(r'books', BookViewSet, basename='books')
+router.register(r'branches', BranchViewSet, basename='branches')
+router.register(r'analytics', CirculationAnalyticsViewSet, basename='analytics')
+router.register(r'deletions', DeletionJobViewSet, basename='deletions')
+router.register(r'audit', AuditEventViewSet, basename='audit')
 
 # Nested routers
 author_books_router = NestedDefaultRouter(router, r'authors', lookup='author')
@@ -18,6 +23,9 @@ member_records_router = NestedDefaultRouter(router, r'members', lookup='member')
 member_records_router.register(r'records', BorrowRecordViewSet, basename='member-records')
 
 urlpatterns = [
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('changes/', ChangeFeedView.as_view(), name='changes'),
+    path('books/stream/', availability_stream, name='books-stream'),
     path('', include(router.urls)),
     path('', include(author_books_router.urls)),
     path('', include(member_records_router.urls)),
@@ -1,3 +1,207 @@
-from django.shortcuts import render
+from django.conf import settings
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import serializers, status, viewsets
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from .batch import run_batch
+from .changefeed import settled_seq
+from .filters import AuditEventFilter
+from .models import AuditEvent, ChangeEvent
+from .pagination import AuditPagination
+from .permissions import IsLibrarianGroupOnly, user_in_group
+
+
+class ChangeEventSerializer(serializers.ModelSerializer):
+    """
+    Serializer for change feed entries.
+
+    Fields:
+    - seq: Monotonic sequence number; pass the last one seen as `since`.
+    - model: `book`, `author` or `borrowrecord`.
+    - object_id: Primary key of the changed row.
+    - action: `create`, `update`, `delete`, `availability`, or `archive` for a
+      borrow record moved to the archive table.
+    - data: Column values after the change (null for deletes).
+    - created_at: Timestamp of the change.
+    """
+    class Meta:
+        model = ChangeEvent
+        fields = ['seq', 'model', 'object_id', 'action', 'data', 'created_at']
+
+
+class ChangeFeedView(APIView):
+    """
+    Incremental change feed for client-side catalog sync.
+
+    Clients start with `since=0`, apply the returned events in order and pass
+    the returned `next` cursor on the following call. Librarians see all
+    events; other users see book and author events only.
+
+    Events are only served up to the first sequence number not yet visible,
+    so a transaction that commits after a later one is not skipped.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_costs = {'get': 5}
+
+    @swagger_auto_schema(
+        operation_summary="Change feed",
+        operation_description=(
+            "Events with a sequence number greater than `since`, oldest first. "
+            "Responds 410 when `since` is older than the retained history; resync in full and restart from `next`."
+        ),
+        manual_parameters=[
+            openapi.Parameter('since', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: ChangeEventSerializer(many=True), 410: "Cursor too old."},
+    )
+    def get(self, request):
+        try:
+            since = max(int(request.query_params.get('since', 0)), 0)
+            limit = int(request.query_params.get('limit', settings.CHANGE_FEED_PAGE_SIZE))
+        except ValueError:
+            return Response({"detail": "`since` and `limit` must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.CHANGE_FEED_PAGE_SIZE))
+
+        oldest = ChangeEvent.objects.order_by('seq').values_list('seq', flat=True).first()
+        if since and oldest and since < oldest - 1:
+            latest = ChangeEvent.objects.order_by('-seq').values_list('seq', flat=True).first()
+            return Response(
+                {"detail": "Cursor is older than the retained change history.", "next": latest},
+                status=status.HTTP_410_GONE,
+            )
+
+        settled, waiting = settled_seq(since, scan=settings.CHANGE_FEED_SCAN_SIZE)
+        events = ChangeEvent.objects.filter(seq__gt=since, seq__lte=settled)
+        user = request.user
+        if not (user.is_superuser or user_in_group(user, "Librarian")):
+            events = events.filter(model__in=['book', 'author'])
+        events = list(events.order_by('seq')[:limit + 1])
+
+        if len(events) > limit:
+            events = events[:limit]
+            cursor, has_more = events[-1].seq, True
+        else:
+            # Everything up to `settled` was returned or is not visible to this user.
+            cursor = settled
+            has_more = not waiting and ChangeEvent.objects.filter(seq__gt=settled).exists()
+        return Response({
+            "results": ChangeEventSerializer(events, many=True).data,
+            "next": cursor,
+            "has_more": has_more,
+        })
+
+
+class BatchCallSerializer(serializers.Serializer):
+    """
+    One call in a batch.
+
+    Fields:
+    - method: HTTP method.
+    - path: Path under /api/v1/, with an optional query string.
+    - body: JSON request body (optional).
+    - headers: Extra headers such as `If-Match`, `Idempotency-Key` or `X-Branch` (optional).
+    """
+    method = serializers.ChoiceField(choices=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'])
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False, allow_null=True)
+    headers = serializers.DictField(child=serializers.CharField(), required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchCallSerializer(many=True)
+
+    def validate_requests(self, value):
+        if not value:
+            raise serializers.ValidationError("Send at least one request.")
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f"At most {settings.BATCH_MAX_REQUESTS} requests per batch.")
+        return value
+
+
+class BatchView(APIView):
+    """
+    Run several API calls in one round trip.
+
+    Calls are dispatched in-process as the requesting user, with each
+    endpoint's own permission checks. Writes run in order on the request's
+    thread and database connection. Consecutive GETs run concurrently on
+    pool threads, each with its own database connection, so unlike the
+    writes they are outside any transaction the request has open and see
+    only committed data; their queries are still counted in the batch's
+    access log line. Every call gets its own result, so one failure does not
+    affect the others.
+    """
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        operation_summary="Batch API calls",
+        operation_description=(
+            "Run up to BATCH_MAX_REQUESTS calls to `/api/v1/` endpoints in one request. "
+            "Responses come back in order as `{status, headers, body}`."
+        ),
+        request_body=BatchSerializer,
+        responses={200: openapi.Response(description="One result per call, in request order.")},
+    )
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        calls = [
+            {**call, 'method': call['method'].upper()}
+            for call in serializer.validated_data['requests']
+        ]
+        return Response({'responses': run_batch(request, calls)})
+
+
+class AuditEventSerializer(serializers.ModelSerializer):
+    """
+    Serializer for audit trail entries.
+
+    Fields:
+    - id: Unique identifier.
+    - occurred_at: When the change was made.
+    - actor: ID of the user who made it (null for system jobs).
+    - actor_name: Username at the time.
+    - action: `create`, `update`, `delete`, `borrow` or `return`.
+    - model / object_id: The changed row.
+    - changes: `{field: [old, new]}`.
+    - ip_address: Client address of the request, if any.
+    """
+    class Meta:
+        model = AuditEvent
+        fields = ['id', 'occurred_at', 'actor', 'actor_name', 'action', 'model', 'object_id', 'changes', 'ip_address']
+
+
+class AuditEventViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Audit trail of catalog and circulation changes (librarians only).
+
+    Events are written a few seconds after the change (see `api.audit`).
+    Newest first, with cursor pagination.
+    """
+    queryset = AuditEvent.objects.all()
+    serializer_class = AuditEventSerializer
+    filterset_class = AuditEventFilter
+    pagination_class = AuditPagination
+    permission_classes = [IsLibrarianGroupOnly]
+
+    @swagger_auto_schema(
+        operation_summary="List audit events",
+        operation_description=(
+            "Creates, updates, deletes, borrows and returns, newest first. Filter with `model`, `object_id`, "
+            "`action`, `actor`, `actor_name`, `occurred_after` and `occurred_before`; follow `next` for older events."
+        ),
+        responses={200: AuditEventSerializer(many=True)},
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_summary="Retrieve audit event",
+        responses={200: AuditEventSerializer()},
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -1,5 +1,64 @@
-from django.contrib import admin
-from .models import Book, Author
+import re
 
-admin.site.register(Book)
-admin.site.register(Author)
+from django.contrib import admin, messages
+
+from api.audit import AuditedAdminMixin
+from api.pagination import EstimatedCountPaginator
+from members import circulation
+from .models import Book, Author, Branch, DeletionJob, LoanPolicy
+
+ISBN_RE = re.compile(r'\d{9}[\dXx](\d{3})?')
+
+
+@admin.register(Author)
+class AuthorAdmin(AuditedAdminMixin, admin.ModelAdmin):
+    list_display = ['name']
+    ordering = ['id']
+    search_fields = ['^name']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Book)
+class BookAdmin(AuditedAdminMixin, admin.ModelAdmin):
+    list_display = ['title', 'author', 'ISBN', 'category', 'availability', 'branch']
+    list_select_related = ['author', 'branch']
+    ordering = ['id']
+    list_filter = ['availability', 'branch']
+    search_fields = ['^title', '^author__name']
+    autocomplete_fields = ['author']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['mark_available', 'mark_unavailable']
+
+    def get_search_results(self, request, queryset, search_term):
+        # A bare ISBN goes straight to the unique index.
+        if ISBN_RE.fullmatch(search_term.strip()):
+            return queryset.filter(ISBN=search_term.strip().upper()), False
+        return super().get_search_results(request, queryset, search_term)
+
+    @admin.action(description="Mark selected books as available")
+    def mark_available(self, request, queryset):
+        changed = circulation.bulk_set_availability(queryset, True, actor=request.user)
+        self.message_user(request, f"{changed} books marked as available.", messages.SUCCESS)
+
+    @admin.action(description="Mark selected books as unavailable")
+    def mark_unavailable(self, request, queryset):
+        changed = circulation.bulk_set_availability(queryset, False, actor=request.user)
+        self.message_user(request, f"{changed} books marked as unavailable.", messages.SUCCESS)
+
+
+admin.site.register(LoanPolicy)
+
+
+@admin.register(Branch)
+class BranchAdmin(admin.ModelAdmin):
+    list_display = ['code', 'name']
+    search_fields = ['code', 'name']
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ['model', 'object_id', 'status', 'deleted', 'total', 'created_at', 'finished_at']
+    list_filter = ['status', 'model']
+    readonly_fields = [field.name for field in DeletionJob._meta.fields]
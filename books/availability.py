@@ -0,0 +1,379 @@
+"""
+Memory-mapped availability bitmap shared by every worker on a node.
+
+The file at AVAILABILITY_BITMAP_PATH holds, for each book id, a "present" bit,
+an "available" bit and a 16-bit category code, plus available/total counters
+for each category. Lookups read the mapping directly and never touch the
+database. Writes happen after commit (see `books.signals` and
+`members.circulation`) under an exclusive `flock`, so concurrent workers never
+interleave read-modify-write cycles.
+
+Layout, all little-endian:
+
+- header (HEADER_SIZE bytes): magic, retired flag, category count, block
+  count, last change feed seq applied;
+- category table: MAX_CATEGORIES slots of (name, available, total), slot 0 unused;
+- blocks of BLOCK_IDS book ids: present bits, available bits, category codes.
+
+The file grows by whole blocks, so existing offsets never move. `manage.py
+rebuild_availability_bitmap` writes a fresh file, swaps it in and marks the old
+one retired; workers notice the flag and reopen the path.
+
+Writes made by workers on other nodes reach the file through the change feed:
+the header keeps the last book event applied, and `sync()` replays newer ones
+at most every AVAILABILITY_BITMAP_SYNC_SECONDS, like `books.snapshot` does for
+its in-memory replicas. A file whose cursor falls behind the pruned feed is
+rebuilt.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+from api.changefeed import current_seq, settled_seq
+from api.models import ChangeEvent
+from .models import Book
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within one process are serialized.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'LMAVAIL1'
+HEADER = struct.Struct('<8sIIQQ')
+RETIRED_OFFSET = 8
+CATEGORY_COUNT_OFFSET = 12
+NBLOCKS_OFFSET = 16
+SEQ_OFFSET = 24
+HEADER_SIZE = 4096
+
+MAX_CATEGORIES = 4096
+CATEGORY_DTYPE = np.dtype([('name', 'S112'), ('available', '<u8'), ('total', '<u8')])
+
+BLOCK_IDS = 1 << 16
+BITS_BYTES = BLOCK_IDS // 8
+BLOCK_SIZE = 2 * BITS_BYTES + 2 * BLOCK_IDS
+DATA_OFFSET = HEADER_SIZE + MAX_CATEGORIES * CATEGORY_DTYPE.itemsize
+
+View = namedtuple('View', 'mm nblocks categories present available codes')
+
+_thread_lock = threading.RLock()
+
+
+def enabled():
+    return bool(settings.AVAILABILITY_BITMAP_PATH)
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Exclusive lock shared by writers and rebuilds in every process on the node.
+    The lock file is never replaced, unlike the bitmap itself.
+    """
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class AvailabilityBitmap:
+    def __init__(self, path):
+        self.path = path
+        self.codes_by_name = {}
+        self.synced_at = 0.0
+        self.view = self._open()
+
+    def _open(self):
+        with open(self.path, 'r+b') as f:
+            mm = mmap.mmap(f.fileno(), 0)
+        magic, _, _, nblocks, _ = HEADER.unpack_from(mm)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an availability bitmap.")
+        blocks = np.ndarray((nblocks, BLOCK_SIZE), np.uint8, buffer=mm, offset=DATA_OFFSET)
+        self.codes_by_name = {}
+        return View(
+            mm=mm,
+            nblocks=nblocks,
+            categories=np.ndarray(MAX_CATEGORIES, CATEGORY_DTYPE, buffer=mm, offset=HEADER_SIZE),
+            present=blocks[:, :BITS_BYTES],
+            available=blocks[:, BITS_BYTES:2 * BITS_BYTES],
+            codes=blocks[:, 2 * BITS_BYTES:].view('<u2'),
+        )
+
+    def current(self):
+        """
+        The mapping to read from, reopened if another process grew or replaced the file.
+        """
+        view = self.view
+        _, retired, _, nblocks, _ = HEADER.unpack_from(view.mm)
+        if retired or nblocks != view.nblocks:
+            with _thread_lock:
+                self.view = view = self._open()
+        return view
+
+    # Reads
+
+    def lookup(self, ids):
+        """
+        Availability of each book id: True, False, or None for unknown ids.
+        """
+        view = self.current()
+        ids = np.asarray(ids, dtype=np.int64)
+        blocks, offsets = ids // BLOCK_IDS, ids % BLOCK_IDS
+        known = (ids >= 0) & (blocks < view.nblocks)
+        blocks, offsets = blocks[known], offsets[known]
+        bits = (offsets % 8).astype(np.uint8)
+        present = (view.present[blocks, offsets // 8] >> bits) & 1
+        available = (view.available[blocks, offsets // 8] >> bits) & 1
+        states = np.full(len(ids), -1, np.int8)
+        states[known] = np.where(present == 1, available, -1)
+        return [None if state < 0 else bool(state) for state in states.tolist()]
+
+    def category_counts(self, names):
+        view = self.current()
+        counts = {}
+        for name in names:
+            code = self.code(view, name, create=False)
+            if code:
+                slot = view.categories[code]
+                counts[name] = {'available': int(slot['available']), 'total': int(slot['total'])}
+            else:
+                counts[name] = {'available': 0, 'total': 0}
+        return counts
+
+    def code(self, view, name, create):
+        """
+        Category code for `name`, 0 if it has none (and cannot be given one).
+        """
+        code = self.codes_by_name.get(name)
+        if code is not None:
+            return code
+        count = struct.unpack_from('<I', view.mm, CATEGORY_COUNT_OFFSET)[0]
+        self.codes_by_name = {
+            stored.decode(): index + 1
+            for index, stored in enumerate(view.categories['name'][1:count + 1].tolist())
+        }
+        if name in self.codes_by_name or not create:
+            return self.codes_by_name.get(name, 0)
+        encoded = name.encode()
+        if len(encoded) > CATEGORY_DTYPE['name'].itemsize or count + 1 >= MAX_CATEGORIES:
+            return 0
+        code = count + 1
+        view.categories[code] = (encoded, 0, 0)
+        struct.pack_into('<I', view.mm, CATEGORY_COUNT_OFFSET, code)
+        self.codes_by_name[name] = code
+        return code
+
+    # Writes
+
+    def update(self, rows):
+        """
+        Store `(book_id, category, availability)` rows.
+        """
+        with file_lock(self.path):
+            self.store(self.current(), rows)
+
+    def remove(self, book_ids):
+        with file_lock(self.path):
+            self.discard(self.current(), book_ids)
+
+    def sync(self):
+        """
+        Apply book events from the change feed newer than the file's cursor,
+        so changes committed through other nodes show up here. Events are
+        applied in order and carry full rows, so replaying one this node
+        already wrote is harmless. Returns the number of events applied.
+        """
+        self.synced_at = time.monotonic()
+        since = struct.unpack_from('<Q', self.current().mm, SEQ_OFFSET)[0]
+        oldest = ChangeEvent.objects.order_by('seq').values_list('seq', flat=True).first()
+        if oldest is not None and since < oldest - 1:
+            logger.warning("Availability bitmap is behind the pruned change feed; rebuilding %s.", self.path)
+            rebuild(self.path)
+            return 0
+        with file_lock(self.path):
+            view = self.current()
+            since = struct.unpack_from('<Q', view.mm, SEQ_OFFSET)[0]
+            settled, _ = settled_seq(since, scan=settings.CHANGE_FEED_SCAN_SIZE)
+            if settled == since:
+                return 0
+            events = (
+                ChangeEvent.objects.filter(seq__gt=since, seq__lte=settled, model='book')
+                .order_by('seq')
+                .values_list('object_id', 'action', 'data')
+            )
+            applied = 0
+            for book_id, action, data in events.iterator(chunk_size=1000):
+                if action == ChangeEvent.DELETE or data['deleted_at'] is not None:
+                    self.discard(view, [book_id])
+                else:
+                    view = self.store(view, [(book_id, data['category'], data['availability'])])
+                applied += 1
+            struct.pack_into('<Q', view.mm, SEQ_OFFSET, settled)
+        return applied
+
+    def sync_if_stale(self):
+        if time.monotonic() - self.synced_at > settings.AVAILABILITY_BITMAP_SYNC_SECONDS:
+            self.sync()
+
+    def store(self, view, rows):
+        """
+        Store rows in `view` under the file lock; returns the view, which
+        changes if the file had to grow.
+        """
+        for book_id, category, availability in rows:
+            if book_id // BLOCK_IDS >= view.nblocks:
+                view = self.grow(view, book_id // BLOCK_IDS + 1)
+            self.clear(view, book_id)
+            code = self.code(view, category, create=True)
+            block, offset = divmod(book_id, BLOCK_IDS)
+            bit = np.uint8(1 << (offset % 8))
+            view.present[block, offset // 8] |= bit
+            if availability:
+                view.available[block, offset // 8] |= bit
+            view.codes[block, offset] = code
+            if code:
+                view.categories['total'][code] += 1
+                view.categories['available'][code] += bool(availability)
+        return view
+
+    def discard(self, view, book_ids):
+        for book_id in book_ids:
+            if book_id // BLOCK_IDS < view.nblocks:
+                self.clear(view, book_id)
+
+    def clear(self, view, book_id):
+        block, offset = divmod(book_id, BLOCK_IDS)
+        bit = np.uint8(1 << (offset % 8))
+        if not view.present[block, offset // 8] & bit:
+            return
+        was_available = bool(view.available[block, offset // 8] & bit)
+        code = view.codes[block, offset]
+        if code:
+            view.categories['total'][code] -= 1
+            view.categories['available'][code] -= was_available
+        view.present[block, offset // 8] &= ~bit
+        view.available[block, offset // 8] &= ~bit
+        view.codes[block, offset] = 0
+
+    def grow(self, view, nblocks):
+        with open(self.path, 'r+b') as f:
+            f.truncate(DATA_OFFSET + nblocks * BLOCK_SIZE)
+        struct.pack_into('<Q', view.mm, NBLOCKS_OFFSET, nblocks)
+        self.view = self._open()
+        return self.view
+
+
+def rebuild(path, if_missing=False):
+    """
+    Write a bitmap of the whole catalog to `path`, replacing any existing file
+    (or, with `if_missing`, only if there is none). Writers wait on the lock
+    for the duration, so no update is lost in between. Returns the number of
+    books written.
+    """
+    with file_lock(path):
+        if if_missing and os.path.exists(path):
+            return 0
+        # Read the cursor first: events that land while loading are replayed by `sync()`.
+        seq = current_seq()
+        rows = list(Book.objects.values_list('id', 'category', 'availability').iterator(chunk_size=5000))
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        names = sorted({
+            row[1] for row in rows if len(row[1].encode()) <= CATEGORY_DTYPE['name'].itemsize
+        })[:MAX_CATEGORIES - 1]
+        code_of = {name: code for code, name in enumerate(names, start=1)}
+        codes = np.array([code_of.get(row[1], 0) for row in rows], dtype=np.uint16)
+        available = np.array([row[2] for row in rows], dtype=bool)
+
+        nblocks = int(ids.max()) // BLOCK_IDS + 1 if len(ids) else 1
+        dense_present = np.zeros(nblocks * BLOCK_IDS, dtype=bool)
+        dense_available = np.zeros(nblocks * BLOCK_IDS, dtype=bool)
+        dense_codes = np.zeros(nblocks * BLOCK_IDS, dtype='<u2')
+        dense_present[ids] = True
+        dense_available[ids] = available
+        dense_codes[ids] = codes
+
+        categories = np.zeros(MAX_CATEGORIES, CATEGORY_DTYPE)
+        categories['name'][1:len(names) + 1] = [name.encode() for name in names]
+        categories['total'] = np.bincount(codes, minlength=MAX_CATEGORIES)
+        categories['available'] = np.bincount(codes[available], minlength=MAX_CATEGORIES)
+        categories[0] = (b'', 0, 0)
+
+        blocks = np.empty((nblocks, BLOCK_SIZE), np.uint8)
+        blocks[:, :BITS_BYTES] = np.packbits(dense_present, bitorder='little').reshape(nblocks, BITS_BYTES)
+        blocks[:, BITS_BYTES:2 * BITS_BYTES] = np.packbits(
+            dense_available, bitorder='little'
+        ).reshape(nblocks, BITS_BYTES)
+        blocks[:, 2 * BITS_BYTES:] = dense_codes.reshape(nblocks, BLOCK_IDS).view(np.uint8)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 0, len(names), nblocks, seq).ljust(HEADER_SIZE, b'\0'))
+            f.write(categories.tobytes())
+            f.write(blocks.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        old = open(path, 'r+b') if os.path.exists(path) else None
+        os.replace(tmp_path, path)
+        if old is not None:
+            with old:
+                old.seek(RETIRED_OFFSET)
+                old.write(struct.pack('<I', 1))
+    return len(rows)
+
+
+_bitmap = None
+
+
+def get_bitmap():
+    """
+    This process's mapping of the node's bitmap, built from the database if the file does not exist yet.
+    """
+    global _bitmap
+    if _bitmap is None:
+        with _thread_lock:
+            if _bitmap is None:
+                path = settings.AVAILABILITY_BITMAP_PATH
+                if not os.path.exists(path):
+                    rebuild(path, if_missing=True)
+                _bitmap = AvailabilityBitmap(path)
+    return _bitmap
+
+
+def record_books(rows):
+    """
+    Store committed `(book_id, category, availability)` rows. A failure is
+    logged rather than raised: the database change has already committed, and
+    `rebuild_availability_bitmap` repairs any drift.
+    """
+    if not enabled():
+        return
+    try:
+        get_bitmap().update(rows)
+    except Exception:
+        logger.exception("Could not update the availability bitmap.")
+
+
+def forget_books(book_ids):
+    if not enabled():
+        return
+    try:
+        get_bitmap().remove(book_ids)
+    except Exception:
+        logger.exception("Could not update the availability bitmap.")
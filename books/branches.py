@@ -0,0 +1,39 @@
+from rest_framework.exceptions import ValidationError
+
+from .models import Branch
+
+BRANCH_HEADER = 'X-Branch'
+BRANCH_PARAM = 'branch'
+
+
+def branch_code(request):
+    return request.query_params.get(BRANCH_PARAM) or request.headers.get(BRANCH_HEADER)
+
+
+def request_branch(request):
+    """
+    The Branch a request is scoped to, from `?branch=<code>` or the
+    `X-Branch` header, or None for an unscoped request.
+    """
+    if not hasattr(request, '_branch'):
+        code = branch_code(request)
+        branch = None
+        if code:
+            branch = Branch.objects.filter(code=code).first()
+            if branch is None:
+                raise ValidationError({'branch': f"Unknown branch '{code}'."})
+        request._branch = branch
+    return request._branch
+
+
+class BranchScopedMixin:
+    """
+    ViewSet mixin that limits the queryset to the request's branch, so a
+    branch-scoped request only reads that branch's rows (and the branch-led
+    indexes).
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        branch = request_branch(self.request)
+        return queryset if branch is None else queryset.filter(branch=branch)
@@ -0,0 +1,55 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Book
+
+FACETS_CACHE_KEY = 'books:facets'
+GENERATION_CACHE_KEY = 'books:generation'
+# Writes invalidate the entry; the timeout only bounds staleness from a read that races a write.
+FACETS_CACHE_TIMEOUT = 3600
+
+
+def catalog_facets(branch=None):
+    """
+    Book counts per category and per availability state, of one `branch` or
+    of the whole catalog, computed with one grouped query and cached until
+    the next catalog write.
+    """
+    if branch is None:
+        key, books = FACETS_CACHE_KEY, Book.objects.all()
+    else:
+        # Keyed by generation rather than deleted, as branches are not known on invalidation.
+        key, books = f'{FACETS_CACHE_KEY}:{branch.pk}:{catalog_generation()}', Book.objects.filter(branch=branch)
+    facets = cache.get(key)
+    if facets is None:
+        categories = Counter()
+        availability = Counter({'available': 0, 'unavailable': 0})
+        rows = books.order_by().values('category', 'availability').annotate(count=Count('id'))
+        for row in rows:
+            categories[row['category']] += row['count']
+            availability['available' if row['availability'] else 'unavailable'] += row['count']
+        facets = {
+            'category': dict(sorted(categories.items())),
+            'availability': dict(availability),
+        }
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+def catalog_generation():
+    """
+    Counter bumped after every committed catalog write. Workers compare it
+    with the value they last saw to decide whether in-process catalog copies
+    need refreshing.
+    """
+    return cache.get(GENERATION_CACHE_KEY, 0)
+
+
+def invalidate_catalog_caches():
+    cache.delete(FACETS_CACHE_KEY)
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.add(GENERATION_CACHE_KEY, 1, None)
@@ -0,0 +1,251 @@
+"""
+Background deletion of authors and books with large cascades.
+
+`schedule()` marks the target deleted (hiding it, and an author's books, from
+the default managers and the catalog) and queues a DeletionJob in one short
+transaction. `process_deletion_jobs` then closes open loans on the affected
+books through `members.circulation`, and removes the target and every row that
+cascades from it, leaves first, a bounded batch of primary keys at a time, so
+no transaction holds more than one batch of rows or locks. Rows are deleted
+with plain `DELETE` statements rather than per-row signals: the job takes
+purged loans off the member counters and rollups itself, and the change feed
+gets one `delete` event per row (the target's from `hide()`).
+
+A failed job can be retried, or cancelled with `restore()`, which brings the
+target back into the catalog.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.changefeed import record_bulk
+from api.db import delete_rows
+from api.models import ChangeEvent
+from members import circulation
+from members.models import ArchivedBorrowRecord, BorrowRecord
+from .availability import forget_books, record_books
+from .cache import invalidate_catalog_caches
+from .models import Author, Book, DeletionJob
+
+MODELS = {
+    DeletionJob.AUTHOR: Author,
+    DeletionJob.BOOK: Book,
+}
+
+
+def cascades(model):
+    """
+    `(related model, field name)` for every foreign key that cascades from `model`,
+    including relations hidden with `related_name='+'`.
+    """
+    return [
+        (field.related_model, field.field.name)
+        for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete
+        and (field.one_to_many or field.one_to_one)
+        and field.on_delete is models.CASCADE
+    ]
+
+
+def hide(model, ids):
+    """
+    Mark rows deleted and drop them from change feed consumers and catalog
+    caches. Hiding authors hides their books too.
+    """
+    with transaction.atomic():
+        if model is Author:
+            book_ids = list(Book.objects.filter(author_id__in=ids).values_list('id', flat=True))
+            if book_ids:
+                hide(Book, book_ids)
+        model.all_objects.filter(pk__in=ids).update(deleted_at=timezone.now(), version=F('version') + 1)
+        ChangeEvent.objects.bulk_create([
+            ChangeEvent(model=model._meta.model_name, object_id=pk, action=ChangeEvent.DELETE, data=None)
+            for pk in ids
+        ])
+
+        def notify():
+            invalidate_catalog_caches()
+            if model is Book:
+                forget_books(ids)
+        transaction.on_commit(notify)
+
+
+def schedule(instance, user=None):
+    """
+    Mark `instance` (an Author or Book) deleted and queue its removal.
+    """
+    with transaction.atomic():
+        hide(type(instance), [instance.pk])
+        return DeletionJob.objects.create(
+            model=type(instance)._meta.model_name,
+            object_id=instance.pk,
+            requested_by=user if user and user.is_authenticated else None,
+        )
+
+
+def unhide(model, ids):
+    """
+    Undo `hide()`: the rows reappear to change feed consumers as created.
+    """
+    with transaction.atomic():
+        model.all_objects.filter(pk__in=ids).update(deleted_at=None, version=F('version') + 1)
+        rows = list(model.all_objects.filter(pk__in=ids).values())
+        record_bulk(model, rows, ChangeEvent.CREATE)
+
+        def notify():
+            invalidate_catalog_caches()
+            if model is Book:
+                record_books([(row['id'], row['category'], row['availability']) for row in rows])
+        transaction.on_commit(notify)
+
+
+def retry(job):
+    """
+    Queue a failed job to run again, resuming where it stopped.
+    """
+    return DeletionJob.objects.filter(pk=job.pk, status=DeletionJob.FAILED).update(
+        status=DeletionJob.PENDING, lease_until=timezone.now(), finished_at=None,
+    ) == 1
+
+
+def restore(job):
+    """
+    Cancel a failed job and bring its target back into the catalog, with an
+    author's books except those queued for deletion themselves. Rows the job
+    already removed (e.g. loan history) are not restored.
+    """
+    model = MODELS[job.model]
+    with transaction.atomic():
+        if not DeletionJob.objects.filter(pk=job.pk, status=DeletionJob.FAILED).update(
+            status=DeletionJob.CANCELLED, finished_at=timezone.now(),
+        ):
+            return False
+        unhide(model, [job.object_id])
+        if model is Author:
+            queued = DeletionJob.objects.filter(model=DeletionJob.BOOK).exclude(
+                status__in=[DeletionJob.DONE, DeletionJob.CANCELLED]
+            ).values('object_id')
+            book_ids = list(
+                Book.all_objects.filter(author_id=job.object_id, deleted_at__isnull=False)
+                .exclude(pk__in=queued).values_list('id', flat=True)
+            )
+            if book_ids:
+                unhide(Book, book_ids)
+    return True
+
+
+def count_rows(model, lookup):
+    """
+    Number of rows matching `lookup`, plus everything that cascades from them.
+    Rows reachable along two paths (e.g. RelatedBook) are counted twice, so
+    this is an upper bound.
+    """
+    total = model._base_manager.filter(**lookup).count()
+    for related_model, field in cascades(model):
+        total += count_rows(related_model, {f'{field}__{key}': value for key, value in lookup.items()})
+    return total
+
+
+class DeletionRunner:
+    def __init__(self, job, batch_size, sleep=0):
+        self.job = job
+        self.batch_size = batch_size
+        self.sleep = sleep
+
+    def run(self):
+        job = self.job
+        model = MODELS[job.model]
+        lookup = {'pk': job.object_id}
+        if not job.total:
+            job.total = count_rows(model, lookup)
+            DeletionJob.objects.filter(pk=job.pk).update(total=job.total)
+
+        if model is Author:
+            # `schedule` hid the author's books; this catches jobs queued before it did.
+            while True:
+                ids = list(Book.objects.filter(author_id=job.object_id).values_list('id', flat=True)[:self.batch_size])
+                if not ids:
+                    break
+                hide(Book, ids)
+                self.extend_lease()
+
+        self.close_loans(model)
+        self.purge(model, lookup)
+        DeletionJob.objects.filter(pk=job.pk).update(
+            status=DeletionJob.DONE, total=F('deleted'), finished_at=timezone.now()
+        )
+
+    def close_loans(self, model):
+        """
+        Return open loans of the books being deleted through circulation, so
+        member loan counters and the circulation rollups stay correct.
+        """
+        book_field = 'book__author_id' if model is Author else 'book_id'
+        while True:
+            ids = list(
+                BorrowRecord.objects.filter(**{book_field: self.job.object_id}, returned_at__isnull=True)
+                .values_list('id', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                return
+            circulation.bulk_return(BorrowRecord.objects.filter(id__in=ids), actor=self.job.requested_by)
+            self.extend_lease()
+
+    def purge(self, model, lookup):
+        """
+        Delete the rows of `model` matching `lookup`, children before parents,
+        a batch of primary keys at a time. Loans, archived ones included, are
+        taken off the member counters and rollups in the same transaction;
+        `close_loans` has already returned the open ones.
+        """
+        while True:
+            ids = list(model._base_manager.filter(**lookup).values_list('pk', flat=True)[:self.batch_size])
+            if not ids:
+                return
+            for related_model, field in cascades(model):
+                self.purge(related_model, {f'{field}__in': ids})
+            with transaction.atomic():
+                if model in (BorrowRecord, ArchivedBorrowRecord):
+                    circulation.forget_purged_loans(model._base_manager.filter(pk__in=ids))
+                deleted = delete_rows(model, ids)
+                if model is BorrowRecord:
+                    ChangeEvent.objects.bulk_create([
+                        ChangeEvent(model='borrowrecord', object_id=pk, action=ChangeEvent.DELETE, data=None)
+                        for pk in ids
+                    ])
+            self.job.deleted += deleted
+            self.extend_lease(deleted=deleted)
+            if self.sleep:
+                time.sleep(self.sleep)
+
+    def extend_lease(self, deleted=0):
+        DeletionJob.objects.filter(pk=self.job.pk).update(
+            deleted=F('deleted') + deleted,
+            lease_until=timezone.now() + timedelta(seconds=settings.DELETION_JOB_LEASE_SECONDS),
+        )
+
+
+def claim_job():
+    """
+    Lease the oldest runnable job to the calling worker, or return None.
+    Jobs whose worker died become runnable again when their lease expires.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            DeletionJob.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[DeletionJob.PENDING, DeletionJob.RUNNING], lease_until__lte=now)
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = DeletionJob.RUNNING
+        job.started_at = job.started_at or now
+        job.lease_until = now + timedelta(seconds=settings.DELETION_JOB_LEASE_SECONDS)
+        job.save(update_fields=['status', 'started_at', 'lease_until'])
+    return job
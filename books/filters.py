@@ -0,0 +1,23 @@
+import django_filters
+
+from .models import Book
+
+
+class BookFilter(django_filters.FilterSet):
+    """
+    Catalog filters for the book list.
+
+    - title: Exact title.
+    - ISBN: Exact ISBN.
+    - category: Exact category.
+    - availability: true/false.
+    - author: Author ID.
+    - author_name: Author name, case-insensitive exact match.
+    - isbn_prefix: ISBN starts with the given digits.
+    """
+    author_name = django_filters.CharFilter(field_name='author__name', lookup_expr='iexact')
+    isbn_prefix = django_filters.CharFilter(field_name='ISBN', lookup_expr='startswith')
+
+    class Meta:
+        model = Book
+        fields = ['title', 'ISBN', 'category', 'availability', 'author']
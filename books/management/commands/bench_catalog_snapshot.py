@@ -0,0 +1,90 @@
+import gc
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from books.snapshot import AuthorRecord, BookRecord, CatalogSnapshot
+from books.suggest import SuggestIndex
+
+WORDS = ['The', 'Secret', 'History', 'Garden', 'Night', 'River', 'Stone', 'Winter', 'Letters', 'Empire']
+CATEGORIES = ['Fiction', 'Science', 'History', 'Poetry', 'Biography', 'Children', 'Travel', 'Philosophy']
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the memory held by an in-process catalog snapshot of synthetic "
+        "books and authors, indexes included, against plain dict rows, and "
+        "the size and lookup time of the title/author suggest index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=100000)
+        parser.add_argument('--books-per-author', type=int, default=10)
+
+    def handle(self, *args, **options):
+        count = options['books']
+        authors = max(1, count // options['books_per_author'])
+
+        def rows():
+            for i in range(1, count + 1):
+                category = CATEGORIES[i % len(CATEGORIES)]
+                yield i, f"{WORDS[i % len(WORDS)]} book title {i}", i % authors + 1, f"978{i:010d}", category, \
+                    i % 3 != 0, None, 1
+
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        snapshot = CatalogSnapshot()
+        for i in range(1, authors + 1):
+            snapshot.put_author(AuthorRecord(i, f"Author {i}", "", 1))
+        for row in rows():
+            snapshot.put_book(BookRecord(*row))
+        elapsed = time.perf_counter() - started
+        snapshot_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        lookups = time.perf_counter()
+        for i in range(1, 10001):
+            snapshot.get(i % count + 1)
+        lookup_us = (time.perf_counter() - lookups) / 10000 * 1e6
+        del snapshot
+
+        gc.collect()
+        tracemalloc.start()
+        dicts = {row[0]: dict(zip(BookRecord.__slots__, row)) for row in rows()}
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del dicts
+
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        index = SuggestIndex()
+        index.fill(
+            ((i, f"Author {i}") for i in range(1, authors + 1)),
+            ((row[0], row[1], row[2], row[6]) for row in rows()),
+        )
+        suggest_elapsed = time.perf_counter() - started
+        suggest_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        prefixes = [word[:length] for word in WORDS for length in (1, 3, len(word))] + ['book title 12', 'author 7']
+        lookups = time.perf_counter()
+        for i in range(10000):
+            index.suggest(prefixes[i % len(prefixes)], limit=10)
+        suggest_us = (time.perf_counter() - lookups) / 10000 * 1e6
+
+        mib = 1024 * 1024
+        self.stdout.write(f"Books: {count}, authors: {authors}, built in {elapsed:.2f}s")
+        self.stdout.write(
+            f"Snapshot with indexes: {snapshot_bytes / mib:.1f} MiB ({snapshot_bytes / count:.0f} bytes/book)"
+        )
+        self.stdout.write(
+            f"Plain dict rows, no indexes: {dict_bytes / mib:.1f} MiB ({dict_bytes / count:.0f} bytes/book)"
+        )
+        self.stdout.write(f"Retrieve: {lookup_us:.1f} us/lookup")
+        self.stdout.write(
+            f"Suggest index: {suggest_bytes / mib:.1f} MiB ({len(index.keys)} keys), built in {suggest_elapsed:.2f}s; "
+            f"{suggest_us:.1f} us/query for 10 suggestions"
+        )
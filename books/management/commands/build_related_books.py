@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from books.recommendations import build_related_books
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the related-books table from borrow history. By default only "
+        "loans made since the last build are folded in; use --full to rebuild."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild from the complete borrow history.")
+        parser.add_argument(
+            '--member-chunk', type=int, default=1000,
+            help="Members whose loans are expanded into pairs per batch.",
+        )
+        parser.add_argument(
+            '--max-pairs', type=int, default=5_000_000,
+            help=(
+                "Pairs expanded at once, and accumulator size (distinct book pairs) above which weak "
+                "pairs are pruned. Bounds memory."
+            ),
+        )
+        parser.add_argument(
+            '--max-history', type=int, default=500,
+            help="Most recent distinct books per member that take part in pairing.",
+        )
+        parser.add_argument('--top-k', type=int, default=None, help="Related books kept per book.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        build_related_books(
+            full=options['full'],
+            member_chunk=options['member_chunk'],
+            max_pairs=options['max_pairs'],
+            max_history=options['max_history'],
+            top_k=options['top_k'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.2f}s."))
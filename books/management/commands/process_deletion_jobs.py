@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from books.deletion import DeletionRunner, claim_job, retry
+from books.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Work through queued author and book deletions. Each job removes its "
+        "target and every dependent row in batches, children first, recording "
+        "progress on the job as it goes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows deleted per transaction.")
+        parser.add_argument(
+            '--sleep', type=float, default=0.0,
+            help="Seconds to pause between batches to leave headroom for live traffic.",
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling for new jobs instead of exiting once the queue is drained.",
+        )
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds between polls of an empty queue.")
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help="Queue failed jobs again first; each resumes where it stopped.",
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = sum(retry(job) for job in DeletionJob.objects.filter(status=DeletionJob.FAILED))
+            self.stdout.write(f"Queued {retried} failed jobs again.")
+        finished = 0
+        while True:
+            job = claim_job()
+            if job is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            started = time.perf_counter()
+            try:
+                DeletionRunner(job, options['batch_size'], options['sleep']).run()
+            except Exception as exc:
+                DeletionJob.objects.filter(pk=job.pk).update(
+                    status=DeletionJob.FAILED,
+                    last_error=f"{type(exc).__name__}: {exc}",
+                    finished_at=timezone.now(),
+                )
+                self.stderr.write(f"Deleting {job.model} {job.object_id} failed: {exc}")
+                continue
+            finished += 1
+            job.refresh_from_db()
+            self.stdout.write(
+                f"Deleted {job.model} {job.object_id}: {job.deleted} rows in {time.perf_counter() - started:.2f}s."
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Finished {finished} deletion jobs."))
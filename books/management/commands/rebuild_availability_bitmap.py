@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from books.availability import enabled, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the node's availability bitmap from the database and swap it "
+        "in. Workers pick up the new file on their next lookup. Run on each "
+        "node after a restore or whenever the bitmap may have drifted."
+    )
+
+    def handle(self, *args, **options):
+        if not enabled():
+            raise CommandError("AVAILABILITY_BITMAP_PATH is not set.")
+        started = time.perf_counter()
+        count = rebuild(settings.AVAILABILITY_BITMAP_PATH)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {count} books to {settings.AVAILABILITY_BITMAP_PATH} in {time.perf_counter() - started:.2f}s."
+        ))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:38
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoanPolicy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("category", models.CharField(max_length=100, unique=True)),
+                ("loan_days", models.PositiveIntegerField(default=14)),
+                (
+                    "fine_per_day",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=6
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "loan policies",
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:44
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0003_related_books"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                django.db.models.functions.text.Upper("name"),
+                name="author_name_upper_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["category", "availability"], name="book_category_avail_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["author", "availability"], name="book_author_avail_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["ISBN"],
+                name="book_isbn_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+    ]
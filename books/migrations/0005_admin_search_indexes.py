@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:47
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0004_catalog_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                django.db.models.functions.text.Upper("title"),
+                name="book_title_upper_idx",
+            ),
+        ),
+    ]
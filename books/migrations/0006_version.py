@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0005_admin_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="author",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# On PostgreSQL `istartswith` compiles to `UPPER(col::text) LIKE UPPER('x%')`,
+# which a btree only serves under the C collation unless it uses a pattern
+# operator class. Other databases keep the plain expression indexes.
+INDEXES = [
+    ('book_title_upper_idx', 'books_book', 'title'),
+    ('author_name_upper_idx', 'books_author', 'name'),
+]
+
+
+def rebuild(opclass):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for name, table, column in INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+            schema_editor.execute(f'CREATE INDEX "{name}" ON "{table}" (UPPER("{column}") {opclass})')
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0009_deletion_job_cancelled"),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild('text_pattern_ops'), rebuild('')),
+    ]
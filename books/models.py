@@ -1,18 +1,210 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from api.db import AtomicSaveMixin, VersionedMixin
+
+class ActiveManager(models.Manager):
+    """
+    Default manager that hides rows marked for background deletion.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+class Branch(models.Model):
+    """
+    A physical library location. Books, and the loans made from them, belong
+    to a branch; API requests are scoped to one with `?branch=<code>` or an
+    `X-Branch: <code>` header.
+    """
+    code = models.SlugField(max_length=20, unique=True)
+    name = models.CharField(max_length=100)
+    address = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.name
 
-class Author(models.Model):
+class Author(VersionedMixin, AtomicSaveMixin, models.Model):
     name = models.CharField(max_length=100)
     biography = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # Set when a DeletionJob has been queued; the row is removed by `process_deletion_jobs`.
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Serves case-insensitive author name filters; text_pattern_ops on
+            # PostgreSQL (migration 0010) so prefix searches can use it too.
+            models.Index(Upper('name'), name='author_name_upper_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
-class Book(models.Model):
+class Book(VersionedMixin, AtomicSaveMixin, models.Model):
     title = models.CharField(max_length=200)
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='books')
     ISBN = models.CharField(max_length=13, unique=True)
     category = models.CharField(max_length=100)
     availability = models.BooleanField(default=True)
+    # Null for catalogs that are not split into branches.
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, null=True, blank=True, related_name='books')
+    version = models.PositiveIntegerField(default=1, editable=False)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Serves case-insensitive title lookups from the admin and the API;
+            # text_pattern_ops on PostgreSQL (migration 0010) for `^title` prefix searches.
+            models.Index(Upper('title'), name='book_title_upper_idx'),
+            models.Index(fields=['category', 'availability'], name='book_category_avail_idx'),
+            models.Index(fields=['author', 'availability'], name='book_author_avail_idx'),
+            # Lets ISBN prefix filters (LIKE 'x%') use an index on PostgreSQL.
+            models.Index(fields=['ISBN'], name='book_isbn_prefix_idx', opclasses=['varchar_pattern_ops']),
+            # Branch-scoped catalog queries stay within the branch's slice of each index.
+            models.Index(fields=['branch', 'category', 'availability'], name='book_branch_cat_avail_idx'),
+            models.Index(fields=['branch', 'title'], name='book_branch_title_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+class LoanPolicy(models.Model):
+    """
+    Loan period and daily overdue fine for a book category.
+
+    Categories without a policy fall back to LIBRARY_DEFAULT_LOAN_DAYS and
+    LIBRARY_DEFAULT_FINE_PER_DAY.
+    """
+    category = models.CharField(max_length=100, unique=True)
+    loan_days = models.PositiveIntegerField(default=14)
+    fine_per_day = models.DecimalField(max_digits=6, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        verbose_name_plural = 'loan policies'
+
+    def __str__(self):
+        return f"{self.category}: {self.loan_days} days"
+
+    @classmethod
+    def for_category(cls, category):
+        policy = cls.objects.filter(category=category).first()
+        if policy is None:
+            policy = cls(
+                category=category,
+                loan_days=settings.LIBRARY_DEFAULT_LOAN_DAYS,
+                fine_per_day=Decimal(settings.LIBRARY_DEFAULT_FINE_PER_DAY),
+            )
+        return policy
+
+    def due_date(self, borrowed_at):
+        return borrowed_at + timedelta(days=self.loan_days)
+
+    def assess(self, due_date, as_of):
+        """
+        Whole days `as_of` is past `due_date`, and the fine for them; the
+        per-loan form of `manage.py assess_fines`.
+        """
+        overdue_days = max(int((as_of - due_date).total_seconds() // 86400), 0)
+        return overdue_days, overdue_days * self.fine_per_day
+
+class RelatedBook(models.Model):
+    """
+    Precomputed "members who borrowed this also borrowed" entry.
+
+    Holds the top RELATED_BOOKS_TOP_K co-borrowed books per book, built by
+    `manage.py build_related_books`. `score` is the number of members who
+    borrowed both books.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='related_entries')
+    related_book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'related_book'], name='relatedbook_book_related_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['book', '-score'], name='relatedbook_book_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.book} -> {self.related_book} ({self.score})"
+
+class RelatedBooksBuildState(models.Model):
+    """
+    Progress marker for incremental related-book builds: loans with an id up
+    to `last_record_id` are already reflected in RelatedBook.
+    """
+    last_record_id = models.BigIntegerField(default=0)
+    built_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Related books built up to loan {self.last_record_id}"
+
+class DeletionJob(models.Model):
+    """
+    Background removal of an author or book and everything that cascades from it.
+
+    Created by `destroy` with `?mode=async` after the target is marked deleted,
+    and worked through in bounded batches by `manage.py process_deletion_jobs`.
+    A failed job can be retried or cancelled (which restores the target).
+    `total` is an upper bound on the rows to remove, counted when the job
+    starts and corrected when it finishes; `deleted` is how many are gone so far.
+    """
+    AUTHOR = 'author'
+    BOOK = 'book'
+    MODEL_CHOICES = [
+        (AUTHOR, 'Author'),
+        (BOOK, 'Book'),
+    ]
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    total = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # A worker owns the job until this time; a crashed worker's job is picked up again.
+    lease_until = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['lease_until'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='deletionjob_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Delete {self.model} {self.object_id} ({self.status}, {self.deleted}/{self.total})"
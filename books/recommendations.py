@@ -0,0 +1,197 @@
+"""
+Builder for the "members who borrowed this also borrowed" table.
+
+The co-occurrence matrix is never materialised densely. Loans are read one
+chunk of members at a time as distinct (member, book) pairs, expanded into
+book-to-book pairs with NumPy, and reduced into a sparse accumulator of
+`(source * stride + target) -> count` keys. Members are expanded in groups of
+at most `max_pairs` candidate pairs (a member with h books yields h² of them),
+and the accumulator is pruned to the strongest entries per source book
+whenever it exceeds `max_pairs`, so memory stays bounded regardless of history
+size; only the top K per book is written.
+
+Incremental builds only count pairs that involve a member's first loan of a
+book made after the last build, and add them to the stored scores. Archived
+loans keep their original ids and are read alongside live ones.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from members.models import ArchivedBorrowRecord, BorrowRecord
+from .models import RelatedBook, RelatedBooksBuildState
+
+IN_BATCH = 900
+
+
+def batched(values, size=IN_BATCH):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def member_loans(member_ids, high_id):
+    """
+    Distinct (member, book, first loan id) rows for `member_ids` across live
+    and archived loans, grouped by member with the most recent books first.
+    """
+    parts = [
+        np.array(
+            list(
+                records.filter(member_id__in=member_ids, id__lte=high_id)
+                .values('member_id', 'book_id')
+                .annotate(first=Min('id'))
+                .values_list('member_id', 'book_id', 'first')
+                .order_by()
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 3)
+        for records in (BorrowRecord.objects.all(), ArchivedBorrowRecord.objects.all())
+    ]
+    data = np.concatenate(parts)
+    # A book can appear in both tables; keep its earliest loan.
+    data = data[np.lexsort((data[:, 2], data[:, 1], data[:, 0]))]
+    first = np.r_[True, (data[1:, 0] != data[:-1, 0]) | (data[1:, 1] != data[:-1, 1])]
+    data = data[first]
+    return data[np.lexsort((-data[:, 2], data[:, 0]))]
+
+
+def recent_history(members, max_history):
+    """
+    Mask keeping each member's `max_history` most recent books, which bounds
+    the quadratic blow-up of very heavy borrowers. `members` must be sorted
+    so each member's rows are contiguous, most recent first.
+    """
+    starts = np.flatnonzero(np.r_[True, members[1:] != members[:-1]])
+    sizes = np.diff(np.r_[starts, members.size])
+    rank = np.arange(members.size) - np.repeat(starts, sizes)
+    return rank < max_history
+
+
+def pair_groups(members, max_pairs):
+    """
+    Split the rows into slices of whole members whose expansion holds at most
+    `max_pairs` candidate pairs (Σ h², for h books per member). A single
+    member larger than that gets a slice of its own.
+    """
+    if members.size == 0:
+        return
+    starts = np.flatnonzero(np.r_[True, members[1:] != members[:-1]])
+    ends = np.r_[starts[1:], members.size]
+    squares = (ends - starts) ** 2
+    first = 0
+    while first < starts.size:
+        total = np.cumsum(squares[first:])
+        last = first + max(1, int(np.searchsorted(total, max_pairs, side='right')))
+        yield slice(starts[first], ends[last - 1])
+        first = last
+
+
+def expand_pairs(members, books, is_new):
+    """
+    Expand per-member book lists into ordered (book, other book) pairs in
+    which at least one side is new. `members` must be sorted so each
+    member's rows are contiguous.
+    """
+    if members.size == 0:
+        return books[:0], books[:0]
+
+    starts = np.flatnonzero(np.r_[True, members[1:] != members[:-1]])
+    sizes = np.diff(np.r_[starts, members.size])
+    block = np.repeat(sizes, sizes)
+    left = np.repeat(np.arange(members.size), block)
+    offset = np.arange(left.size) - np.repeat(np.cumsum(block) - block, block)
+    right = np.repeat(np.repeat(starts, sizes), block) + offset
+
+    pair = (left != right) & (is_new[left] | is_new[right])
+    return books[left[pair]], books[right[pair]]
+
+
+def merge_counts(keys, counts, new_keys, new_counts):
+    keys = np.concatenate([keys, new_keys])
+    counts = np.concatenate([counts, new_counts])
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return keys, np.bincount(inverse, weights=counts).astype(np.int64)
+
+
+def top_per_source(keys, counts, stride, limit):
+    """
+    Keep the `limit` highest counts for each source book.
+    """
+    sources = keys // stride
+    order = np.lexsort((-counts, sources))
+    keys, counts, sources = keys[order], counts[order], sources[order]
+    starts = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]])
+    sizes = np.diff(np.r_[starts, sources.size])
+    rank = np.arange(sources.size) - np.repeat(starts, sizes)
+    keep = rank < limit
+    return keys[keep], counts[keep]
+
+
+def build_related_books(full=False, member_chunk=1000, max_pairs=5_000_000, max_history=500,
+                        top_k=None, log=None):
+    top_k = top_k or settings.RELATED_BOOKS_TOP_K
+    log = log or (lambda message: None)
+
+    state = RelatedBooksBuildState.objects.first() or RelatedBooksBuildState()
+    since_id = 0 if full else state.last_record_id
+    tables = (BorrowRecord.objects.all(), ArchivedBorrowRecord.objects.all())
+    high_id = max(records.aggregate(high=Max('id'))['high'] or 0 for records in tables)
+    if high_id <= since_id and not full:
+        log("No new loans since the last build.")
+        return 0
+
+    stride = max(records.aggregate(high=Max('book_id'))['high'] or 0 for records in tables) + 1
+    members = np.unique(np.concatenate([
+        np.fromiter(
+            records.filter(id__gt=since_id, id__lte=high_id)
+            .values_list('member_id', flat=True).distinct().order_by().iterator(),
+            dtype=np.int64,
+        )
+        for records in tables
+    ]))
+    log(f"Scanning loans of {members.size} members up to loan {high_id}.")
+
+    keys = np.empty(0, dtype=np.int64)
+    counts = np.empty(0, dtype=np.int64)
+    for chunk in batched(members, member_chunk):
+        for ids in batched(chunk.tolist()):
+            data = member_loans(ids, high_id)
+            data = data[recent_history(data[:, 0], max_history)]
+            for rows in pair_groups(data[:, 0], max_pairs):
+                group = data[rows]
+                left, right = expand_pairs(group[:, 0], group[:, 1], group[:, 2] > since_id)
+                pair_keys, pair_counts = np.unique(left * stride + right, return_counts=True)
+                keys, counts = merge_counts(keys, counts, pair_keys, pair_counts)
+                if keys.size > max_pairs:
+                    # Keep generous headroom per source so pruning rarely changes the final top K.
+                    keys, counts = top_per_source(keys, counts, stride, top_k * 4)
+
+    sources = np.unique(keys // stride).tolist()
+    if not full:
+        for ids in batched(sources):
+            existing = np.array(
+                list(RelatedBook.objects.filter(book_id__in=ids).values_list('book_id', 'related_book_id', 'score')),
+                dtype=np.int64,
+            ).reshape(-1, 3)
+            keys, counts = merge_counts(keys, counts, existing[:, 0] * stride + existing[:, 1], existing[:, 2])
+    keys, counts = top_per_source(keys, counts, stride, top_k)
+
+    entries = [
+        RelatedBook(book_id=int(key // stride), related_book_id=int(key % stride), score=int(count))
+        for key, count in zip(keys, counts)
+    ]
+    with transaction.atomic():
+        if full:
+            RelatedBook.objects.all().delete()
+        else:
+            for ids in batched(sources):
+                RelatedBook.objects.filter(book_id__in=ids).delete()
+        RelatedBook.objects.bulk_create(entries, batch_size=5000)
+        state.last_record_id = high_id
+        state.built_at = timezone.now()
+        state.save()
+
+    log(f"Stored {len(entries)} related-book entries for {len(sources)} books.")
+    return len(entries)
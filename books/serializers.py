@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Book, Author
+from rest_framework.validators import UniqueValidator
+from .models import Book, Author, Branch, RelatedBook, DeletionJob
 
 class AuthorSerializer(serializers.ModelSerializer):
     """
@@ -10,7 +11,7 @@ class AuthorSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Author
-        fields = '__all__'
+        exclude = ['deleted_at']
 
 
 class BookSerializer(serializers.ModelSerializer):
@@ -29,6 +30,8 @@ class BookSerializer(serializers.ModelSerializer):
     - ISBN: Book's ISBN number.
     - category: Category or genre of the book.
     - availability: Boolean indicating if the book is available for borrowing.
+    - branch: Code of the branch holding the book; defaults to the request's branch.
+    - version: Incremented on every change; sent back as the ETag (read-only).
     """
     author = AuthorSerializer(read_only=True)
     author_id = serializers.PrimaryKeyRelatedField(
@@ -36,7 +39,59 @@ class BookSerializer(serializers.ModelSerializer):
         write_only=True,
         source='author'
     )
+    branch = serializers.SlugRelatedField(
+        slug_field='code',
+        queryset=Branch.objects.all(),
+        required=False,
+        allow_null=True
+    )
 
     class Meta:
         model = Book
-        fields = ['id', 'title', 'author', 'author_id', 'ISBN', 'category', 'availability']
+        fields = ['id', 'title', 'author', 'author_id', 'ISBN', 'category', 'availability', 'branch', 'version']
+        extra_kwargs = {
+            # Books awaiting background deletion still hold their ISBN.
+            'ISBN': {'validators': [UniqueValidator(queryset=Book.all_objects.all())]},
+        }
+
+
+class BranchSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the Branch model.
+    """
+    class Meta:
+        model = Branch
+        fields = ['id', 'code', 'name', 'address']
+
+
+class RelatedBookSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a related-book recommendation.
+
+    Fields:
+    - book: Full details of the recommended book.
+    - score: Number of members who borrowed both books.
+    """
+    book = BookSerializer(source='related_book', read_only=True)
+
+    class Meta:
+        model = RelatedBook
+        fields = ['book', 'score']
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for background deletion jobs.
+
+    Fields:
+    - model, object_id: What is being deleted.
+    - status: pending, running, done or failed.
+    - total: Rows to delete, the target and its dependents (an upper bound until the job is done).
+    - deleted: Rows deleted so far.
+    """
+    class Meta:
+        model = DeletionJob
+        fields = [
+            'id', 'model', 'object_id', 'status', 'total', 'deleted',
+            'last_error', 'created_at', 'started_at', 'finished_at',
+        ]
@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .availability import forget_books, record_books
+from .cache import invalidate_catalog_caches
+from .models import Author, Book
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def catalog_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_catalog_caches)
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, **kwargs):
+    row = (instance.pk, instance.category, instance.availability)
+    transaction.on_commit(lambda: record_books([row]))
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    book_id = instance.pk
+    transaction.on_commit(lambda: forget_books([book_id]))
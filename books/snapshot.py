@@ -0,0 +1,265 @@
+"""
+In-process, read-only copy of the catalog for the public book endpoints.
+
+Each worker keeps every Book and Author as a compact `__slots__` record, plus
+secondary indexes by id, ISBN, title and category. The copy is loaded once
+and then kept current from the change feed: when the shared catalog
+generation (see `books.cache`) moves, or at least every
+CATALOG_SNAPSHOT_MAX_STALENESS seconds, the worker replays the book and
+author ChangeEvents it has not applied yet. Each event carries the row's
+column values, so a refresh reads only the feed and never re-queries books.
+
+Enable with CATALOG_SNAPSHOT_ENABLED; `manage.py bench_catalog_snapshot`
+measures its memory footprint. Branch-scoped requests are not served from the
+snapshot.
+"""
+import abc
+import bisect
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+from api.changefeed import current_seq, settled_seq
+from api.models import ChangeEvent
+from .cache import catalog_generation
+from .models import Author, Book, Branch
+
+
+class AuthorRecord:
+    __slots__ = ('id', 'name', 'biography', 'version')
+
+    def __init__(self, id, name, biography, version):
+        self.id = id
+        self.name = name
+        self.biography = biography
+        self.version = version
+
+    def as_dict(self):
+        return {'id': self.id, 'name': self.name, 'biography': self.biography, 'version': self.version}
+
+
+class BookRecord:
+    __slots__ = ('id', 'title', 'author_id', 'ISBN', 'category', 'availability', 'branch_id', 'version')
+
+    def __init__(self, id, title, author_id, ISBN, category, availability, branch_id, version):
+        self.id = id
+        self.title = title
+        self.author_id = author_id
+        self.ISBN = ISBN
+        # Categories repeat across many books; share one string object per name.
+        self.category = sys.intern(category)
+        self.availability = availability
+        self.branch_id = branch_id
+        self.version = version
+
+
+BOOK_COLUMNS = BookRecord.__slots__
+AUTHOR_COLUMNS = AuthorRecord.__slots__
+
+
+class CatalogReplica(abc.ABC):
+    """
+    Base for per-worker, in-memory copies of the catalog that follow the
+    change feed. Subclasses load their rows in `load_rows()` and apply book
+    and author events in `apply()`.
+    """
+
+    def __init__(self):
+        self.last_seq = 0
+        self.generation = None
+        self.checked_at = 0.0
+        self.lock = threading.RLock()
+
+    def load(self):
+        with self.lock:
+            # Read the cursor first: events that land while loading are replayed afterwards.
+            self.last_seq = current_seq()
+            self.generation = catalog_generation()
+            self.load_rows()
+            self.checked_at = time.monotonic()
+        return self
+
+    @abc.abstractmethod
+    def load_rows(self):
+        """
+        Read every book and author into the replica.
+        """
+
+    @abc.abstractmethod
+    def apply(self, model, object_id, action, data):
+        """
+        Apply one `book` or `author` change event, carrying the row's column
+        values (None for deletes).
+        """
+
+    def refresh(self):
+        """
+        Replay catalog events newer than the last applied one.
+
+        The cursor only advances to the first sequence number not yet visible
+        (see `api.changefeed.settled_seq`), so a transaction that commits out
+        of sequence order is picked up by a later refresh. Replaying an event
+        twice is harmless because events are applied in order and carry full rows.
+        """
+        with self.lock:
+            settled, _ = settled_seq(self.last_seq)
+            events = (
+                ChangeEvent.objects.filter(seq__gt=self.last_seq, model__in=['book', 'author'])
+                .order_by('seq')
+                .values_list('model', 'object_id', 'action', 'data')
+            )
+            for model, object_id, action, data in events.iterator(chunk_size=1000):
+                self.apply(model, object_id, action, data)
+            self.last_seq = settled
+            self.checked_at = time.monotonic()
+
+    def refresh_if_stale(self):
+        generation = catalog_generation()
+        stale = time.monotonic() - self.checked_at > settings.CATALOG_SNAPSHOT_MAX_STALENESS
+        if generation != self.generation or stale:
+            self.refresh()
+            self.generation = generation
+
+
+class CatalogSnapshot(CatalogReplica):
+    def __init__(self):
+        super().__init__()
+        self.books = {}
+        self.authors = {}
+        self.ids = []
+        self.by_isbn = {}
+        self.by_title = {}
+        self.by_category = {}
+        self.branch_codes = {}
+
+    # Loading and refreshing
+
+    def load_rows(self):
+        self.branch_codes = dict(Branch.objects.values_list('id', 'code'))
+        for row in Author.objects.values_list(*AUTHOR_COLUMNS).iterator(chunk_size=5000):
+            self.put_author(AuthorRecord(*row))
+        for row in Book.objects.order_by('id').values_list(*BOOK_COLUMNS).iterator(chunk_size=5000):
+            self.put_book(BookRecord(*row))
+
+    def refresh(self):
+        with self.lock:
+            self.branch_codes = dict(Branch.objects.values_list('id', 'code'))
+            super().refresh()
+
+    def apply(self, model, object_id, action, data):
+        if model == 'book':
+            self.drop_book(object_id)
+            if action != ChangeEvent.DELETE:
+                self.put_book(BookRecord(*(data.get(column) for column in BOOK_COLUMNS)))
+        elif action == ChangeEvent.DELETE:
+            self.authors.pop(object_id, None)
+        else:
+            self.put_author(AuthorRecord(*(data.get(column) for column in AUTHOR_COLUMNS)))
+
+    # Index maintenance
+
+    def put_author(self, author):
+        self.authors[author.id] = author
+
+    def put_book(self, book):
+        self.books[book.id] = book
+        # Loads arrive in id order, so this is normally an append.
+        if not self.ids or self.ids[-1] < book.id:
+            self.ids.append(book.id)
+        else:
+            position = bisect.bisect_left(self.ids, book.id)
+            if position == len(self.ids) or self.ids[position] != book.id:
+                self.ids.insert(position, book.id)
+        self.by_isbn[book.ISBN] = book.id
+        # Titles are nearly unique: keep a bare id, and only a set for duplicates.
+        existing = self.by_title.get(book.title)
+        if existing is None:
+            self.by_title[book.title] = book.id
+        elif isinstance(existing, set):
+            existing.add(book.id)
+        elif existing != book.id:
+            self.by_title[book.title] = {existing, book.id}
+        self.by_category.setdefault(book.category, set()).add(book.id)
+
+    def drop_book(self, book_id):
+        book = self.books.pop(book_id, None)
+        if book is None:
+            return
+        position = bisect.bisect_left(self.ids, book_id)
+        if position < len(self.ids) and self.ids[position] == book_id:
+            del self.ids[position]
+        if self.by_isbn.get(book.ISBN) == book_id:
+            del self.by_isbn[book.ISBN]
+        existing = self.by_title.get(book.title)
+        if existing == book_id:
+            del self.by_title[book.title]
+        elif isinstance(existing, set):
+            existing.discard(book_id)
+            if len(existing) == 1:
+                self.by_title[book.title] = existing.pop()
+        ids = self.by_category.get(book.category)
+        if ids is not None:
+            ids.discard(book_id)
+            if not ids:
+                del self.by_category[book.category]
+
+    # Reads
+
+    def render(self, book):
+        author = self.authors.get(book.author_id)
+        return {
+            'id': book.id,
+            'title': book.title,
+            'author': author.as_dict() if author else None,
+            'ISBN': book.ISBN,
+            'category': book.category,
+            'availability': book.availability,
+            'branch': self.branch_codes.get(book.branch_id),
+            'version': book.version,
+        }
+
+    def get(self, book_id):
+        with self.lock:
+            book = self.books.get(book_id)
+            return self.render(book) if book else None
+
+    def find(self, title=None, ISBN=None, category=None, availability=None):
+        """
+        Rendered books matching every given criterion, in id order.
+        """
+        with self.lock:
+            candidates = None
+            if ISBN is not None:
+                candidates = {self.by_isbn[ISBN]} if ISBN in self.by_isbn else set()
+            if title is not None:
+                ids = self.by_title.get(title, set())
+                ids = ids if isinstance(ids, set) else {ids}
+                candidates = ids if candidates is None else candidates & ids
+            if category is not None:
+                ids = self.by_category.get(category, set())
+                candidates = ids if candidates is None else candidates & ids
+            ids = self.ids if candidates is None else sorted(candidates)
+            books = (self.books[book_id] for book_id in ids)
+            if availability is not None:
+                books = (book for book in books if book.availability == availability)
+            return [self.render(book) for book in books]
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot():
+    """
+    This worker's catalog snapshot, loaded on first use and refreshed when stale.
+    """
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = CatalogSnapshot().load()
+                return _snapshot
+    _snapshot.refresh_if_stale()
+    return _snapshot
@@ -0,0 +1,214 @@
+"""
+Per-worker prefix index for title and author typeahead (`/books/suggest/`).
+
+Titles and author names are normalized (accents stripped, case folded,
+punctuation collapsed to single spaces) and stored in one sorted array of
+keys: the whole normalized text plus the tail starting at each later word, so
+"potter" finds "Harry Potter". A lookup is a bisect to the first key at or
+after the prefix followed by a scan that stops after `limit` distinct matches.
+The index is loaded on first use and follows the change feed like the catalog
+snapshot (see `books.snapshot.CatalogReplica`), re-keying only the books and
+authors whose text changed.
+
+Enable with SUGGEST_INDEX_ENABLED; otherwise `suggest_from_database()`
+answers with case-insensitive `LIKE` queries, without accent folding.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from array import array
+
+from api.models import ChangeEvent
+from .models import Author, Book
+from .snapshot import CatalogReplica
+
+NON_WORD = re.compile(r'[\W_]+')
+BOOK, AUTHOR = 0, 1
+
+
+def normalize(text):
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(word for word in NON_WORD.split(text.casefold()) if word)
+
+
+def keys_for(text):
+    words = normalize(text).split(' ')
+    if words == ['']:
+        return []
+    return sorted({' '.join(words[i:]) for i in range(len(words))})
+
+
+class SuggestIndex(CatalogReplica):
+    def __init__(self):
+        super().__init__()
+        # Parallel arrays sorted by key; refs encode `id * 2 + kind`.
+        self.keys = []
+        self.refs = array('q')
+        self.books = {}
+        self.authors = {}
+
+    # Loading and refreshing
+
+    def load_rows(self):
+        self.fill(
+            Author.objects.values_list('id', 'name').iterator(chunk_size=5000),
+            Book.objects.values_list('id', 'title', 'author_id', 'branch_id').iterator(chunk_size=5000),
+        )
+
+    def fill(self, authors, books):
+        """
+        Build the index from `(id, name)` author rows and `(id, title,
+        author_id, branch_id)` book rows.
+        """
+        # Collect and sort once; inserting key by key would be quadratic.
+        entries = []
+        for author_id, name in authors:
+            self.authors[author_id] = name
+            entries.extend((key, author_id * 2 + AUTHOR) for key in keys_for(name))
+        for book_id, title, author_id, branch_id in books:
+            self.books[book_id] = (title, author_id, branch_id)
+            entries.extend((key, book_id * 2 + BOOK) for key in keys_for(title))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.refs = array('q', (ref for _, ref in entries))
+
+    def apply(self, model, object_id, action, data):
+        if model == 'book':
+            if action == ChangeEvent.DELETE:
+                self.drop_book(object_id)
+            else:
+                self.put_book(object_id, data.get('title'), data.get('author_id'), data.get('branch_id'))
+        elif action == ChangeEvent.DELETE:
+            self.drop_author(object_id)
+        else:
+            self.put_author(object_id, data.get('name'))
+
+    # Index maintenance
+
+    def add_keys(self, text, ref):
+        for key in keys_for(text):
+            position = bisect.bisect_right(self.keys, key)
+            self.keys.insert(position, key)
+            self.refs.insert(position, ref)
+
+    def remove_keys(self, text, ref):
+        for key in keys_for(text):
+            position = bisect.bisect_left(self.keys, key)
+            while position < len(self.keys) and self.keys[position] == key:
+                if self.refs[position] == ref:
+                    del self.keys[position]
+                    del self.refs[position]
+                    break
+                position += 1
+
+    def put_book(self, book_id, title, author_id, branch_id):
+        previous = self.books.get(book_id)
+        self.books[book_id] = (title, author_id, branch_id)
+        if previous is None or previous[0] != title:
+            if previous is not None:
+                self.remove_keys(previous[0], book_id * 2 + BOOK)
+            self.add_keys(title, book_id * 2 + BOOK)
+
+    def drop_book(self, book_id):
+        previous = self.books.pop(book_id, None)
+        if previous is not None:
+            self.remove_keys(previous[0], book_id * 2 + BOOK)
+
+    def put_author(self, author_id, name):
+        previous = self.authors.get(author_id)
+        self.authors[author_id] = name
+        if previous != name:
+            if previous is not None:
+                self.remove_keys(previous, author_id * 2 + AUTHOR)
+            self.add_keys(name, author_id * 2 + AUTHOR)
+
+    def drop_author(self, author_id):
+        previous = self.authors.pop(author_id, None)
+        if previous is not None:
+            self.remove_keys(previous, author_id * 2 + AUTHOR)
+
+    # Reads
+
+    def suggest(self, prefix, limit=10, branch_id=None):
+        """
+        Up to `limit` books and authors whose title or name has a word
+        sequence starting with `prefix`, in key order. With `branch_id`, only
+        that branch's books are suggested.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self.lock:
+            position = bisect.bisect_left(self.keys, prefix)
+            while position < len(self.keys) and len(results) < limit:
+                if not self.keys[position].startswith(prefix):
+                    break
+                ref = self.refs[position]
+                position += 1
+                if ref in seen:
+                    continue
+                seen.add(ref)
+                object_id, kind = divmod(ref, 2)
+                if kind == AUTHOR:
+                    results.append({'type': 'author', 'id': object_id, 'name': self.authors[object_id]})
+                    continue
+                title, author_id, book_branch_id = self.books[object_id]
+                if branch_id is not None and book_branch_id != branch_id:
+                    continue
+                results.append({
+                    'type': 'book',
+                    'id': object_id,
+                    'title': title,
+                    'author': self.authors.get(author_id),
+                })
+        return results
+
+
+def suggest_from_database(prefix, limit=10, branch_id=None):
+    """
+    `SuggestIndex.suggest()` answered from the database, for workers that do
+    not keep the index. Matches only the start of titles and names: an
+    `istartswith` can use the `UPPER()` indexes (text_pattern_ops on
+    PostgreSQL, migration 0010), where a match inside the text would need a
+    leading-wildcard `LIKE` and a full scan. Turn SUGGEST_INDEX_ENABLED on
+    to match any word.
+    """
+    prefix = ' '.join(prefix.split())
+    if not prefix:
+        return []
+    authors = Author.objects.filter(name__istartswith=prefix).order_by('name').values_list('id', 'name')[:limit]
+    books = Book.objects.filter(title__istartswith=prefix)
+    if branch_id is not None:
+        books = books.filter(branch_id=branch_id)
+    books = books.order_by('title').values_list('id', 'title', 'author__name')[:limit]
+    results = [{'type': 'author', 'id': author_id, 'name': name} for author_id, name in authors]
+    results += [
+        {'type': 'book', 'id': book_id, 'title': title, 'author': author}
+        for book_id, title, author in books
+    ]
+    results.sort(key=lambda result: normalize(result.get('name') or result.get('title')))
+    return results[:limit]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_suggest_index():
+    """
+    This worker's suggest index, loaded on first use and refreshed when stale.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SuggestIndex().load()
+                return _index
+    _index.refresh_if_stale()
+    return _index
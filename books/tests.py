@@ -1,3 +1,131 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import ChangeEvent
+from members import circulation
+from members.models import ArchivedBorrowRecord, BorrowRecord, CategoryDailyLoanStats, Member
+from .deletion import claim_job, schedule
+from .models import Author, Book, DeletionJob
+
+
+class AvailabilityStreamTests(TestCase):
+    def test_wsgi_request_gets_501_instead_of_hanging(self):
+        response = self.client.get('/api/v1/books/stream/?books=1')
+
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+        self.assertIn('ASGI', response.json()['detail'])
+
+
+class LibrarianTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = Member.objects.create_superuser('librarian', 'librarian@example.com', 'pw')
+        cls.author = Author.objects.create(name="Ursula K. Le Guin")
+        cls.book = Book.objects.create(title="The Dispossessed", author=cls.author, ISBN='9780061054884', category='Fiction')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.librarian)
+
+
+class OptimisticConcurrencyTests(LibrarianTestCase):
+    def patch(self, if_match, **data):
+        return self.client.patch(f'/api/v1/books/{self.book.pk}/', data, format='json', HTTP_IF_MATCH=if_match)
+
+    def test_update_with_the_current_etag_succeeds(self):
+        tag = self.client.get(f'/api/v1/books/{self.book.pk}/')['ETag']
+
+        response = self.patch(tag, category='Science Fiction')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], tag)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).category, 'Science Fiction')
+
+    def test_stale_etag_gets_412_and_writes_nothing(self):
+        tag = self.client.get(f'/api/v1/books/{self.book.pk}/')['ETag']
+        self.patch(tag, category='Science Fiction')
+
+        response = self.patch(tag, category='Philosophy')
+
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).category, 'Science Fiction')
+
+    def test_weak_and_wildcard_tags_are_accepted(self):
+        version = Book.objects.get(pk=self.book.pk).version
+
+        self.assertEqual(self.patch(f'W/"{version}"', category='Science Fiction').status_code, 200)
+        self.assertEqual(self.patch('*', category='Philosophy').status_code, 200)
+        self.assertEqual(self.patch('"not-a-version"', category='Fiction').status_code, 412)
+
+
+class DeletionJobTests(LibrarianTestCase):
+    def test_async_delete_hides_the_book_and_queues_a_job(self):
+        response = self.client.delete(f'/api/v1/books/{self.book.pk}/?mode=async')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Book.objects.filter(pk=self.book.pk).exists())
+        self.assertTrue(Book.all_objects.filter(pk=self.book.pk).exists())
+        job = DeletionJob.objects.get()
+        self.assertEqual((job.model, job.object_id, job.status), (DeletionJob.BOOK, self.book.pk, DeletionJob.PENDING))
+
+    def test_claimed_job_is_leased_until_its_worker_stops_renewing(self):
+        job = schedule(self.book)
+
+        claimed = claim_job()
+
+        self.assertEqual((claimed.pk, claimed.status), (job.pk, DeletionJob.RUNNING))
+        self.assertIsNone(claim_job())
+        DeletionJob.objects.filter(pk=job.pk).update(lease_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim_job().pk, job.pk)
+
+    def test_purge_removes_loans_and_takes_them_off_the_counters(self):
+        member = Member.objects.create_user('reader', 'reader@example.com', 'pw')
+        other = Book.objects.create(title="Kindred", author=self.author, ISBN='9780807083697', category='Fiction')
+        circulation.borrow_book(member, self.book)
+        record = circulation.return_book(member, self.book)
+        ArchivedBorrowRecord.objects.create(
+            id=record.pk + 1000, member=member, book=other,
+            borrowed_at=record.borrowed_at, returned_at=record.returned_at,
+        )
+        Member.objects.filter(pk=member.pk).update(total_loans=2)
+        open_record = circulation.borrow_book(member, other)
+        last_seq = ChangeEvent.objects.order_by('-seq').values_list('seq', flat=True).first()
+        job = schedule(self.author)
+
+        call_command('process_deletion_jobs', stdout=StringIO(), stderr=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.DONE)
+        self.assertEqual(job.deleted, job.total)
+        self.assertFalse(Book.all_objects.filter(author=self.author).exists())
+        self.assertFalse(BorrowRecord.objects.exists())
+        self.assertFalse(ArchivedBorrowRecord.objects.exists())
+        member.refresh_from_db()
+        self.assertEqual((member.active_loans, member.total_loans), (0, 0))
+        self.assertEqual(
+            list(CategoryDailyLoanStats.objects.values_list('loans', 'returns').distinct()), [(0, 0)]
+        )
+        # One delete event per row: the books' and author's from hiding them, one per purged loan.
+        deletes = ChangeEvent.objects.filter(seq__gt=last_seq, action=ChangeEvent.DELETE)
+        self.assertEqual(sorted(deletes.values_list('model', 'object_id')), sorted([
+            ('author', self.author.pk), ('book', self.book.pk), ('book', other.pk),
+            ('borrowrecord', record.pk), ('borrowrecord', open_record.pk),
+        ]))
+
+    def test_cancelling_a_failed_job_restores_the_book(self):
+        job = schedule(self.book)
+        self.assertEqual(self.client.post(f'/api/v1/deletions/{job.pk}/restore/').status_code, 409)
+        DeletionJob.objects.filter(pk=job.pk).update(status=DeletionJob.FAILED)
+
+        response = self.client.post(f'/api/v1/deletions/{job.pk}/restore/')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], DeletionJob.CANCELLED)
+        self.assertTrue(Book.objects.filter(pk=self.book.pk).exists())
+        self.assertIsNone(claim_job())
@@ -1,21 +1,53 @@
+import asyncio
+import json
+import logging
+
 from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
-from django.utils import timezone
-from drf_yasg.utils import swagger_auto_schema
+from rest_framework.reverse import reverse
+from drf_yasg.utils import no_body, swagger_auto_schema
 from drf_yasg import openapi
+from django.conf import settings
+from django.db.models import Count, Q
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 
-from books.models import Book
-from books.serializers import BookSerializer
-from members.models import BorrowRecord
+from books import availability as availability_bitmap
+from books import deletion
+from books.cache import catalog_facets
+from books.filters import BookFilter
+from books.branches import BranchScopedMixin, branch_code, request_branch
+from books.models import Author, Book, Branch, DeletionJob, RelatedBook
+from books.snapshot import get_snapshot
+from books.suggest import get_suggest_index, suggest_from_database
+from books.serializers import (
+    AuthorSerializer,
+    BookSerializer,
+    BranchSerializer,
+    DeletionJobSerializer,
+    RelatedBookSerializer,
+)
+from members import circulation
+from members.models import BookTrendingScore
+from members.serializers import BookTrendingScoreSerializer
+from api import audit
+from api.audit import AuditedMixin
+from api.models import AuditEvent
+from api.concurrency import OptimisticConcurrencyMixin, etag
+from api.idempotency import IdempotentMixin
+from api.pubsub import get_broker
 from api.permissions import (
     IsLibrarianOrAdminOrReadOnly,
     IsMemberGroupOnly,
-    IsLibrarianGroupOrReadOnly
+    IsLibrarianGroupOrReadOnly,
+    IsLibrarianGroupOnly,
 )
-from .models import Author
-from .serializers import AuthorSerializer
+
+logger = logging.getLogger(__name__)
 
 
 class BookBorrowSerializer(serializers.Serializer):
@@ -32,28 +64,88 @@ class BookReturnSerializer(serializers.Serializer):
     """
     Serializer used for returning a book via its title.
     """
+    # Books awaiting background deletion can still be returned.
     title = serializers.SlugRelatedField(
-        queryset=Book.objects.all(),
+        queryset=Book.all_objects.all(),
         slug_field='title'
     )
 
 
-class BookViewSet(viewsets.ModelViewSet):
+SNAPSHOT_BOOLEANS = {'true': True, 'True': True, '1': True, 'false': False, 'False': False, '0': False}
+
+
+def snapshot_filters(query_params):
+    """
+    The book list filters as keyword arguments for `CatalogSnapshot.find`,
+    or None when the query uses anything the snapshot cannot answer.
+    """
+    filters = {}
+    for name, value in query_params.items():
+        if name in ('title', 'ISBN', 'category'):
+            filters[name] = value
+        elif name == 'availability' and value in SNAPSHOT_BOOLEANS:
+            filters[name] = SNAPSHOT_BOOLEANS[value]
+        elif value != '':
+            return None
+    return filters
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    """
+    Books and categories to check availability for.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    categories = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+
+    def validate_ids(self, value):
+        if len(value) > settings.AVAILABILITY_MAX_IDS:
+            raise serializers.ValidationError(f"At most {settings.AVAILABILITY_MAX_IDS} ids per request.")
+        return value
+
+
+delete_mode_param = openapi.Parameter(
+    'mode', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['async'],
+    description="`async` to mark the record deleted now and remove it and its dependents in the background.",
+)
+
+
+def schedule_deletion(request, instance):
+    """
+    Queue `instance` for background deletion and answer 202 with the job.
+    """
+    job = deletion.schedule(instance, request.user)
+    audit.record(AuditEvent.DELETE, instance, instance.pk, audit.diff(audit.values(instance), {}), request=request)
+    location = reverse('deletions-detail', kwargs={'pk': job.pk}, request=request)
+    return Response(DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={'Location': location})
+
+
+class BookViewSet(IdempotentMixin, AuditedMixin, OptimisticConcurrencyMixin, BranchScopedMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing books.
 
     Permissions:
     - Librarians and Admins have full CRUD access.
     - Members can borrow and return books using custom endpoints.
+
+    Writes, borrows and returns accept an `Idempotency-Key` header so that
+    retried requests replay the first response instead of running again.
+    Updates honour `If-Match` with the ETag from `retrieve`. Every write is
+    recorded in the audit trail.
+    `?branch=<code>` or an `X-Branch` header limits every endpoint to one
+    branch's books.
     """
-    queryset = Book.objects.select_related('author').all()
+    queryset = Book.objects.select_related('author', 'branch').all()
     serializer_class = BookSerializer
+    filterset_class = BookFilter
+    idempotent_actions = ('create', 'update', 'partial_update', 'destroy', 'borrow', 'return_book')
+    # Throttle units (api.throttling); the unpaginated list uses THROTTLE_COSTS.
+    throttle_costs = {'borrow': 5, 'return_book': 5, 'availability': 5, 'related': 2}
     
     def get_permissions(self):
         """
         Assign different permissions depending on the action.
         """
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'related', 'facets', 'availability', 'suggest', 'trending']:
             permission_classes = [AllowAny]
         elif self.action in ['borrow', 'return_book']:
             permission_classes = [IsAuthenticated, IsMemberGroupOnly]
@@ -68,12 +160,32 @@ class BookViewSet(viewsets.ModelViewSet):
             return BookReturnSerializer
         return super().get_serializer_class()
 
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        branch = request_branch(self.request)
+        if branch is not None and self.action in ['borrow', 'return_book']:
+            title = serializer.fields['title']
+            title.queryset = title.queryset.filter(branch=branch)
+        return serializer
+
+    def perform_create(self, serializer):
+        if 'branch' not in serializer.validated_data:
+            serializer.validated_data['branch'] = request_branch(self.request)
+        super().perform_create(serializer)
+
     @swagger_auto_schema(
         operation_summary="List all books",
-        operation_description="Retrieve a list of all books with author details.",
+        operation_description=(
+            "Retrieve a list of all books with author details. Filter with `category`, `availability`, "
+            "`author` (ID), `author_name` and `isbn_prefix`."
+        ),
         responses={200: BookSerializer(many=True)},
     )
     def list(self, request, *args, **kwargs):
+        if settings.CATALOG_SNAPSHOT_ENABLED and not branch_code(request):
+            filters = snapshot_filters(request.query_params)
+            if filters is not None:
+                return Response(get_snapshot().find(**filters))
         return super().list(request, *args, **kwargs)
 
     @swagger_auto_schema(
@@ -82,6 +194,10 @@ class BookViewSet(viewsets.ModelViewSet):
         responses={200: BookSerializer()},
     )
     def retrieve(self, request, *args, **kwargs):
+        if settings.CATALOG_SNAPSHOT_ENABLED and not branch_code(request) and str(kwargs['pk']).isdigit():
+            book = get_snapshot().get(int(kwargs['pk']))
+            if book is not None:
+                return Response(book, headers={'ETag': etag(book['version'])})
         return super().retrieve(request, *args, **kwargs)
 
     @swagger_auto_schema(
@@ -95,7 +211,10 @@ class BookViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="Update a book",
-        operation_description="Fully update a book record (librarians/admins only).",
+        operation_description=(
+            "Fully update a book record (librarians/admins only). Send `If-Match` with the ETag from retrieve; "
+            "412 if the record changed since."
+        ),
         request_body=BookSerializer,
         responses={200: BookSerializer()},
     )
@@ -104,7 +223,10 @@ class BookViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="Partially update a book",
-        operation_description="Partially update a book record (librarians/admins only).",
+        operation_description=(
+            "Partially update a book record (librarians/admins only). Send `If-Match` with the ETag from retrieve; "
+            "412 if the record changed since."
+        ),
         request_body=BookSerializer,
         responses={200: BookSerializer()},
     )
@@ -113,10 +235,17 @@ class BookViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="Delete a book",
-        operation_description="Delete a book from the library (librarians/admins only).",
-        responses={204: 'No Content'},
+        operation_description=(
+            "Delete a book from the library (librarians/admins only). "
+            "With `?mode=async` the book disappears at once and its loan history is removed in the background; "
+            "poll the returned job at `/deletions/<id>/`."
+        ),
+        manual_parameters=[delete_mode_param],
+        responses={204: 'No Content', 202: DeletionJobSerializer()},
     )
     def destroy(self, request, *args, **kwargs):
+        if request.query_params.get('mode') == 'async':
+            return schedule_deletion(request, self.get_object())
         return super().destroy(request, *args, **kwargs)
 
     @swagger_auto_schema(
@@ -135,16 +264,10 @@ class BookViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         book = serializer.validated_data['title']
 
-        if not book.availability:
-            return Response({"detail": "Book is currently not available."}, status=status.HTTP_400_BAD_REQUEST)
-
-        BorrowRecord.objects.create(
-            member=request.user,
-            book=book,
-            borrowed_at=timezone.now()
-        )
-        book.availability = False
-        book.save()
+        try:
+            circulation.borrow_book(request.user, book)
+        except circulation.CirculationError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({"detail": f"You have borrowed '{book.title}'."}, status=status.HTTP_201_CREATED)
 
@@ -165,31 +288,190 @@ class BookViewSet(viewsets.ModelViewSet):
         book = serializer.validated_data['title']
 
         try:
-            record = BorrowRecord.objects.get(
-                member=request.user,
-                book=book,
-                returned_at__isnull=True
-            )
-        except BorrowRecord.DoesNotExist:
-            return Response({"detail": "You do not have an active borrow record for this book."},
-                            status=status.HTTP_400_BAD_REQUEST)
+            circulation.return_book(request.user, book)
+        except circulation.CirculationError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        record.returned_at = timezone.now()
-        record.save()
+        return Response({"detail": f"You have returned '{book.title}'."}, status=status.HTTP_200_OK)
 
-        book.availability = True
-        book.save()
+    @swagger_auto_schema(
+        method='get',
+        operation_summary="Catalog facets",
+        operation_description="Number of books per category and per availability state, in the request's branch if scoped.",
+        responses={200: openapi.Response(description="Facet counts.")},
+    )
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def facets(self, request):
+        return Response(catalog_facets(request_branch(request)))
 
-        return Response({"detail": f"You have returned '{book.title}'."}, status=status.HTTP_200_OK)
+    @swagger_auto_schema(
+        method='get',
+        operation_summary="Suggest titles and authors",
+        operation_description=(
+            "Typeahead: books and authors with a word in the title or name starting with `prefix`, "
+            "ignoring case (and, with SUGGEST_INDEX_ENABLED, accents and punctuation). Borrow and return take "
+            "the exact `title` returned here. Served from an in-memory index in each worker when enabled."
+        ),
+        manual_parameters=[
+            openapi.Parameter('prefix', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                description="Maximum number of suggestions (default 10, at most SUGGEST_MAX_LIMIT).",
+            ),
+        ],
+        responses={200: openapi.Response(description="Suggestions as `{type, id, title, author}` or `{type, id, name}`.")},
+    )
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def suggest(self, request):
+        limit = request.query_params.get('limit', '10')
+        limit = min(int(limit), settings.SUGGEST_MAX_LIMIT) if limit.isdigit() else 10
+        branch = request_branch(request)
+        suggest = get_suggest_index().suggest if settings.SUGGEST_INDEX_ENABLED else suggest_from_database
+        suggestions = suggest(
+            request.query_params.get('prefix', ''),
+            limit=limit,
+            branch_id=branch.pk if branch else None,
+        )
+        return Response(suggestions)
+
+    @swagger_auto_schema(
+        method='get',
+        operation_summary="Trending books",
+        operation_description=(
+            "Books ranked by recent borrows, each borrow's weight halving every TRENDING_HALF_LIFE_DAYS. "
+            "Pass `?category=` for that category's leaderboard. Read from an index on the stored scores, "
+            "so the cost depends only on `limit`. A branch-scoped request ranks that branch's books."
+        ),
+        manual_parameters=[
+            openapi.Parameter('category', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                description="Number of books (default 10, at most TRENDING_MAX_LIMIT).",
+            ),
+        ],
+        responses={200: BookTrendingScoreSerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def trending(self, request):
+        limit = request.query_params.get('limit', '10')
+        limit = max(1, min(int(limit), settings.TRENDING_MAX_LIMIT)) if limit.isdigit() else 10
+        scores = BookTrendingScore.objects.select_related('book').filter(book__deleted_at__isnull=True)
+        category = request.query_params.get('category')
+        if category:
+            scores = scores.filter(category=category)
+        branch = request_branch(request)
+        if branch is not None:
+            scores = scores.filter(book__branch=branch)
+        scores = scores.order_by('-score')[:limit]
+        return Response(BookTrendingScoreSerializer(scores, many=True, context={'now': timezone.now()}).data)
+
+    @swagger_auto_schema(
+        method='get',
+        operation_summary="Check availability",
+        operation_description=(
+            "Availability of many books at once, plus available/total counts per category. "
+            "Pass `?ids=1,2,3&category=Fiction,History`, or POST the same as JSON lists `ids` and `categories`. "
+            "Unknown ids map to null. Answered from the node's availability bitmap. A branch-scoped request "
+            "counts that branch's books only, and its other books map to null."
+        ),
+        manual_parameters=[
+            openapi.Parameter('ids', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('category', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        ],
+        responses={200: openapi.Response(description="Availability by book id and counts by category.")},
+    )
+    @swagger_auto_schema(
+        method='post',
+        operation_summary="Check availability",
+        operation_description="Same as the GET form, for id lists too long for a query string.",
+        request_body=AvailabilityQuerySerializer,
+        responses={200: openapi.Response(description="Availability by book id and counts by category.")},
+    )
+    @action(detail=False, methods=['get', 'post'], permission_classes=[AllowAny])
+    def availability(self, request):
+        if request.method == 'GET':
+            data = {
+                'ids': [i for i in request.query_params.get('ids', '').split(',') if i.strip()],
+                'categories': [c.strip() for c in request.query_params.get('category', '').split(',') if c.strip()],
+            }
+        else:
+            data = request.data
+        query = AvailabilityQuerySerializer(data=data)
+        query.is_valid(raise_exception=True)
+        ids = query.validated_data['ids']
+        categories = query.validated_data['categories']
+
+        branch = request_branch(request)
+        states = None
+        # The bitmap does not record branches; scoped requests go to the database.
+        if availability_bitmap.enabled() and branch is None:
+            try:
+                bitmap = availability_bitmap.get_bitmap()
+                bitmap.sync_if_stale()
+                states = bitmap.lookup(ids)
+                counts = bitmap.category_counts(categories)
+            except OSError:
+                # e.g. a read-only filesystem: answer from the database instead.
+                logger.exception("Could not open the availability bitmap.")
+                states = None
+        if states is None:
+            books = Book.objects.all() if branch is None else Book.objects.filter(branch=branch)
+            found = dict(books.filter(id__in=ids).values_list('id', 'availability'))
+            states = [found.get(book_id) for book_id in ids]
+            counts = {name: {'available': 0, 'total': 0} for name in categories}
+            rows = (
+                books.filter(category__in=categories).values('category')
+                .annotate(total=Count('id'), available=Count('id', filter=Q(availability=True)))
+                .order_by()
+            )
+            for row in rows:
+                counts[row['category']] = {'available': row['available'], 'total': row['total']}
 
+        return Response({
+            'books': {str(book_id): state for book_id, state in zip(ids, states)},
+            'categories': counts,
+        })
 
-class AuthorViewSet(viewsets.ModelViewSet):
+    @swagger_auto_schema(
+        method='get',
+        operation_summary="Related books",
+        operation_description=(
+            "Books most often borrowed by members who also borrowed this book. "
+            "Served from a precomputed table; accepts `?limit=` (default and max RELATED_BOOKS_TOP_K). "
+            "A branch-scoped request only finds the branch's books and lists related books from it."
+        ),
+        manual_parameters=[openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER)],
+        responses={200: RelatedBookSerializer(many=True), 404: "No such book."},
+    )
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    def related(self, request, pk=None):
+        top_k = settings.RELATED_BOOKS_TOP_K
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', top_k)), top_k))
+        except ValueError:
+            limit = top_k
+        branch = request_branch(request)
+        books = Book.objects.all() if branch is None else Book.objects.filter(branch=branch)
+        if not str(pk).isdigit() or not books.filter(pk=pk).exists():
+            raise NotFound()
+        # Books queued for deletion keep their entries until the job removes them.
+        entries = RelatedBook.objects.filter(book_id=pk, related_book__deleted_at__isnull=True)
+        if branch is not None:
+            entries = entries.filter(related_book__branch=branch)
+        entries = entries.select_related('related_book__author').order_by('-score')[:limit]
+        return Response(RelatedBookSerializer(entries, many=True).data)
+
+
+class AuthorViewSet(IdempotentMixin, AuditedMixin, OptimisticConcurrencyMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing authors.
 
     Permissions:
     - Authenticated users can view author details.
     - Only librarians and admins can create, update, or delete authors.
+
+    Writes accept an `Idempotency-Key` header, and updates honour `If-Match`.
+    Every write is recorded in the audit trail.
     """
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
@@ -228,7 +510,10 @@ class AuthorViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="Update author",
-        operation_description="Fully update an author (librarians/admins only).",
+        operation_description=(
+            "Fully update an author (librarians/admins only). Send `If-Match` with the ETag from retrieve; "
+            "412 if the record changed since."
+        ),
         request_body=AuthorSerializer,
         responses={200: AuthorSerializer()},
     )
@@ -237,7 +522,10 @@ class AuthorViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="Partial update author",
-        operation_description="Partially update an author (librarians/admins only).",
+        operation_description=(
+            "Partially update an author (librarians/admins only). Send `If-Match` with the ETag from retrieve; "
+            "412 if the record changed since."
+        ),
         request_body=AuthorSerializer,
         responses={200: AuthorSerializer()},
     )
@@ -246,8 +534,144 @@ class AuthorViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="Delete author",
-        operation_description="Delete an author (librarians/admins only).",
-        responses={204: 'No Content'},
+        operation_description=(
+            "Delete an author (librarians/admins only). "
+            "With `?mode=async` the author and their books disappear at once and are removed in the background; "
+            "poll the returned job at `/deletions/<id>/`."
+        ),
+        manual_parameters=[delete_mode_param],
+        responses={204: 'No Content', 202: DeletionJobSerializer()},
     )
     def destroy(self, request, *args, **kwargs):
+        if request.query_params.get('mode') == 'async':
+            return schedule_deletion(request, self.get_object())
         return super().destroy(request, *args, **kwargs)
+
+
+class BranchViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for library branches.
+
+    Permissions:
+    - Anyone can list and view branches.
+    - Only librarians and admins can create, update, or delete them.
+    """
+    queryset = Branch.objects.order_by('name')
+    serializer_class = BranchSerializer
+
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve']:
+            return [AllowAny()]
+        return [IsLibrarianOrAdminOrReadOnly()]
+
+    @swagger_auto_schema(
+        operation_summary="List branches",
+        operation_description="All library branches. Pass a branch's `code` as `?branch=` or `X-Branch` to scope requests.",
+        responses={200: BranchSerializer(many=True)},
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class DeletionJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Progress of background author and book deletions (librarians only).
+    """
+    queryset = DeletionJob.objects.order_by('-created_at')
+    serializer_class = DeletionJobSerializer
+    permission_classes = [IsLibrarianGroupOnly]
+
+    @swagger_auto_schema(
+        operation_summary="List deletion jobs",
+        operation_description="Background deletions, newest first.",
+        responses={200: DeletionJobSerializer(many=True)},
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_summary="Retrieve a deletion job",
+        operation_description="Status and progress (`deleted` of `total` rows) of a background deletion.",
+        responses={200: DeletionJobSerializer()},
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        method='post',
+        operation_summary="Retry a failed deletion",
+        operation_description="Queue a failed job again; it resumes where it stopped.",
+        request_body=no_body,
+        responses={200: DeletionJobSerializer(), 409: "The job has not failed."},
+    )
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        job = self.get_object()
+        if not deletion.retry(job):
+            return Response({"detail": "Only failed jobs can be retried."}, status=status.HTTP_409_CONFLICT)
+        job.refresh_from_db()
+        return Response(DeletionJobSerializer(job).data)
+
+    @swagger_auto_schema(
+        method='post',
+        operation_summary="Cancel a failed deletion",
+        operation_description=(
+            "Cancel a failed job and bring its author or book (and the author's books) back into the catalog. "
+            "Rows the job already removed, such as loan history, are not restored."
+        ),
+        request_body=no_body,
+        responses={200: DeletionJobSerializer(), 409: "The job has not failed."},
+    )
+    @action(detail=True, methods=['post'])
+    def restore(self, request, pk=None):
+        job = self.get_object()
+        model = deletion.MODELS[job.model]
+        deleted_at = model.all_objects.filter(pk=job.object_id).values_list('deleted_at', flat=True).first()
+        if not deletion.restore(job):
+            return Response({"detail": "Only failed jobs can be cancelled."}, status=status.HTTP_409_CONFLICT)
+        audit.record(AuditEvent.UPDATE, model, job.object_id, {'deleted_at': [deleted_at, None]}, request=request)
+        job.refresh_from_db()
+        return Response(DeletionJobSerializer(job).data)
+
+
+async def availability_stream(request):
+    """
+    Server-sent events stream of book availability changes.
+
+    Query parameters narrow the subscription: `books` (comma-separated IDs)
+    and `category` (comma-separated names). Without either, every change is
+    sent. Each event is `event: availability` with a JSON body holding
+    `book_id`, `title`, `category` and `availability`. Needs the ASGI
+    application (`library_system.asgi`); idle connections cost one small
+    queue each and receive a comment line every SSE_HEARTBEAT_SECONDS.
+
+    Under WSGI Django would read the endless stream to the end before
+    sending anything, holding a worker forever, so the view answers 501.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "The availability stream needs the ASGI application (library_system.asgi)."},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    book_ids = [int(i) for i in request.GET.get('books', '').split(',') if i.strip().isdigit()]
+    categories = [c.strip() for c in request.GET.get('category', '').split(',') if c.strip()]
+
+    async def events():
+        broker = get_broker()
+        subscription = broker.subscribe(book_ids=book_ids, categories=categories)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await subscription.get(timeout=settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: availability\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
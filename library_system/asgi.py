@@ -2,6 +2,8 @@
 ASGI config for library_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn library_system.asgi:application``)
+to enable the live availability stream at ``/api/v1/books/stream/``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -1,6 +1,8 @@
 from decouple import config
 from pathlib import Path
 from datetime import timedelta
+from importlib.util import find_spec
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,6 +46,34 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_FILTER_BACKENDS': (
+        'django_filters.rest_framework.DjangoFilterBackend',
+    ),
+    # JSON by default; columnar JSON and MessagePack on request (api.renderers).
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.ColumnarJSONRenderer',
+    ) + (('api.renderers.MessagePackRenderer',) if find_spec('msgpack') else ()),
+    # Cost-weighted sliding windows (api.throttling). Rates are cost units per
+    # period; a URL name (e.g. 'books-borrow') sets that route's own budget.
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.UserCostThrottle',
+        'api.throttling.AnonCostThrottle',
+        'api.throttling.RouteCostThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'user': config('THROTTLE_USER_RATE', default='1200/min'),
+        'anon': config('THROTTLE_ANON_RATE', default='300/min'),
+        'route': config('THROTTLE_ROUTE_RATE', default='600/min'),
+        'books-borrow': '30/min',
+        'books-return-book': '30/min',
+        'members-import-members': '200/hour',
+    },
+    # Reverse proxies in front of the app. Clients are identified by the
+    # X-Forwarded-For entry this many hops back; 0 uses REMOTE_ADDR and ignores
+    # the client-supplied header.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
 SIMPLE_JWT = {
@@ -73,6 +103,8 @@ DJOSER = {
 
 
 MIDDLEWARE = [
+    "api.middleware.AccessLogMiddleware",
+    "api.middleware.CompressionMiddleware",
     'corsheaders.middleware.CorsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     "django.middleware.security.SecurityMiddleware",
@@ -83,6 +115,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.RateLimitHeadersMiddleware",
 ]
 
 ROOT_URLCONF = "library_system.urls"
@@ -108,22 +141,99 @@ WSGI_APPLICATION = "library_system.wsgi.app"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-# DATABASES = {
-#     "default": {
-#         "ENGINE": "django.db.backends.sqlite3",
-#         "NAME": BASE_DIR / "db.sqlite3",
-#     }
-# }
+# DB_ENGINE=sqlite runs on a single SQLite file for small, single-node
+# deployments. Pragmas are applied to every connection: WAL lets reads run
+# alongside the one writer, busy_timeout makes writers queue instead of failing,
+# and mmap_size / cache_size (KiB) keep the hot pages in memory. Transactions
+# start with BEGIN IMMEDIATE, so borrow and return take the write lock up front
+# rather than failing when a read transaction tries to upgrade.
+DB_ENGINE = config('DB_ENGINE', default='postgresql')
+
+if DB_ENGINE == 'sqlite':
+    SQLITE_BUSY_TIMEOUT_MS = config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int)
+    SQLITE_MMAP_SIZE = config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int)
+    SQLITE_CACHE_SIZE_KIB = config('SQLITE_CACHE_SIZE_KIB', default=64 * 1024, cast=int)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
+            # Keep connections (and their page cache) between requests.
+            'CONN_MAX_AGE': config('CONN_MAX_AGE', default=600, cast=int),
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};'
+                    f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+                    f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB};'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA foreign_keys=ON;'
+                ),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('dbname'),
+            'USER': config('user'),
+            'PASSWORD': config('password'),
+            'HOST': config('host'),
+            'PORT': config('port')
+        }}
+
+# Cache
+# Catalog caches are invalidated on write, so every worker must share one
+# cache (e.g. django.core.cache.backends.redis.RedisCache) in production.
+
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = config('CACHE_LOCATION', default='')
+
+# Responses stored for Idempotency-Key retries (api.idempotency). Entries expire
+# after IDEMPOTENCY_TTL_SECONDS and the least recently used are evicted first
+# (with Redis, run it with `maxmemory-policy allkeys-lru`).
+IDEMPOTENCY_CACHE = 'idempotency'
+IDEMPOTENCY_TTL_SECONDS = config('IDEMPOTENCY_TTL_SECONDS', default=24 * 3600, cast=int)
+# How long a claimed key blocks retries if its request never finishes.
+IDEMPOTENCY_LOCK_SECONDS = 60
+
+# Throttle counters (api.throttling). Defaults to the main cache backend; set a
+# shared backend (e.g. Redis) so limits hold across workers.
+THROTTLE_CACHE = 'throttle'
+THROTTLE_CACHE_BACKEND = config('THROTTLE_CACHE_BACKEND', default=CACHE_BACKEND)
+# Throttle units per request by viewset action; views add their own with
+# `throttle_costs`. Anything not listed costs 1.
+THROTTLE_COSTS = {
+    'list': 10,
+    'paginated_list': 2,
+    'create': 2,
+    'update': 2,
+    'partial_update': 2,
+    'destroy': 2,
+}
 
-DATABASES = {
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': config('dbname'),
-        'USER': config('user'),
-        'PASSWORD': config('password'),
-        'HOST': config('host'),
-        'PORT': config('port')
-    }}
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+    },
+    IDEMPOTENCY_CACHE: {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION or 'idempotency',
+        'KEY_PREFIX': 'idempotency',
+        'TIMEOUT': IDEMPOTENCY_TTL_SECONDS,
+        'OPTIONS': {'MAX_ENTRIES': 10000} if CACHE_BACKEND.endswith('LocMemCache') else {},
+    },
+    THROTTLE_CACHE: {
+        'BACKEND': THROTTLE_CACHE_BACKEND,
+        'LOCATION': config('THROTTLE_CACHE_LOCATION', default=CACHE_LOCATION or 'throttle'),
+        'KEY_PREFIX': 'throttle',
+        'OPTIONS': {'MAX_ENTRIES': 100000} if THROTTLE_CACHE_BACKEND.endswith('LocMemCache') else {},
+    },
+}
 
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:5173',
@@ -178,7 +288,134 @@ STATICFILES_STPORAGE = "whitenoise.storage.CompressedStaticFilesStorage"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
-EMAIL_BACKEND = EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Circulation
+# Defaults used for categories that have no LoanPolicy row.
+
+LIBRARY_DEFAULT_LOAN_DAYS = config('LIBRARY_DEFAULT_LOAN_DAYS', default=14, cast=int)
+LIBRARY_DEFAULT_FINE_PER_DAY = config('LIBRARY_DEFAULT_FINE_PER_DAY', default='0.25')
+# Half-life of a borrow's weight in the `/books/trending/` score.
+TRENDING_HALF_LIFE_DAYS = config('TRENDING_HALF_LIFE_DAYS', default=7.0, cast=float)
+TRENDING_MAX_LIMIT = config('TRENDING_MAX_LIMIT', default=100, cast=int)
+# Open loans per member, for members without their own `loan_limit`.
+LIBRARY_DEFAULT_LOAN_LIMIT = config('LIBRARY_DEFAULT_LOAN_LIMIT', default=5, cast=int)
+
+# Change feed cursors stop below a sequence number that is not visible yet,
+# in case its transaction is still open. After this long it is taken to have
+# rolled back, so transactions that write books, authors or borrow records
+# must commit within this time or their events may be skipped.
+CHANGE_FEED_GAP_TIMEOUT_SECONDS = config('CHANGE_FEED_GAP_TIMEOUT_SECONDS', default=60, cast=float)
+CHANGE_FEED_PAGE_SIZE = 500
+# Events checked for missing sequence numbers per change feed request.
+CHANGE_FEED_SCAN_SIZE = 5000
+
+# Live availability events (`/api/v1/books/stream/`, ASGI only). Replace the
+# broker with one backed by a shared system to fan out across processes.
+LIVE_EVENTS_BROKER = config('LIVE_EVENTS_BROKER', default='api.pubsub.InProcessBroker')
+SSE_HEARTBEAT_SECONDS = 15
+
+# Serve the public book list and detail from an in-process catalog copy in
+# each worker. Copies refresh when a write bumps the shared catalog generation
+# and, in case the cache is not shared, at least this often (seconds).
+CATALOG_SNAPSHOT_ENABLED = config('CATALOG_SNAPSHOT_ENABLED', default=False, cast=bool)
+CATALOG_SNAPSHOT_MAX_STALENESS = config('CATALOG_SNAPSHOT_MAX_STALENESS', default=5, cast=float)
+
+# Answer `/books/suggest/` from an in-process prefix index in each worker,
+# refreshed on the same schedule as the catalog snapshot, instead of `LIKE`
+# queries. Costs memory per worker, like the snapshot.
+SUGGEST_INDEX_ENABLED = config('SUGGEST_INDEX_ENABLED', default=False, cast=bool)
+# Most suggestions `/books/suggest/` returns.
+SUGGEST_MAX_LIMIT = 50
+
+# Memory-mapped availability bitmap shared by the workers on a node (see
+# books.availability), e.g. /var/lib/library/availability.bitmap. Must be on a
+# local, writable filesystem; empty (the default) answers from the database.
+AVAILABILITY_BITMAP_PATH = config('AVAILABILITY_BITMAP_PATH', default='')
+# How often a worker replays book changes from the change feed into the
+# bitmap, which is how writes made on other nodes reach this one.
+AVAILABILITY_BITMAP_SYNC_SECONDS = config('AVAILABILITY_BITMAP_SYNC_SECONDS', default=5, cast=float)
+AVAILABILITY_MAX_IDS = 10000
+
+# A deletion worker that stops renewing its lease for this long is presumed dead.
+DELETION_JOB_LEASE_SECONDS = 300
+
+# `/api/v1/batch/`: calls per batch, and threads for running batched GETs concurrently.
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = config('BATCH_MAX_WORKERS', default=4, cast=int)
+
+# Bulk member import: members per `POST /members/import/` (each password hash
+# takes a few hundred milliseconds), and the threads hashing them in each web
+# worker. `manage.py import_members` hashes on a process pool instead.
+MEMBER_IMPORT_MAX_ROWS = 100
+MEMBER_IMPORT_HASH_WORKERS = config('MEMBER_IMPORT_HASH_WORKERS', default=4, cast=int)
+
+# Audit trail (api.audit): events are buffered per process and written when
+# AUDIT_BUFFER_SIZE are waiting or every AUDIT_FLUSH_SECONDS. Events that cannot
+# be written go to AUDIT_FALLBACK_PATH; load them with `replay_audit_fallback`.
+AUDIT_ENABLED = config('AUDIT_ENABLED', default=True, cast=bool)
+AUDIT_BUFFER_SIZE = config('AUDIT_BUFFER_SIZE', default=200, cast=int)
+AUDIT_FLUSH_SECONDS = config('AUDIT_FLUSH_SECONDS', default=2.0, cast=float)
+AUDIT_MAX_QUEUED = config('AUDIT_MAX_QUEUED', default=50000, cast=int)
+# Outside the source tree, which is read-only in deployments; point it at
+# persistent storage (e.g. /var/lib/library/audit-fallback.jsonl) in production.
+AUDIT_FALLBACK_PATH = config(
+    'AUDIT_FALLBACK_PATH', default=str(Path(tempfile.gettempdir()) / 'library-audit-fallback.jsonl')
+)
+
+# Responses of at least COMPRESSION_MIN_BYTES are compressed with brotli (if
+# the `brotli` package is installed) or gzip, as the client accepts.
+COMPRESSION_MIN_BYTES = config('COMPRESSION_MIN_BYTES', default=1024, cast=int)
+COMPRESSION_GZIP_LEVEL = config('COMPRESSION_GZIP_LEVEL', default=6, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int)
+# Only API data is compressed: HTML pages (admin, browsable API) carry CSRF
+# tokens next to reflected input and are left alone (BREACH).
+COMPRESSION_PATH_PREFIX = '/api/'
+COMPRESSION_CONTENT_TYPES = [
+    'application/json',
+    'application/vnd.library.columnar+json',
+    'application/msgpack',
+]
+
+# Access log (api.middleware.AccessLogMiddleware): one JSON line per request on
+# stdout, written by a background thread from a queue of ACCESS_LOG_QUEUE_SIZE
+# lines (dropped and counted when full). Successful requests faster than
+# ACCESS_LOG_SLOW_MS are sampled: per URL name, else at ACCESS_LOG_SAMPLE_RATE.
+ACCESS_LOG_ENABLED = config('ACCESS_LOG_ENABLED', default=True, cast=bool)
+ACCESS_LOG_QUEUE_SIZE = config('ACCESS_LOG_QUEUE_SIZE', default=10000, cast=int)
+ACCESS_LOG_SLOW_MS = config('ACCESS_LOG_SLOW_MS', default=1000, cast=float)
+ACCESS_LOG_SAMPLE_RATE = config('ACCESS_LOG_SAMPLE_RATE', default=1.0, cast=float)
+ACCESS_LOG_SAMPLE_RATES = {
+    'books-list': 0.1,
+    'books-detail': 0.1,
+    'books-suggest': 0.05,
+    'books-availability': 0.1,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'access': {
+            'class': 'api.access_log.AccessLogHandler',
+            'maxsize': ACCESS_LOG_QUEUE_SIZE,
+        },
+    },
+    'loggers': {
+        'api.access': {'handlers': ['access'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Admin changelists show an estimated row count for unfiltered tables larger than this.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Number of related books kept per book by `build_related_books`.
+RELATED_BOOKS_TOP_K = config('RELATED_BOOKS_TOP_K', default=20, cast=int)
+
+# Outgoing mail is queued in the database and delivered by `manage.py send_queued_email`.
+EMAIL_BACKEND = 'api.mail.QueuedEmailBackend'
+EMAIL_QUEUE_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_QUEUE_MAX_ATTEMPTS = config('EMAIL_QUEUE_MAX_ATTEMPTS', default=6, cast=int)
+EMAIL_QUEUE_RETRY_BASE_SECONDS = config('EMAIL_QUEUE_RETRY_BASE_SECONDS', default=60, cast=int)
+EMAIL_QUEUE_LEASE_SECONDS = config('EMAIL_QUEUE_LEASE_SECONDS', default=300, cast=int)
 EMAIL_HOST = config('EMAIL_HOST')
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', cast=bool)
 EMAIL_PORT = config('EMAIL_PORT')
@@ -0,0 +1,165 @@
+import math
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from .models import BookLoanStats, BookTrendingScore, CategoryDailyLoanStats, CirculationGauge
+
+# Trending scores are log(sum of exp(rate * (borrowed_at - epoch))); see trending_exponent().
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def increment(model, lookup, values=None, **deltas):
+    """
+    Add `deltas` to the row matching `lookup`, creating it when missing.
+
+    Uses a single `UPDATE ... SET col = col + n` so concurrent borrow/return
+    transactions never lose increments. `values` are plain assignments applied
+    alongside the increments.
+    """
+    values = values or {}
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates, **values):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas, **values)
+    except IntegrityError:
+        # Another transaction created the row first.
+        model.objects.filter(**lookup).update(**updates, **values)
+
+
+def trending_rate():
+    """
+    Decay rate per second for TRENDING_HALF_LIFE_DAYS.
+    """
+    return math.log(2) / (settings.TRENDING_HALF_LIFE_DAYS * 86400)
+
+
+def trending_exponent(when):
+    """
+    A borrow at `when`, in log space. Decaying every score by the same factor
+    does not change their order, so instead of shrinking old borrows each new
+    one counts e^(rate * t) times more, and scores are kept as logarithms.
+    """
+    return trending_rate() * (when - TRENDING_EPOCH).total_seconds()
+
+
+def decayed(score, now=None):
+    """
+    A stored score as the decayed number of borrows as of `now`.
+    """
+    return math.exp(score - trending_exponent(now or timezone.now()))
+
+
+def bump_trending(book_id, category, when):
+    """
+    Add a borrow at `when` to the book's score: `score = logaddexp(score, x)`,
+    computed in one `UPDATE` so concurrent borrows are not lost.
+    """
+    x = Value(trending_exponent(when))
+    score = Greatest(F('score'), x) + Ln(Value(1.0) + Exp(-Abs(F('score') - x)))
+    if BookTrendingScore.objects.filter(book_id=book_id).update(score=score, category=category):
+        return
+    try:
+        with transaction.atomic():
+            BookTrendingScore.objects.create(book_id=book_id, category=category, score=trending_exponent(when))
+    except IntegrityError:
+        BookTrendingScore.objects.filter(book_id=book_id).update(score=score, category=category)
+
+
+def decrement(model, lookup, **deltas):
+    """
+    Subtract `deltas` from the row matching `lookup`, if there is one,
+    without going below zero.
+    """
+    model.objects.filter(**lookup).update(
+        **{field: Greatest(F(field) - delta, 0) for field, delta in deltas.items()}
+    )
+
+
+def unbump_trending(book_id, when):
+    """
+    Take a borrow at `when` back out of the book's score:
+    `score = score + log(1 - e^(x - score))`. A score no larger than the
+    borrow's own term held nothing else, so its row is dropped.
+    """
+    x = trending_exponent(when)
+    scores = BookTrendingScore.objects.filter(book_id=book_id)
+    # Within rounding of x: this borrow was the only one left in the score.
+    scores.filter(score__lte=x + 1e-9).delete()
+    scores.update(score=F('score') + Ln(Value(1.0) - Exp(Value(x) - F('score'))))
+
+
+def record_borrow(record, first_active_loan):
+    increment(
+        BookLoanStats, {'book_id': record.book_id},
+        values={'last_borrowed_at': record.borrowed_at},
+        total_loans=1,
+    )
+    increment(
+        CategoryDailyLoanStats,
+        {'day': timezone.localdate(record.borrowed_at), 'category': record.book.category},
+        loans=1,
+    )
+    bump_trending(record.book_id, record.book.category, record.borrowed_at)
+    increment(CirculationGauge, {'name': CirculationGauge.ACTIVE_LOANS}, value=1)
+    if first_active_loan:
+        increment(CirculationGauge, {'name': CirculationGauge.ACTIVE_BORROWERS}, value=1)
+
+
+def record_return(record, last_active_loan):
+    record_returns(record.returned_at, {record.book.category: 1}, borrowers_done=int(last_active_loan))
+
+
+def record_returns(returned_at, category_counts, borrowers_done):
+    """
+    Account for loans closed at `returned_at`. `category_counts` maps each
+    category to the number of its loans returned; `borrowers_done` is the
+    number of members left without any open loan.
+    """
+    day = timezone.localdate(returned_at)
+    for category, count in category_counts.items():
+        increment(CategoryDailyLoanStats, {'day': day, 'category': category}, returns=count)
+    increment(CirculationGauge, {'name': CirculationGauge.ACTIVE_LOANS}, value=-sum(category_counts.values()))
+    if borrowers_done:
+        increment(CirculationGauge, {'name': CirculationGauge.ACTIVE_BORROWERS}, value=-borrowers_done)
+
+
+def record_deletion(record, last_active_loan):
+    """
+    Take a deleted loan back out of the rollups, as if it had never been made,
+    so they keep matching what backfill_circulation_stats would compute.
+    `last_active_loan` is whether an open loan was its member's last one.
+    """
+    category = record.book.category
+    decrement(BookLoanStats, {'book_id': record.book_id}, total_loans=1)
+    decrement(CategoryDailyLoanStats, {'day': timezone.localdate(record.borrowed_at), 'category': category}, loans=1)
+    unbump_trending(record.book_id, record.borrowed_at)
+    if record.returned_at is not None:
+        decrement(
+            CategoryDailyLoanStats, {'day': timezone.localdate(record.returned_at), 'category': category}, returns=1
+        )
+        return
+    increment(CirculationGauge, {'name': CirculationGauge.ACTIVE_LOANS}, value=-1)
+    if last_active_loan:
+        increment(CirculationGauge, {'name': CirculationGauge.ACTIVE_BORROWERS}, value=-1)
+
+
+def record_purge(loans):
+    """
+    Take closed loans of books being purged by a deletion job out of the
+    daily category rollups. `loans` are `(category, borrowed_at, returned_at)`
+    tuples. The books' own BookLoanStats and trending rows are purged with them.
+    """
+    borrowed = Counter((timezone.localdate(borrowed_at), category) for category, borrowed_at, _ in loans)
+    returned = Counter((timezone.localdate(returned_at), category) for category, _, returned_at in loans)
+    for (day, category), count in borrowed.items():
+        decrement(CategoryDailyLoanStats, {'day': day, 'category': category}, loans=count)
+    for (day, category), count in returned.items():
+        decrement(CategoryDailyLoanStats, {'day': day, 'category': category}, returns=count)
@@ -0,0 +1,281 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from api import audit
+from api.changefeed import record_bulk
+from api.models import AuditEvent, ChangeEvent
+from api.pubsub import publish_availability
+from books.availability import record_books
+from books.cache import invalidate_catalog_caches
+from books.models import Book, LoanPolicy
+from . import analytics
+from .models import BorrowRecord, Member
+
+
+BULK_BATCH = 500
+
+
+class CirculationError(Exception):
+    """
+    Raised when a borrow or return cannot be carried out.
+    """
+
+
+def claim_loan_slot(member):
+    """
+    Count a new loan against `member` unless they are at their loan limit.
+
+    A single conditional `UPDATE`, so two concurrent borrows cannot both take
+    the member's last slot. Returns whether the slot was taken.
+    """
+    limit = Coalesce(F('loan_limit'), Value(settings.LIBRARY_DEFAULT_LOAN_LIMIT))
+    return Member.objects.filter(pk=member.pk, active_loans__lt=limit).update(
+        active_loans=F('active_loans') + 1,
+        total_loans=F('total_loans') + 1,
+    ) == 1
+
+
+def release_loan_slots(member_counts):
+    """
+    Take returned loans off the members' active loan counters. `member_counts`
+    maps member ids to the number of their loans returned.
+    """
+    by_count = {}
+    for member_id, count in member_counts.items():
+        by_count.setdefault(count, []).append(member_id)
+    for count, member_ids in by_count.items():
+        for ids in batched(member_ids):
+            Member.objects.filter(id__in=ids).update(active_loans=Greatest(F('active_loans') - count, 0))
+
+
+def borrow_book(member, book, actor=None):
+    """
+    Lend `book` to `member` and update the circulation rollups in the same transaction.
+    The loan is audited as made by `actor`, the member themselves by default.
+    """
+    with transaction.atomic():
+        book = Book.objects.select_for_update().get(pk=book.pk)
+        if not book.availability:
+            raise CirculationError("Book is currently not available.")
+        if not claim_loan_slot(member):
+            raise CirculationError("You have reached your limit of books on loan. Return one to borrow another.")
+
+        first_active_loan = not BorrowRecord.objects.filter(
+            member=member,
+            returned_at__isnull=True
+        ).exists()
+
+        borrowed_at = timezone.now()
+        record = BorrowRecord.objects.create(
+            member=member,
+            book=book,
+            borrowed_at=borrowed_at,
+            due_date=LoanPolicy.for_category(book.category).due_date(borrowed_at)
+        )
+        book.availability = False
+        book.save()
+        audit.record(AuditEvent.BORROW, record, record.pk, audit.diff({}, audit.values(record)), actor=actor or member)
+
+        analytics.record_borrow(record, first_active_loan)
+        transaction.on_commit(lambda: publish_availability(book))
+    return record
+
+
+def finalize_fine(record, policy):
+    """
+    Settle the overdue days and fine of `record` as of its return, so the
+    amount no longer depends on when `assess_fines` last ran. Loans from
+    before due dates were tracked get one from `policy`.
+    """
+    if record.due_date is None:
+        record.due_date = policy.due_date(record.borrowed_at)
+    record.overdue_days, record.fine = policy.assess(record.due_date, record.returned_at)
+
+
+def return_book(member, book):
+    """
+    Close `member`'s open loan of `book` and update the circulation rollups in the same transaction.
+    """
+    with transaction.atomic():
+        try:
+            record = BorrowRecord.objects.select_for_update().select_related('book').get(
+                member=member,
+                book=book,
+                returned_at__isnull=True
+            )
+        except BorrowRecord.DoesNotExist:
+            raise CirculationError("You do not have an active borrow record for this book.")
+
+        record.returned_at = timezone.now()
+        finalize_fine(record, LoanPolicy.for_category(record.book.category))
+        record.save()
+        release_loan_slots({member.pk: 1})
+        audit.record(AuditEvent.RETURN, record, record.pk, {'returned_at': [None, record.returned_at]}, actor=member)
+
+        book = record.book
+        # A book awaiting background deletion stays out of the catalog.
+        if book.deleted_at is None:
+            book.availability = True
+            book.save()
+
+        last_active_loan = not BorrowRecord.objects.filter(
+            member=member,
+            returned_at__isnull=True
+        ).exists()
+        analytics.record_return(record, last_active_loan)
+        transaction.on_commit(lambda: publish_availability(book))
+    return record
+
+
+def forget_loan(record, origin=None):
+    """
+    Take a deleted loan off its member's counters and the circulation
+    rollups. An open loan also frees its book. Connected to `post_delete`,
+    so loans removed by cascades and through the admin are covered as well
+    as API deletes. `origin` is the instance or queryset the deletion
+    started from.
+    """
+    is_open = record.returned_at is None
+    Member.objects.filter(pk=record.member_id).update(
+        active_loans=Greatest(F('active_loans') - int(is_open), 0),
+        total_loans=Greatest(F('total_loans') - 1, 0),
+    )
+    last_active_loan = is_open and not BorrowRecord.objects.filter(
+        member_id=record.member_id,
+        returned_at__isnull=True
+    ).exists()
+    if last_active_loan and origin is not None:
+        # A cascade deletes all of a member's loans before the receivers run,
+        # so each one looks like the last; the borrower is counted once.
+        done = vars(origin).setdefault('_borrowers_done', set())
+        last_active_loan = record.member_id not in done
+        done.add(record.member_id)
+    analytics.record_deletion(record, last_active_loan)
+    if is_open and Book.objects.filter(pk=record.book_id, deleted_at__isnull=True, availability=False).update(
+        availability=True, version=F('version') + 1
+    ):
+        after_bulk_availability_change([record.book_id])
+
+
+def forget_purged_loans(records):
+    """
+    Set-based `forget_loan` for the closed loans in `records`, a queryset of
+    BorrowRecord or ArchivedBorrowRecord, that a deletion job is about to
+    remove without `post_delete` receivers: takes them off their members'
+    total loan counters and the daily category rollups.
+    """
+    loans = list(records.values_list('member_id', 'book__category', 'borrowed_at', 'returned_at'))
+    by_count = {}
+    for member_id, count in Counter(loan[0] for loan in loans).items():
+        by_count.setdefault(count, []).append(member_id)
+    for count, member_ids in by_count.items():
+        for ids in batched(member_ids):
+            Member.objects.filter(id__in=ids).update(total_loans=Greatest(F('total_loans') - count, 0))
+    analytics.record_purge([loan[1:] for loan in loans])
+    return len(loans)
+
+
+def batched(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BULK_BATCH):
+        yield ids[start:start + BULK_BATCH]
+
+
+def after_bulk_availability_change(book_ids):
+    """
+    Record availability changes made with `QuerySet.update()` in the change
+    feed and, once committed, refresh catalog caches and the availability
+    bitmap and notify live watchers.
+    """
+    books = []
+    for ids in batched(book_ids):
+        rows = list(Book.objects.filter(id__in=ids).values())
+        record_bulk(Book, rows, ChangeEvent.AVAILABILITY)
+        books.extend(Book(**row) for row in rows)
+
+    def notify():
+        invalidate_catalog_caches()
+        record_books([(book.pk, book.category, book.availability) for book in books])
+        for book in books:
+            publish_availability(book)
+    transaction.on_commit(notify)
+
+
+def bulk_return(records, actor=None):
+    """
+    Close every open loan in the `records` queryset in one transaction with
+    set-based updates, settling each loan's fine, and update the circulation
+    rollups accordingly.
+    The returns are audited as made by `actor`. Returns the number of loans closed.
+    """
+    returned_at = timezone.now()
+    with transaction.atomic():
+        loans = list(
+            records.filter(returned_at__isnull=True)
+            .select_for_update()
+            .values_list('id', 'member_id', 'book_id', 'book__category', 'borrowed_at', 'due_date')
+        )
+        if not loans:
+            return 0
+        record_ids = [loan[0] for loan in loans]
+        member_ids = {loan[1] for loan in loans}
+        book_ids = {loan[2] for loan in loans}
+
+        policies = {category: LoanPolicy.for_category(category) for category in {loan[3] for loan in loans}}
+        returned = []
+        for record_id, _, _, category, borrowed_at, due_date in loans:
+            record = BorrowRecord(id=record_id, borrowed_at=borrowed_at, due_date=due_date, returned_at=returned_at)
+            finalize_fine(record, policies[category])
+            returned.append(record)
+        for start in range(0, len(returned), BULK_BATCH):
+            batch = returned[start:start + BULK_BATCH]
+            BorrowRecord.objects.bulk_update(batch, ['returned_at', 'due_date', 'overdue_days', 'fine'])
+            record_bulk(
+                BorrowRecord,
+                BorrowRecord.objects.filter(id__in=[record.id for record in batch]).values(),
+                ChangeEvent.UPDATE,
+            )
+        for ids in batched(book_ids):
+            Book.objects.filter(id__in=ids).update(availability=True, version=F('version') + 1)
+        after_bulk_availability_change(book_ids)
+        release_loan_slots(Counter(loan[1] for loan in loans))
+        for record_id in record_ids:
+            audit.record(AuditEvent.RETURN, BorrowRecord, record_id, {'returned_at': [None, returned_at]}, actor=actor)
+
+        still_borrowing = set()
+        for ids in batched(member_ids):
+            still_borrowing.update(
+                BorrowRecord.objects.filter(member_id__in=ids, returned_at__isnull=True)
+                .values_list('member_id', flat=True).distinct()
+            )
+        analytics.record_returns(
+            returned_at,
+            Counter(loan[3] for loan in loans),
+            borrowers_done=len(member_ids - still_borrowing),
+        )
+    return len(loans)
+
+
+def bulk_set_availability(books, availability, actor=None):
+    """
+    Set `availability` on every book in the `books` queryset that differs,
+    with set-based updates. The changes are audited as made by `actor`.
+    Returns the number of books changed.
+    """
+    with transaction.atomic():
+        book_ids = list(
+            books.filter(availability=not availability)
+            .select_for_update()
+            .values_list('id', flat=True)
+        )
+        for ids in batched(book_ids):
+            Book.objects.filter(id__in=ids).update(availability=availability, version=F('version') + 1)
+        for book_id in book_ids:
+            audit.record(AuditEvent.UPDATE, Book, book_id, {'availability': [not availability, availability]}, actor=actor)
+        after_bulk_availability_change(book_ids)
+    return len(book_ids)
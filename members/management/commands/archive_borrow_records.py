@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.changefeed import record_bulk
+from api.db import delete_rows
+from api.models import ChangeEvent
+from members.models import ArchivedBorrowRecord, BorrowRecord
+
+ARCHIVED_FIELDS = (
+    'id', 'member_id', 'book_id', 'borrowed_at', 'due_date',
+    'returned_at', 'overdue_days', 'fine', 'branch_id',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move borrow records returned more than --days ago into the archive "
+        "table. Each batch is copied and deleted in its own short transaction "
+        "so the job can run while the API is serving traffic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help="Archive loans returned more than this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Records moved per transaction.")
+        parser.add_argument(
+            '--sleep', type=float, default=0.0,
+            help="Seconds to pause between batches to leave headroom for live traffic.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+        moved = 0
+
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    BorrowRecord.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(returned_at__lt=cutoff)
+                    .order_by('returned_at')
+                    .values(*ARCHIVED_FIELDS)[:batch_size]
+                )
+                if not batch:
+                    break
+                ArchivedBorrowRecord.objects.bulk_create(
+                    [ArchivedBorrowRecord(**row) for row in batch],
+                    ignore_conflicts=True,
+                )
+                # Moving a loan to the archive is not deleting it: the member
+                # counters and rollups count archived loans, so the delete
+                # skips the post_delete receivers (nothing references the rows),
+                # and the change feed gets `archive` events instead of deletes.
+                delete_rows(BorrowRecord, [row['id'] for row in batch])
+                record_bulk(BorrowRecord, batch, ChangeEvent.ARCHIVE)
+
+            moved += len(batch)
+            self.stdout.write(f"Archived {moved} records...")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} borrow records returned before {cutoff:%Y-%m-%d} in {elapsed:.2f}s."
+        ))
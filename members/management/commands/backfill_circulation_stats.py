@@ -0,0 +1,95 @@
+import math
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+
+from members.analytics import trending_exponent
+from members.models import (
+    ArchivedBorrowRecord,
+    BorrowRecord,
+    BookLoanStats,
+    BookTrendingScore,
+    CategoryDailyLoanStats,
+    CirculationGauge,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the circulation rollup tables from the full borrow history, "
+        "archived records included. "
+        "Run once after deploying the rollups, or to repair drift."
+    )
+
+    def handle(self, *args, **options):
+        books = {}
+        daily = defaultdict(lambda: {'loans': 0, 'returns': 0})
+
+        trending = {}
+
+        for records in (BorrowRecord.objects.all(), ArchivedBorrowRecord.objects.all()):
+            # log(sum(exp(x))) over each book's borrows, as bump_trending() accumulates it.
+            for book_id, category, borrowed_at in (
+                records.values_list('book', 'book__category', 'borrowed_at').order_by('borrowed_at').iterator(chunk_size=5000)
+            ):
+                x = trending_exponent(borrowed_at)
+                score = trending.get(book_id, (None, None))[1]
+                if score is not None:
+                    x = max(score, x) + math.log1p(math.exp(-abs(score - x)))
+                trending[book_id] = (category, x)
+
+            for row in records.values('book').annotate(total=Count('id'), last=Max('borrowed_at')).order_by():
+                total, last = books.get(row['book'], (0, None))
+                books[row['book']] = (total + row['total'], max(filter(None, (last, row['last']))))
+
+            loans = (
+                records.annotate(day=TruncDate('borrowed_at'))
+                .values('day', 'book__category').annotate(n=Count('id')).order_by()
+            )
+            for row in loans:
+                daily[row['day'], row['book__category']]['loans'] += row['n']
+            returns = (
+                records.filter(returned_at__isnull=False).annotate(day=TruncDate('returned_at'))
+                .values('day', 'book__category').annotate(n=Count('id')).order_by()
+            )
+            for row in returns:
+                daily[row['day'], row['book__category']]['returns'] += row['n']
+
+        book_rows = [
+            BookLoanStats(book_id=book_id, total_loans=total, last_borrowed_at=last)
+            for book_id, (total, last) in books.items()
+        ]
+        trending_rows = [
+            BookTrendingScore(book_id=book_id, category=category, score=score)
+            for book_id, (category, score) in trending.items()
+        ]
+        daily_rows = [
+            CategoryDailyLoanStats(day=day, category=category, **counts)
+            for (day, category), counts in daily.items()
+        ]
+
+        open_loans = BorrowRecord.objects.filter(returned_at__isnull=True)
+        gauges = [
+            CirculationGauge(name=CirculationGauge.ACTIVE_LOANS, value=open_loans.count()),
+            CirculationGauge(
+                name=CirculationGauge.ACTIVE_BORROWERS,
+                value=open_loans.values('member').distinct().count(),
+            ),
+        ]
+
+        with transaction.atomic():
+            BookLoanStats.objects.all().delete()
+            BookTrendingScore.objects.all().delete()
+            CategoryDailyLoanStats.objects.all().delete()
+            CirculationGauge.objects.all().delete()
+            BookLoanStats.objects.bulk_create(book_rows, batch_size=5000)
+            BookTrendingScore.objects.bulk_create(trending_rows, batch_size=5000)
+            CategoryDailyLoanStats.objects.bulk_create(daily_rows, batch_size=5000)
+            CirculationGauge.objects.bulk_create(gauges)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {len(book_rows)} books and {len(daily_rows)} category-days."
+        ))
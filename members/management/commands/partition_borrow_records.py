@@ -0,0 +1,118 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from books.models import Branch
+from members.models import BorrowRecord
+
+
+class Command(BaseCommand):
+    help = (
+        "PostgreSQL only, optional. Convert the borrow record table into one "
+        "partitioned by branch (LIST on branch_id): a partition per branch, "
+        "plus a default partition for loans without a branch. Once the table "
+        "is partitioned, running it again adds partitions for new branches. "
+        "Prints the SQL unless --apply is given. The first conversion rewrites "
+        "the table under an exclusive lock, so run it in a maintenance window."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true', help="Execute the SQL instead of printing it.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Partitioning is only supported on PostgreSQL.")
+
+        table = BorrowRecord._meta.db_table
+        if self.is_partitioned(table):
+            statements = self.new_branch_statements(table)
+        else:
+            statements = self.conversion_statements(table)
+
+        if not statements:
+            self.stdout.write("Every branch already has a partition.")
+            return
+        if not options['apply']:
+            self.stdout.write("BEGIN;")
+            for statement in statements:
+                self.stdout.write(f"{statement};")
+            self.stdout.write("COMMIT;")
+            return
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        self.stdout.write(self.style.SUCCESS(f"Applied {len(statements)} statements."))
+
+    def is_partitioned(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+                [table],
+            )
+            return cursor.fetchone() is not None
+
+    def partition_name(self, table, branch_id):
+        return connection.ops.quote_name(f"{table}_branch_{branch_id}")
+
+    def conversion_statements(self, table):
+        quote = connection.ops.quote_name
+        old = quote(f"{table}_unpartitioned")
+        default = quote(f"{table}_default")
+        partitions = [(branch_id, self.partition_name(table, branch_id))
+                      for branch_id in Branch.objects.order_by('id').values_list('id', flat=True)]
+
+        statements = [
+            f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE",
+            f"ALTER TABLE {quote(table)} RENAME TO {old}",
+            f"CREATE TABLE {quote(table)} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+            f"PARTITION BY LIST (branch_id)",
+        ]
+        for branch_id, name in partitions:
+            statements.append(f"CREATE TABLE {name} PARTITION OF {quote(table)} FOR VALUES IN ({int(branch_id)})")
+        statements += [
+            f"CREATE TABLE {default} PARTITION OF {quote(table)} DEFAULT",
+            f"INSERT INTO {quote(table)} OVERRIDING SYSTEM VALUE SELECT * FROM {old}",
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {quote(table)}",
+            # Dropping the old table frees its index and constraint names for the new ones.
+            f"DROP TABLE {old}",
+        ]
+        # Partitioned tables cannot have a primary key without the partition
+        # column; ids come from one sequence, so a key per partition suffices.
+        for name in [name for _, name in partitions] + [default]:
+            statements.append(f"ALTER TABLE {name} ADD PRIMARY KEY (id)")
+
+        with connection.schema_editor(collect_sql=True) as editor:
+            statements += [str(statement) for statement in editor._model_indexes_sql(BorrowRecord)]
+            for field in BorrowRecord._meta.local_fields:
+                if field.remote_field and field.db_constraint:
+                    statements.append(str(editor._create_fk_sql(
+                        BorrowRecord, field, "_fk_%(to_table)s_%(to_column)s"
+                    )))
+        return statements
+
+    def new_branch_statements(self, table):
+        quote = connection.ops.quote_name
+        default = quote(f"{table}_default")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = %s",
+                [table],
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+
+        statements = []
+        for branch_id in Branch.objects.order_by('id').values_list('id', flat=True):
+            if f"{table}_branch_{branch_id}" in existing:
+                continue
+            name = self.partition_name(table, branch_id)
+            # Rows for the branch already sit in the default partition; move
+            # them into the new table before attaching it.
+            statements += [
+                f"CREATE TABLE {name} (LIKE {quote(table)} INCLUDING DEFAULTS)",
+                f"INSERT INTO {name} SELECT * FROM {default} WHERE branch_id = {int(branch_id)}",
+                f"DELETE FROM {default} WHERE branch_id = {int(branch_id)}",
+                f"ALTER TABLE {name} ADD PRIMARY KEY (id)",
+                f"ALTER TABLE {quote(table)} ATTACH PARTITION {name} FOR VALUES IN ({int(branch_id)})",
+            ]
+        return statements
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from members.models import ArchivedBorrowRecord, BorrowRecord, Member
+
+
+def count_of(queryset):
+    """
+    Correlated subquery counting `queryset` rows for the outer member.
+    """
+    counted = queryset.filter(member=OuterRef('pk')).order_by().values('member').annotate(n=Count('id')).values('n')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every member's active_loans and total_loans from the borrow "
+        "records, archived ones included, and fix the members whose counters "
+        "drifted. Works through members in id ranges, one set-based UPDATE per "
+        "range, so it can run while the API is serving traffic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Members checked per UPDATE.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many members have drifted.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        active = count_of(BorrowRecord.objects.filter(returned_at__isnull=True))
+        total = count_of(BorrowRecord.objects.all()) + count_of(ArchivedBorrowRecord.objects.all())
+
+        last_id = Member.objects.aggregate(last=Max('id'))['last'] or 0
+        fixed = 0
+        for start in range(0, last_id + 1, batch_size):
+            with transaction.atomic():
+                drifted = (
+                    Member.objects.filter(id__gte=start, id__lt=start + batch_size)
+                    .annotate(actual_active=active, actual_total=total)
+                    .filter(~Q(active_loans=F('actual_active')) | ~Q(total_loans=F('actual_total')))
+                )
+                if options['dry_run']:
+                    fixed += drifted.count()
+                else:
+                    # Recomputed inside the UPDATE itself, so loans made meanwhile are not lost.
+                    fixed += Member.objects.filter(id__in=drifted.values('id')).update(
+                        active_loans=active, total_loans=total
+                    )
+
+        verb = "have drifted" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{fixed} members {verb}."))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0002_loanpolicy"),
+        ("members", "0003_rename_borrow_date_borrowrecord_borrowed_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="borrowrecord",
+            name="due_date",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="borrowrecord",
+            name="fine",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=8),
+        ),
+        migrations.AddField(
+            model_name="borrowrecord",
+            name="overdue_days",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="borrowrecord",
+            index=models.Index(
+                condition=models.Q(("returned_at__isnull", True)),
+                fields=["id"],
+                name="borrowrecord_open_idx",
+            ),
+        ),
+    ]
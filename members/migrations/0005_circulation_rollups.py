@@ -0,0 +1,81 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0002_loanpolicy"),
+        ("members", "0004_borrowrecord_due_date_fine"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CirculationGauge",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="BookLoanStats",
+            fields=[
+                (
+                    "book",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="loan_stats",
+                        serialize=False,
+                        to="books.book",
+                    ),
+                ),
+                ("total_loans", models.PositiveIntegerField(default=0)),
+                ("last_borrowed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-total_loans"], name="bookloanstats_total_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="CategoryDailyLoanStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("category", models.CharField(max_length=100)),
+                ("loans", models.PositiveIntegerField(default=0)),
+                ("returns", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "category"),
+                        name="categorydailyloanstats_day_category_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0003_related_books"),
+        ("members", "0005_circulation_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedBorrowRecord",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("borrowed_at", models.DateTimeField()),
+                ("due_date", models.DateTimeField(blank=True, null=True)),
+                ("returned_at", models.DateTimeField()),
+                ("overdue_days", models.PositiveIntegerField(default=0)),
+                (
+                    "fine",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=8),
+                ),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="borrowrecord",
+            index=models.Index(
+                condition=models.Q(("returned_at__isnull", False)),
+                fields=["returned_at"],
+                name="borrowrecord_returned_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedborrowrecord",
+            name="book",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="books.book",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedborrowrecord",
+            name="member",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
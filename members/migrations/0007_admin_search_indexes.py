@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:47
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("books", "0005_admin_search_indexes"),
+        ("members", "0006_archivedborrowrecord"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrowrecord",
+            index=models.Index(
+                fields=["-borrowed_at"], name="borrowrecord_borrowed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="member",
+            index=models.Index(
+                django.db.models.functions.text.Upper("username"),
+                name="member_username_upper_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="member",
+            index=models.Index(
+                django.db.models.functions.text.Upper("email"),
+                name="member_email_upper_idx",
+            ),
+        ),
+    ]
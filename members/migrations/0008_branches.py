@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0008_branches"),
+        ("members", "0007_admin_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedborrowrecord",
+            name="branch",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="books.branch",
+            ),
+        ),
+        migrations.AddField(
+            model_name="borrowrecord",
+            name="branch",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="loans",
+                to="books.branch",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrowrecord",
+            index=models.Index(
+                fields=["branch", "-borrowed_at"], name="borrowrecord_branch_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrowrecord",
+            index=models.Index(
+                condition=models.Q(("returned_at__isnull", True)),
+                fields=["branch", "member"],
+                name="borrowrecord_branch_open_idx",
+            ),
+        ),
+    ]
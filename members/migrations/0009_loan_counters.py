@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("members", "0008_branches"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="member",
+            name="active_loans",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="member",
+            name="loan_limit",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="member",
+            name="total_loans",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0008_branches"),
+        ("members", "0009_loan_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookTrendingScore",
+            fields=[
+                (
+                    "book",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="trending",
+                        serialize=False,
+                        to="books.book",
+                    ),
+                ),
+                ("category", models.CharField(max_length=100)),
+                ("score", models.FloatField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["-score"], name="booktrending_score_idx"),
+                    models.Index(
+                        fields=["category", "-score"], name="booktrending_category_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
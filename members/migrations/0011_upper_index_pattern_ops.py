@@ -0,0 +1,29 @@
+from django.db import migrations
+
+# See books.0010_upper_index_pattern_ops: lets the admin's `^username` and
+# `^email` searches use these indexes on PostgreSQL.
+INDEXES = [
+    ('member_username_upper_idx', 'members_member', 'username'),
+    ('member_email_upper_idx', 'members_member', 'email'),
+]
+
+
+def rebuild(opclass):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for name, table, column in INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+            schema_editor.execute(f'CREATE INDEX "{name}" ON "{table}" (UPPER("{column}") {opclass})')
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("members", "0010_trending_scores"),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild('text_pattern_ops'), rebuild('')),
+    ]
@@ -3,20 +3,166 @@ from django.db import models
 from books.models import Book
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Upper
 from django.utils import timezone
 
+from api.db import AtomicSaveMixin
+
 class Member(AbstractUser):
     email = models.EmailField(unique=True)
     membership_date = models.DateField(auto_now_add=True)
+    # Maintained by members.circulation with F() updates; repaired by
+    # `manage.py reconcile_loan_counters`.
+    active_loans = models.PositiveIntegerField(default=0, editable=False)
+    total_loans = models.PositiveIntegerField(default=0, editable=False)
+    # Open loans allowed at once; null uses LIBRARY_DEFAULT_LOAN_LIMIT.
+    loan_limit = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Serves case-insensitive username and email searches (admin autocomplete);
+            # text_pattern_ops on PostgreSQL (migration 0011) for prefix searches.
+            models.Index(Upper('username'), name='member_username_upper_idx'),
+            models.Index(Upper('email'), name='member_email_upper_idx'),
+        ]
 
     def __str__(self):
         return self.username
 
-class BorrowRecord(models.Model):
+class BorrowRecord(AtomicSaveMixin, models.Model):
     member = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     book = models.ForeignKey('books.Book', on_delete=models.CASCADE)
     borrowed_at = models.DateTimeField(auto_now_add=True)
+    due_date = models.DateTimeField(null=True, blank=True)
     returned_at = models.DateTimeField(null=True, blank=True)
+    overdue_days = models.PositiveIntegerField(default=0)
+    fine = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    # The book's branch, copied when the loan is made; the partition key when
+    # `partition_borrow_records` has been applied.
+    branch = models.ForeignKey('books.Branch', on_delete=models.PROTECT, null=True, blank=True, related_name='loans')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-borrowed_at'], name='borrowrecord_borrowed_idx'),
+            models.Index(fields=['branch', '-borrowed_at'], name='borrowrecord_branch_recent_idx'),
+            models.Index(
+                fields=['branch', 'member'],
+                condition=models.Q(returned_at__isnull=True),
+                name='borrowrecord_branch_open_idx',
+            ),
+            # Lets the overdue scan walk open loans in id order without
+            # touching returned rows.
+            models.Index(
+                fields=['id'],
+                condition=models.Q(returned_at__isnull=True),
+                name='borrowrecord_open_idx',
+            ),
+            # Lets the archival job find old returned loans.
+            models.Index(
+                fields=['returned_at'],
+                condition=models.Q(returned_at__isnull=False),
+                name='borrowrecord_returned_idx',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.branch_id is None:
+            self.branch_id = self.book.branch_id
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.member} borrowed {self.book} at {self.borrowed_at}"
+
+
+class ArchivedBorrowRecord(models.Model):
+    """
+    Cold storage for borrow records returned long ago.
+
+    Rows are moved here by `manage.py archive_borrow_records` and keep the id
+    they had in BorrowRecord, so the two tables can be unioned for history views.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    member = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    book = models.ForeignKey('books.Book', on_delete=models.CASCADE, related_name='+')
+    borrowed_at = models.DateTimeField()
+    due_date = models.DateTimeField(null=True, blank=True)
+    returned_at = models.DateTimeField()
+    overdue_days = models.PositiveIntegerField(default=0)
+    fine = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    branch = models.ForeignKey('books.Branch', on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.member} borrowed {self.book} at {self.borrowed_at} (archived)"
+
+
+class BookLoanStats(models.Model):
+    """
+    Per-book circulation rollup, maintained incrementally on every borrow.
+    """
+    book = models.OneToOneField('books.Book', on_delete=models.CASCADE, primary_key=True, related_name='loan_stats')
+    total_loans = models.PositiveIntegerField(default=0)
+    last_borrowed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_loans'], name='bookloanstats_total_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.book}: {self.total_loans} loans"
+
+
+class BookTrendingScore(models.Model):
+    """
+    Exponentially decayed borrow count per book, maintained on every borrow.
+
+    Stored in log space relative to a fixed epoch (see `members.analytics`),
+    so a borrow only adds to its own book's row and older scores never need
+    rewriting: ordering by `score` is ordering by current decayed popularity.
+    """
+    book = models.OneToOneField('books.Book', on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    # The book's category at its latest borrow, for per-category leaderboards.
+    category = models.CharField(max_length=100)
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='booktrending_score_idx'),
+            models.Index(fields=['category', '-score'], name='booktrending_category_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.book}: {self.score:.3f}"
+
+
+class CategoryDailyLoanStats(models.Model):
+    """
+    Loans and returns per category per day, maintained incrementally on every borrow and return.
+    """
+    day = models.DateField()
+    category = models.CharField(max_length=100)
+    loans = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='categorydailyloanstats_day_category_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.category} on {self.day}: {self.loans} loans"
+
+
+class CirculationGauge(models.Model):
+    """
+    Library-wide circulation counters such as active loans and active borrowers.
+    """
+    ACTIVE_LOANS = 'active_loans'
+    ACTIVE_BORROWERS = 'active_borrowers'
+
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
 
     def __str__(self):
-        return f"{self.member} borrowed {self.book} at {self.borrowed_at}"
\ No newline at end of file
+        return f"{self.name}: {self.value}"
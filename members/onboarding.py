@@ -0,0 +1,158 @@
+"""
+Bulk member import.
+
+Passwords are hashed on an executor, which `Executor.map` keeps hashing ahead
+while earlier batches are being inserted. The API hashes on a small thread
+pool in the web worker (PBKDF2, the default hasher, releases the GIL);
+`manage.py import_members` passes a process pool, which also suits hashers
+that hold it. Web workers never start processes. Each batch is one
+`bulk_create` of members, one of their `Member` group rows and, when
+activation is required, one `send_messages` call that queues every activation
+email of the batch.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.mail import get_connection
+from django.db import IntegrityError, transaction
+from djoser.conf import settings as djoser_settings
+
+from api import audit
+from api.models import AuditEvent
+from .models import Member
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hash_pool():
+    """
+    The hashing threads shared by imports in this process, started on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.MEMBER_IMPORT_HASH_WORKERS, thread_name_prefix='member-import',
+                )
+    return _pool
+
+
+def existing_values(field, values):
+    return set(Member.objects.filter(**{f'{field}__in': values}).values_list(field, flat=True))
+
+
+def check_conflicts(rows):
+    """
+    Per-row errors for usernames and emails that are taken or repeated in the
+    import, keyed by row index. Two queries in all.
+    """
+    errors = {}
+    for field in ('username', 'email'):
+        taken = existing_values(field, [row[field] for row in rows])
+        seen = set()
+        for index, row in enumerate(rows):
+            value = row[field]
+            if value in taken or value in seen:
+                errors.setdefault(index, {})[field] = [f"A member with this {field} already exists."]
+            seen.add(value)
+    return errors
+
+
+def activation_emails(members):
+    """
+    Rendered activation emails for `members`, as djoser would send them on sign-up.
+    """
+    messages = []
+    for member in members:
+        message = djoser_settings.EMAIL.activation(None, {'user': member})
+        message.render()
+        message.to = [member.email]
+        message.from_email = settings.DEFAULT_FROM_EMAIL
+        messages.append(message)
+    return messages
+
+
+def insert(members, group, actor):
+    """
+    Insert `members` and their group rows in one transaction.
+    """
+    through = Member.groups.through
+    with transaction.atomic():
+        Member.objects.bulk_create(members)
+        through.objects.bulk_create([through(member_id=member.pk, group_id=group.pk) for member in members])
+        for member in members:
+            audit.record(AuditEvent.CREATE, member, member.pk, audit.diff({}, audit.values(member)), actor=actor)
+
+
+def import_members(rows, send_activation=True, batch_size=500, pool=None, actor=None):
+    """
+    Create members from validated `rows` (dicts with username, email, password
+    and optionally first_name and last_name) and add them to the Member group.
+
+    With `send_activation` the members are created inactive and sent the usual
+    activation email; otherwise they are created active. Rows whose username
+    or email is taken are skipped, including by sign-ups that commit while the
+    import runs. Each member is audited as created by `actor`.
+
+    Returns `{'created', 'skipped', 'seconds', 'members_per_second'}`, where
+    `skipped` lists `{'index', 'errors'}` for each skipped row.
+    """
+    started = time.perf_counter()
+    conflicts = check_conflicts(rows)
+    accepted = [index for index in range(len(rows)) if index not in conflicts]
+
+    pool = pool or get_hash_pool()
+    hashes = pool.map(
+        make_password, [rows[index]['password'] for index in accepted], chunksize=max(1, batch_size // 8)
+    )
+    group, _ = Group.objects.get_or_create(name="Member")
+    connection = get_connection() if send_activation else None
+
+    created = 0
+    for start in range(0, len(accepted), batch_size):
+        batch = {
+            index: Member(
+                username=rows[index]['username'],
+                email=rows[index]['email'],
+                password=next(hashes),
+                first_name=rows[index].get('first_name', ''),
+                last_name=rows[index].get('last_name', ''),
+                is_active=not send_activation,
+            )
+            for index in accepted[start:start + batch_size]
+        }
+        while True:
+            try:
+                insert(list(batch.values()), group, actor)
+                break
+            except IntegrityError:
+                # Taken since check_conflicts ran: skip those rows and retry the rest.
+                late = check_conflicts([rows[index] for index in batch])
+                if not late:
+                    raise
+                indexes = list(batch)
+                for position, errors in late.items():
+                    conflicts[indexes[position]] = errors
+                    del batch[indexes[position]]
+                for member in batch.values():
+                    member.pk = None
+        members = list(batch.values())
+        if not members:
+            continue
+        if send_activation:
+            connection.send_messages(activation_emails(members))
+        created += len(members)
+
+    seconds = time.perf_counter() - started
+    return {
+        'created': created,
+        'skipped': [{'index': index, 'errors': errors} for index, errors in sorted(conflicts.items())],
+        'seconds': round(seconds, 3),
+        'members_per_second': round(created / seconds, 1) if seconds else None,
+    }
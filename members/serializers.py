@@ -1,7 +1,10 @@
 from rest_framework import serializers
-from .models import Member, BorrowRecord
+from .analytics import decayed
+from .models import Member, BorrowRecord, BookLoanStats, BookTrendingScore, CategoryDailyLoanStats
 from books.models import Book
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.validators import UnicodeUsernameValidator
 
 User = get_user_model()
 
@@ -30,11 +33,16 @@ class BorrowRecordSerializer(serializers.ModelSerializer):
 
     Write-only fields:
     - book_id: Primary key for selecting the book to borrow.
+    - member_id: Primary key of the member borrowing it.
 
     Fields:
     - id: Unique identifier for the borrow record.
     - borrowed_at: Timestamp when the book was borrowed.
+    - due_date: Timestamp when the book is due back (from the category's loan policy).
     - returned_at: Timestamp when the book was returned (nullable).
+    - overdue_days: Days overdue as of the last fine assessment.
+    - fine: Accrued fine as of the last fine assessment.
+    - branch: Code of the branch the book was borrowed from (set from the book).
     """
     member = serializers.StringRelatedField(read_only=True)
     book = serializers.StringRelatedField(read_only=True)
@@ -43,11 +51,40 @@ class BorrowRecordSerializer(serializers.ModelSerializer):
         write_only=True,
         source='book'
     )
+    member_id = serializers.PrimaryKeyRelatedField(
+        queryset=Member.objects.filter(groups__name='Member'),
+        write_only=True,
+        source='member'
+    )
+    branch = serializers.SlugRelatedField(slug_field='code', read_only=True)
 
     class Meta:
         model = BorrowRecord
-        fields = ['id', 'member', 'book', 'book_id', 'borrowed_at', 'returned_at']
-        read_only_fields = ['id', 'member', 'borrowed_at', 'returned_at']
+        fields = [
+            'id', 'member', 'member_id', 'book', 'book_id', 'borrowed_at', 'due_date', 'returned_at', 'overdue_days', 'fine',
+            'branch',
+        ]
+        read_only_fields = ['id', 'member', 'borrowed_at', 'due_date', 'returned_at', 'overdue_days', 'fine']
+
+
+class BorrowHistorySerializer(serializers.Serializer):
+    """
+    Read-only serializer for borrow history rows drawn from both the live and
+    the archived borrow record tables.
+
+    Mirrors BorrowRecordSerializer's output and adds:
+    - archived: Whether the record has been moved to the archive.
+    """
+    id = serializers.IntegerField()
+    member = serializers.CharField(source='member__username')
+    book = serializers.CharField(source='book__title')
+    borrowed_at = serializers.DateTimeField()
+    due_date = serializers.DateTimeField()
+    returned_at = serializers.DateTimeField()
+    overdue_days = serializers.IntegerField()
+    fine = serializers.DecimalField(max_digits=8, decimal_places=2)
+    branch = serializers.CharField(source='branch__code', allow_null=True)
+    archived = serializers.BooleanField()
 
 
 class MemberCreateSerializer(serializers.ModelSerializer):
@@ -57,7 +94,8 @@ class MemberCreateSerializer(serializers.ModelSerializer):
     Handles user registration by accepting username, email,
     password (write-only), first name, and last name.
 
-    Password is hashed before saving the user.
+    Password is hashed before the user is inserted, so creating a user is a
+    single write.
     """
     password = serializers.CharField(write_only=True)
 
@@ -66,7 +104,7 @@ class MemberCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'username', 'email', 'password', 'first_name', 'last_name')
 
     def create(self, validated_data):
-        user = User.objects.create(
+        user = User(
             username=validated_data['username'],
             email=validated_data.get('email', ''),
             first_name=validated_data.get('first_name', ''),
@@ -78,6 +116,42 @@ class MemberCreateSerializer(serializers.ModelSerializer):
         return user
 
 
+class MemberImportRowSerializer(serializers.Serializer):
+    """
+    One member in a bulk import.
+
+    Uniqueness of username and email is checked for the whole import at once
+    by `members.onboarding`, not per row.
+    """
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField(max_length=254)
+    password = serializers.CharField(write_only=True)
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+
+
+class MemberImportSerializer(serializers.Serializer):
+    """
+    Request body for `POST /members/import/`.
+
+    Fields:
+    - members: Members to create, at most MEMBER_IMPORT_MAX_ROWS.
+    - send_activation_email: Create the members inactive and queue activation
+      emails (default), or create them active.
+    """
+    members = MemberImportRowSerializer(many=True)
+    send_activation_email = serializers.BooleanField(default=True)
+
+    def validate_members(self, value):
+        if not value:
+            raise serializers.ValidationError("Send at least one member.")
+        if len(value) > settings.MEMBER_IMPORT_MAX_ROWS:
+            raise serializers.ValidationError(
+                f"At most {settings.MEMBER_IMPORT_MAX_ROWS} members per request; use `manage.py import_members` for more."
+            )
+        return value
+
+
 class MemberSerializer(serializers.ModelSerializer):
     """
     Serializer for User model to retrieve user details.
@@ -92,3 +166,74 @@ class MemberSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name')
+
+
+class MemberLoansSerializer(MemberSerializer):
+    """
+    Member details for librarians, with loan counters.
+
+    Adds:
+    - active_loans: Books currently on loan (read-only).
+    - total_loans: Books borrowed to date, archived loans included (read-only).
+    - loan_limit: Open loans allowed at once; null for the library default.
+    """
+    class Meta(MemberSerializer.Meta):
+        fields = MemberSerializer.Meta.fields + ('active_loans', 'total_loans', 'loan_limit')
+        read_only_fields = ('active_loans', 'total_loans')
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Only the submitted fields: a full save would write back counters
+        # read before a borrow or return that committed meanwhile.
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+
+class BookLoanStatsSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the per-book circulation rollup.
+
+    Fields:
+    - book_id: Primary key of the book.
+    - title: Title of the book.
+    - total_loans: Number of times the book has been borrowed.
+    - last_borrowed_at: Timestamp of the most recent loan.
+    """
+    book_id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(source='book.title', read_only=True)
+
+    class Meta:
+        model = BookLoanStats
+        fields = ['book_id', 'title', 'total_loans', 'last_borrowed_at']
+
+
+class BookTrendingScoreSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a trending leaderboard entry.
+
+    Fields:
+    - book_id: Primary key of the book.
+    - title: Title of the book.
+    - category: Category of the book at its latest borrow.
+    - score: Borrows weighted by age, halving every TRENDING_HALF_LIFE_DAYS.
+    """
+    book_id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(source='book.title', read_only=True)
+    score = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BookTrendingScore
+        fields = ['book_id', 'title', 'category', 'score']
+
+    def get_score(self, obj) -> float:
+        return round(decayed(obj.score, self.context.get('now')), 3)
+
+
+class CategoryDailyLoanStatsSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the per-category, per-day circulation rollup.
+    """
+    class Meta:
+        model = CategoryDailyLoanStats
+        fields = ['day', 'category', 'loans', 'returns']
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import circulation
+from .models import BorrowRecord
+
+
+@receiver(post_delete, sender=BorrowRecord)
+def loan_deleted(sender, instance, origin=None, **kwargs):
+    circulation.forget_loan(instance, origin)
@@ -1,3 +1,150 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from books.models import Author, Book
+from . import circulation
+from .circulation import CirculationError
+from .models import BorrowRecord, CirculationGauge, Member
+
+
+class CirculationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name="Ursula K. Le Guin")
+        cls.books = [
+            Book.objects.create(title=f"Book {i}", author=cls.author, ISBN=f'97800000000{i:02}', category='Fiction')
+            for i in range(4)
+        ]
+        cls.member = Member.objects.create_user('reader', 'reader@example.com', 'pw')
+
+    def counters(self, member=None):
+        member = member or self.member
+        member.refresh_from_db()
+        return member.active_loans, member.total_loans
+
+    def gauge(self, name):
+        return CirculationGauge.objects.filter(name=name).values_list('value', flat=True).first() or 0
+
+
+@override_settings(LIBRARY_DEFAULT_LOAN_LIMIT=2)
+class LoanLimitTests(CirculationTestCase):
+    def test_claim_loan_slot_stops_at_the_default_limit(self):
+        self.assertTrue(circulation.claim_loan_slot(self.member))
+        self.assertTrue(circulation.claim_loan_slot(self.member))
+        self.assertFalse(circulation.claim_loan_slot(self.member))
+        self.assertEqual(self.counters(), (2, 2))
+
+    def test_member_loan_limit_overrides_the_default(self):
+        Member.objects.filter(pk=self.member.pk).update(loan_limit=3)
+        self.assertEqual([circulation.claim_loan_slot(self.member) for _ in range(4)], [True, True, True, False])
+
+    def test_borrow_beyond_the_limit_is_refused_and_leaves_the_book_available(self):
+        circulation.borrow_book(self.member, self.books[0])
+        circulation.borrow_book(self.member, self.books[1])
+
+        with self.assertRaises(CirculationError):
+            circulation.borrow_book(self.member, self.books[2])
+
+        self.assertTrue(Book.objects.get(pk=self.books[2].pk).availability)
+        self.assertFalse(BorrowRecord.objects.filter(book=self.books[2]).exists())
+        self.assertEqual(self.counters(), (2, 2))
+
+    def test_return_frees_a_slot(self):
+        circulation.borrow_book(self.member, self.books[0])
+        circulation.borrow_book(self.member, self.books[1])
+
+        circulation.return_book(self.member, self.books[0])
+
+        self.assertEqual(self.counters(), (1, 2))
+        circulation.borrow_book(self.member, self.books[2])
+        self.assertEqual(self.counters(), (2, 3))
+
+
+class BulkReturnTests(CirculationTestCase):
+    def test_bulk_return_closes_open_loans_and_releases_counters(self):
+        other = Member.objects.create_user('other', 'other@example.com', 'pw')
+        for book in self.books[:3]:
+            circulation.borrow_book(self.member, book)
+        circulation.borrow_book(other, self.books[3])
+        circulation.return_book(self.member, self.books[0])
+
+        returned = circulation.bulk_return(BorrowRecord.objects.all())
+
+        self.assertEqual(returned, 3)
+        self.assertFalse(BorrowRecord.objects.filter(returned_at__isnull=True).exists())
+        self.assertTrue(all(Book.objects.filter(pk__in=[book.pk for book in self.books]).values_list(
+            'availability', flat=True
+        )))
+        self.assertEqual(self.counters(), (0, 3))
+        self.assertEqual(self.counters(other), (0, 1))
+        self.assertEqual(self.gauge(CirculationGauge.ACTIVE_LOANS), 0)
+        self.assertEqual(self.gauge(CirculationGauge.ACTIVE_BORROWERS), 0)
+
+    def test_bulk_return_of_closed_loans_does_nothing(self):
+        circulation.borrow_book(self.member, self.books[0])
+        circulation.return_book(self.member, self.books[0])
+
+        self.assertEqual(circulation.bulk_return(BorrowRecord.objects.all()), 0)
+        self.assertEqual(self.counters(), (0, 1))
+
+
+class BorrowRecordAdminTests(CirculationTestCase):
+    def setUp(self):
+        self.client.force_login(Member.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+    def test_loans_cannot_be_added_in_the_admin(self):
+        self.assertEqual(self.client.get('/admin/members/borrowrecord/add/').status_code, 403)
+
+    def test_loan_membership_and_return_are_read_only(self):
+        record = circulation.borrow_book(self.member, self.books[0])
+
+        response = self.client.get(f'/admin/members/borrowrecord/{record.pk}/change/')
+
+        self.assertEqual(response.status_code, 200)
+        for field in ['member', 'book', 'returned_at']:
+            self.assertNotIn(f'name="{field}', response.content.decode())
+        self.assertIn('name="due_date', response.content.decode())
+
+
+class DeletedLoanTests(CirculationTestCase):
+    def test_deleting_an_open_loan_frees_the_slot_and_the_book(self):
+        record = circulation.borrow_book(self.member, self.books[0])
+
+        record.delete()
+
+        self.assertEqual(self.counters(), (0, 0))
+        self.assertTrue(Book.objects.get(pk=self.books[0].pk).availability)
+        self.assertEqual(self.gauge(CirculationGauge.ACTIVE_LOANS), 0)
+        self.assertEqual(self.gauge(CirculationGauge.ACTIVE_BORROWERS), 0)
+
+    def test_deleting_a_returned_loan_only_takes_it_off_the_total(self):
+        circulation.borrow_book(self.member, self.books[0])
+        record = circulation.return_book(self.member, self.books[0])
+        circulation.borrow_book(self.member, self.books[1])
+
+        record.delete()
+
+        self.assertEqual(self.counters(), (1, 1))
+        self.assertEqual(self.gauge(CirculationGauge.ACTIVE_LOANS), 1)
+        self.assertEqual(self.gauge(CirculationGauge.ACTIVE_BORROWERS), 1)
+
+    def test_bulk_delete_counts_each_borrower_once(self):
+        other = Member.objects.create_user('other', 'other@example.com', 'pw')
+        for book in self.books[:3]:
+            circulation.borrow_book(self.member, book)
+        circulation.borrow_book(other, self.books[3])
+
+        BorrowRecord.objects.all().delete()
+
+        self.assertEqual(self.counters(), (0, 0))
+        self.assertEqual(self.counters(other), (0, 0))
+        self.assertEqual(self.gauge(CirculationGauge.ACTIVE_LOANS), 0)
+        self.assertEqual(self.gauge(CirculationGauge.ACTIVE_BORROWERS), 0)
+
+    def test_deleting_a_book_releases_its_borrower(self):
+        circulation.borrow_book(self.member, self.books[0])
+        circulation.borrow_book(self.member, self.books[1])
+
+        Book.objects.get(pk=self.books[0].pk).delete()
+
+        self.assertEqual(self.counters(), (1, 1))
+        self.assertEqual(self.gauge(CirculationGauge.ACTIVE_BORROWERS), 1)
@@ -1,24 +1,54 @@
-from rest_framework import viewsets
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+
+from rest_framework import status, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.utils.urls import replace_query_param
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.contrib.auth.models import Group
+from django.db.models import Q, Value
+from django.utils import timezone
 
-from .models import Member, BorrowRecord
-from .serializers import MemberSerializer, BorrowRecordSerializer
+from .models import (
+    Member,
+    BorrowRecord,
+    ArchivedBorrowRecord,
+    BookLoanStats,
+    CategoryDailyLoanStats,
+    CirculationGauge,
+)
+from .serializers import (
+    MemberLoansSerializer,
+    MemberImportSerializer,
+    BorrowRecordSerializer,
+    BorrowHistorySerializer,
+    BookLoanStatsSerializer,
+    CategoryDailyLoanStatsSerializer,
+)
+from api.audit import AuditedMixin
+from api.idempotency import IdempotentMixin
+from . import circulation
+from .onboarding import import_members
+from books.branches import BranchScopedMixin, request_branch
 from api.permissions import IsLibrarianGroupOnly, IsMemberGroupOnly
 
 
-class MemberViewSet(viewsets.ModelViewSet):
+class MemberViewSet(AuditedMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing library members.
 
     Permissions:
     - Only users in the 'Librarian' group can access this.
+
+    Members carry `active_loans` and `total_loans` counters, kept by the
+    circulation service, and a per-member `loan_limit`.
     """
-    serializer_class = MemberSerializer
+    serializer_class = MemberLoansSerializer
+    throttle_costs = {'import_members': 50}
     filterset_fields = ['username', 'email']
     permission_classes = [IsLibrarianGroupOnly]
 
@@ -33,8 +63,8 @@ class MemberViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="List members",
-        operation_description="Retrieve a list of all members filtered by username or email.",
-        responses={200: MemberSerializer(many=True)},
+        operation_description="Retrieve a list of all members, with their loan counters, filtered by username or email.",
+        responses={200: MemberLoansSerializer(many=True)},
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -42,7 +72,7 @@ class MemberViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(
         operation_summary="Retrieve member",
         operation_description="Get details of a specific member by ID.",
-        responses={200: MemberSerializer()},
+        responses={200: MemberLoansSerializer()},
     )
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
@@ -50,8 +80,8 @@ class MemberViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(
         operation_summary="Create member",
         operation_description="Create a new member (librarians only).",
-        request_body=MemberSerializer,
-        responses={201: MemberSerializer()},
+        request_body=MemberLoansSerializer,
+        responses={201: MemberLoansSerializer()},
     )
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
@@ -59,8 +89,8 @@ class MemberViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(
         operation_summary="Update member",
         operation_description="Fully update a member (librarians only).",
-        request_body=MemberSerializer,
-        responses={200: MemberSerializer()},
+        request_body=MemberLoansSerializer,
+        responses={200: MemberLoansSerializer()},
     )
     def update(self, request, *args, **kwargs):
         return super().update(request, *args, **kwargs)
@@ -68,8 +98,8 @@ class MemberViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(
         operation_summary="Partial update member",
         operation_description="Partially update a member (librarians only).",
-        request_body=MemberSerializer,
-        responses={200: MemberSerializer()},
+        request_body=MemberLoansSerializer,
+        responses={200: MemberLoansSerializer()},
     )
     def partial_update(self, request, *args, **kwargs):
         return super().partial_update(request, *args, **kwargs)
@@ -82,25 +112,143 @@ class MemberViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         return super().destroy(request, *args, **kwargs)
 
+    @swagger_auto_schema(
+        operation_summary="Import members",
+        operation_description=(
+            "Create many members at once and add them to the Member group (librarians only). "
+            "Members whose username or email is taken are skipped and listed by index."
+        ),
+        request_body=MemberImportSerializer,
+        responses={201: openapi.Response(description="Created count, skipped rows and throughput.")},
+    )
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_members(self, request):
+        serializer = MemberImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = import_members(
+            serializer.validated_data['members'],
+            send_activation=serializer.validated_data['send_activation_email'],
+            actor=request.user,
+        )
+        return Response(result, status=status.HTTP_201_CREATED)
+
+
+HISTORY_FIELDS = (
+    'id', 'member__username', 'book__title', 'borrowed_at', 'due_date',
+    'returned_at', 'overdue_days', 'fine', 'branch__code', 'archived',
+)
+
+include_archived_param = openapi.Parameter(
+    'include_archived', openapi.IN_QUERY,
+    description="Also include records moved to the archive.",
+    type=openapi.TYPE_BOOLEAN,
+)
+
+
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_PAGE_SIZE = 500
+
+
+def wants_archived(request):
+    return request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+history_page_params = [
+    openapi.Parameter(
+        'limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+        description=f"Records per page with `include_archived` (default {HISTORY_PAGE_SIZE}, at most {HISTORY_MAX_PAGE_SIZE}).",
+    ),
+    openapi.Parameter(
+        'cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+        description="Position from the previous page's `next` link.",
+    ),
+]
+
+
+def borrow_history(position=None, **filters):
+    """
+    Union of live and archived borrow records matching `filters`, newest
+    first, starting after `position` (a `(borrowed_at, id)` pair) if given.
+    """
+    after = Q()
+    if position is not None:
+        borrowed_at, record_id = position
+        after = Q(borrowed_at__lt=borrowed_at) | Q(borrowed_at=borrowed_at, id__lt=record_id)
+    hot = BorrowRecord.objects.filter(after, **filters).annotate(archived=Value(False)).values(*HISTORY_FIELDS)
+    cold = ArchivedBorrowRecord.objects.filter(after, **filters).annotate(archived=Value(True)).values(*HISTORY_FIELDS)
+    return hot.union(cold, all=True).order_by('-borrowed_at', '-id')
+
 
-class BorrowRecordViewSet(viewsets.ModelViewSet):
+def encode_position(row):
+    return urlsafe_b64encode(f"{row['borrowed_at'].isoformat()}|{row['id']}".encode()).decode()
+
+
+def decode_position(cursor):
+    try:
+        borrowed_at, record_id = urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return datetime.fromisoformat(borrowed_at), int(record_id)
+    except ValueError:
+        raise ValidationError({'cursor': "Invalid cursor."})
+
+
+def history_page(request, **filters):
+    """
+    One page of `borrow_history()` as `{next, results}`. A union cannot be
+    filtered afterwards, so the cursor is a position applied to both tables
+    before the union rather than a CursorPagination cursor.
+    """
+    limit = bounded_int(request.query_params.get('limit'), HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE)
+    cursor = request.query_params.get('cursor')
+    rows = list(borrow_history(decode_position(cursor) if cursor else None, **filters)[:limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_position(rows[-1]))
+    return Response({'next': next_url, 'results': BorrowHistorySerializer(rows, many=True).data})
+
+
+class BorrowRecordViewSet(IdempotentMixin, AuditedMixin, BranchScopedMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing borrow records.
 
     Permissions:
     - Librarians and Admins have full CRUD access.
-    - Members can retrieve their own active borrow records via `/records/mine/`.
+    - Members can retrieve their own active borrow records via `/records/mine/`
+      and their full borrowing history via `/records/history/`.
+
+    Records returned long ago are moved to an archive table by
+    `manage.py archive_borrow_records`; pass `?include_archived=true` to the
+    list and history endpoints to include them.
+
+    Loans are made and closed only by the circulation service, which keeps
+    the member counters and rollups: creating a record lends the book, there
+    is no update (use the return endpoint), and only returned records can be
+    deleted.
+
+    Writes accept an `Idempotency-Key` header. All endpoints are limited to
+    one branch's loans with `?branch=<code>` or `X-Branch`.
     """
-    queryset = BorrowRecord.objects.select_related('member', 'book').all()
+    queryset = BorrowRecord.objects.select_related('member', 'book', 'branch').all()
     serializer_class = BorrowRecordSerializer
     permission_classes = [IsLibrarianGroupOnly]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def branch_filter(self):
+        branch = request_branch(self.request)
+        return {} if branch is None else {'branch': branch}
 
     @swagger_auto_schema(
         operation_summary="List borrow records",
-        operation_description="Retrieve a list of all borrow records.",
+        operation_description=(
+            "Retrieve a list of all borrow records. Archived records are included only when requested, "
+            "newest first in pages of `{next, results}`."
+        ),
+        manual_parameters=[include_archived_param, *history_page_params],
         responses={200: BorrowRecordSerializer(many=True)},
     )
     def list(self, request, *args, **kwargs):
+        if wants_archived(request):
+            return history_page(request, **self.branch_filter())
         return super().list(request, *args, **kwargs)
 
     @swagger_auto_schema(
@@ -113,38 +261,42 @@ class BorrowRecordViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="Create borrow record",
-        operation_description="Create a new borrow record (librarians only).",
+        operation_description=(
+            "Lend a book to a member (librarians only), as if they had borrowed it themselves: "
+            "the book must be available and the member under their loan limit."
+        ),
         request_body=BorrowRecordSerializer,
-        responses={201: BorrowRecordSerializer()},
+        responses={201: BorrowRecordSerializer(), 400: 'Validation error or the book cannot be lent.'},
     )
     def create(self, request, *args, **kwargs):
-        return super().create(request, *args, **kwargs)
-
-    @swagger_auto_schema(
-        operation_summary="Update borrow record",
-        operation_description="Fully update a borrow record (librarians only).",
-        request_body=BorrowRecordSerializer,
-        responses={200: BorrowRecordSerializer()},
-    )
-    def update(self, request, *args, **kwargs):
-        return super().update(request, *args, **kwargs)
-
-    @swagger_auto_schema(
-        operation_summary="Partial update borrow record",
-        operation_description="Partially update a borrow record (librarians only).",
-        request_body=BorrowRecordSerializer,
-        responses={200: BorrowRecordSerializer()},
-    )
-    def partial_update(self, request, *args, **kwargs):
-        return super().partial_update(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            record = circulation.borrow_book(
+                serializer.validated_data['member'],
+                serializer.validated_data['book'],
+                actor=request.user,
+            )
+        except circulation.CirculationError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(record).data, status=status.HTTP_201_CREATED)
 
     @swagger_auto_schema(
         operation_summary="Delete borrow record",
-        operation_description="Delete a borrow record (librarians only).",
-        responses={204: 'No Content'},
+        operation_description=(
+            "Delete a returned borrow record (librarians only). Open loans must be returned first."
+        ),
+        responses={204: 'No Content', 409: 'The loan is still open.'},
     )
     def destroy(self, request, *args, **kwargs):
-        return super().destroy(request, *args, **kwargs)
+        record = self.get_object()
+        if record.returned_at is None:
+            return Response(
+                {"detail": "This loan is still open. Return the book before deleting the record."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        self.perform_destroy(record)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @swagger_auto_schema(
         method='get',
@@ -159,7 +311,87 @@ class BorrowRecordViewSet(viewsets.ModelViewSet):
     def mine(self, request):
         records = BorrowRecord.objects.filter(
             member=request.user,
-            returned_at__isnull=True
-        ).select_related('book')
+            returned_at__isnull=True,
+            **self.branch_filter()
+        ).select_related('book', 'branch')
         serializer = self.get_serializer(records, many=True)
         return Response(serializer.data)
+
+    @swagger_auto_schema(
+        method='get',
+        operation_summary="Borrowing history for current member",
+        operation_description=(
+            "Retrieve all borrow records of the logged-in member, active and returned, newest first. "
+            "Archived records are included only when requested, in pages of `{next, results}`."
+        ),
+        manual_parameters=[include_archived_param, *history_page_params],
+        responses={200: BorrowHistorySerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsMemberGroupOnly])
+    def history(self, request):
+        if wants_archived(request):
+            return history_page(request, member=request.user, **self.branch_filter())
+        records = (
+            BorrowRecord.objects.filter(member=request.user, **self.branch_filter())
+            .annotate(archived=Value(False))
+            .values(*HISTORY_FIELDS)
+            .order_by('-borrowed_at')
+        )
+        return Response(BorrowHistorySerializer(records, many=True).data)
+
+
+def bounded_int(value, default, maximum):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(value, maximum))
+
+
+class CirculationAnalyticsViewSet(viewsets.ViewSet):
+    """
+    Read-only circulation dashboards for librarians.
+
+    Every endpoint reads from rollup tables maintained by the borrow and return
+    transactions, so response time does not grow with the size of the loan history.
+    Rebuild the rollups with `manage.py backfill_circulation_stats`.
+    """
+    permission_classes = [IsLibrarianGroupOnly]
+
+    @swagger_auto_schema(
+        operation_summary="Most borrowed books",
+        operation_description="Books with the most loans of all time. Accepts `?limit=` (default 10, max 100).",
+        manual_parameters=[openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER)],
+        responses={200: BookLoanStatsSerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'])
+    def most_borrowed(self, request):
+        limit = bounded_int(request.query_params.get('limit'), 10, 100)
+        stats = BookLoanStats.objects.select_related('book').order_by('-total_loans')[:limit]
+        return Response(BookLoanStatsSerializer(stats, many=True).data)
+
+    @swagger_auto_schema(
+        operation_summary="Loans per category per day",
+        operation_description="Daily loans and returns per category for the last `?days=` days (default 30, max 366).",
+        manual_parameters=[openapi.Parameter('days', openapi.IN_QUERY, type=openapi.TYPE_INTEGER)],
+        responses={200: CategoryDailyLoanStatsSerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'])
+    def categories(self, request):
+        days = bounded_int(request.query_params.get('days'), 30, 366)
+        since = timezone.localdate() - timedelta(days=days - 1)
+        stats = CategoryDailyLoanStats.objects.filter(day__gte=since).order_by('day', 'category')
+        return Response(CategoryDailyLoanStatsSerializer(stats, many=True).data)
+
+    @swagger_auto_schema(
+        operation_summary="Active borrowers",
+        operation_description="Number of members holding at least one book, and the number of open loans.",
+        responses={200: openapi.Response(description="Current circulation gauges.")},
+    )
+    @action(detail=False, methods=['get'])
+    def active_borrowers(self, request):
+        gauges = dict(CirculationGauge.objects.values_list('name', 'value'))
+        return Response({
+            CirculationGauge.ACTIVE_BORROWERS: gauges.get(CirculationGauge.ACTIVE_BORROWERS, 0),
+            CirculationGauge.ACTIVE_LOANS: gauges.get(CirculationGauge.ACTIVE_LOANS, 0),
+        })